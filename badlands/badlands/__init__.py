@@ -29,6 +29,7 @@ from .underland import stratiWedge
 from .underland import carbMesh
 
 from .hillslope import diffLinear
+from .hillslope import diffImplicit
 
 from .forcing import xmlParser
 from .forcing import forceSim
@@ -36,6 +37,12 @@ from .forcing import isoFlex
 from .forcing import carbGrowth
 from .forcing import pelagicGrowth
 
+from .simulation import runProfile
+from .simulation import stepTelemetry
+from .simulation import eventScheduler
+from .simulation import workSpace
+from .simulation import steadyState
+from .simulation import outputPolicy
 from .simulation import waveSed
 from .simulation import buildMesh
 from .simulation import checkPoints
@@ -0,0 +1,281 @@
+# Copyright 2019 Tristan Salles
+#
+# Badlands is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# Badlands is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Badlands.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Ensemble of **badlands** simulations sharing the same mesh.
+
+The TIN and its Finite Volume discretisation are built once, the read-only arrays of the regular grid and of
+the mesh are placed in shared memory and each member of the ensemble runs in its own process with its own output folder.
+
+Example:
+    >>> from badlands import ensemble
+    >>> summary = ensemble.run(
+    ...     "input.xml",
+    ...     overrides=[{"SPLero": 1.0e-6}, {"SPLero": 5.0e-6, "CDa": 0.05}],
+    ...     workers=2,
+    ... )
+"""
+
+import os
+import gc
+import copy
+import weakref
+import time
+import numpy as np
+import pandas as pd
+import xml.etree.ElementTree as ET
+import multiprocessing
+from multiprocessing import shared_memory
+
+if "READTHEDOCS" not in os.environ:
+    from badlands import xmlParser, buildMesh
+    from badlands.model import Model
+
+# Shared memory blocks attached by the current process with a weak reference to their array
+_attached = []
+
+
+def _share_array(val, blocks):
+    """
+    Copy an array to a new shared memory block.
+
+    Args:
+        val: numpy array to share.
+        blocks: list of the created shared memory blocks, the new block is appended to it.
+
+    Returns:
+        - desc - tuple containing the block name, the shape, the data type and the memory order of the array.
+    """
+
+    order = "F" if val.flags.f_contiguous and not val.flags.c_contiguous else "C"
+    shm = shared_memory.SharedMemory(create=True, size=val.nbytes)
+    buf = np.ndarray(val.shape, dtype=val.dtype, buffer=shm.buf, order=order)
+    buf[...] = val
+    blocks.append(shm)
+
+    return (shm.name, val.shape, val.dtype.str, order)
+
+
+def _attach_array(desc):
+    """
+    Attach a read-only array from its shared memory description.
+
+    Args:
+        desc: tuple obtained from :code:`_share_array`.
+
+    Returns:
+        - arr - read-only numpy array using the shared memory block.
+    """
+
+    name, shape, dtype, order = desc
+    shm = shared_memory.SharedMemory(name=name)
+    arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, order=order)
+    arr.flags.writeable = False
+    _attached.append((shm, weakref.ref(arr)))
+
+    return arr
+
+
+def _share(obj, blocks):
+    """
+    Move the arrays of a mesh class to shared memory.
+
+    The arrays stored as attributes, or in a dictionary attribute such as the *triangle* mesh of the regular
+    grid, are replaced by their shared memory description.
+
+    Args:
+        obj: class describing the finite volume mesh or the regular grid.
+        blocks: list of the created shared memory blocks, the new blocks are appended to it.
+
+    Returns:
+        - shell - copy of the class where the arrays are replaced by their shared memory description.
+    """
+
+    shell = copy.copy(obj)
+    shell._shared = {}
+    for key, val in vars(obj).items():
+        if isinstance(val, np.ndarray) and val.nbytes > 0:
+            shell._shared[key] = _share_array(val, blocks)
+            setattr(shell, key, None)
+        elif isinstance(val, dict):
+            arrays = {
+                k: _share_array(v, blocks)
+                for k, v in val.items()
+                if isinstance(v, np.ndarray) and v.nbytes > 0
+            }
+            if arrays:
+                shell._shared[key] = arrays
+                setattr(shell, key, {k: v for k, v in val.items() if k not in arrays})
+
+    return shell
+
+
+def _attach(shell):
+    """
+    Rebuild a mesh class from its shared memory description.
+
+    Args:
+        shell: class obtained from :code:`_share`.
+
+    Returns:
+        - obj - class describing the mesh with read-only shared arrays.
+    """
+
+    obj = copy.copy(shell)
+    for key, desc in shell._shared.items():
+        if isinstance(desc, dict):
+            val = dict(getattr(shell, key))
+            val.update({k: _attach_array(d) for k, d in desc.items()})
+            setattr(obj, key, val)
+        else:
+            setattr(obj, key, _attach_array(desc))
+    del obj._shared
+
+    return obj
+
+
+def _detach():
+    """
+    Close the shared memory blocks attached by the current process.
+
+    The worker processes are reused from one member to the next and would otherwise keep the mappings of all
+    the members they ran. A block is only closed once its array (and the views of this array) are released,
+    the blocks still in use are closed with the ones of the next member.
+    """
+
+    gc.collect()
+    busy = []
+    for shm, ref in _attached:
+        if ref() is None:
+            shm.close()
+        else:
+            busy.append((shm, ref))
+    _attached[:] = busy
+
+    return
+
+
+def _member_xml(xml, folder, i):
+    """
+    Write the XML input file of an ensemble member with its own output folder.
+    """
+
+    tree = ET.parse(xml)
+    root = tree.getroot()
+    out = root.find("outfolder")
+    if out is None:
+        out = ET.SubElement(root, "outfolder")
+    outDir = os.path.join(folder, "member_%03d" % i)
+    out.text = outDir
+    filename = os.path.join(folder, "member_%03d.xml" % i)
+    tree.write(filename)
+
+    return filename, outDir
+
+
+def _run_member(args):
+    """
+    Run one member of the ensemble.
+    """
+
+    i, xml, overrides, gridShell, meshShell, tEnd, verbose = args
+
+    summary = {"member": i}
+    summary.update(overrides)
+    walltime = time.perf_counter()
+    recGrid = FVmesh = model = area = None
+    try:
+        recGrid = _attach(gridShell)
+        FVmesh = _attach(meshShell)
+        model = Model()
+        # Members already run in parallel
+        model.set_threads(1)
+        model.load_xml(xml, verbose, overrides=overrides, mesh=(recGrid, FVmesh))
+        if tEnd is None:
+            tEnd = model.input.tEnd
+        model.run_to_time(tEnd, verbose)
+
+        dt = model.step_telemetry["dt"]
+        area = model.FVmesh.control_volumes
+        summary["outDir"] = model.input.outDir
+        summary["status"] = "done"
+        summary["tNow"] = model.tNow
+        summary["steps"] = len(dt)
+        summary["mean_dt"] = dt.mean() if len(dt) > 0 else 0.0
+        summary["erosion"] = -np.sum(area * np.minimum(model.cumdiff, 0.0))
+        summary["deposition"] = np.sum(area * np.maximum(model.cumdiff, 0.0))
+        summary["elev_min"] = model.elevation.min()
+        summary["elev_max"] = model.elevation.max()
+        summary["elev_mean"] = model.elevation.mean()
+    except Exception as err:
+        summary["status"] = "failed: %s" % err
+    summary["walltime"] = time.perf_counter() - walltime
+
+    # Release the member before closing its shared memory blocks
+    recGrid = FVmesh = model = area = None
+    _detach()
+
+    return summary
+
+
+def run(xml, overrides, workers=None, tEnd=None, verbose=False):
+    """
+    Run an ensemble of simulations differing by some of their input parameters.
+
+    Args:
+        xml : (str) path to the XML input file shared by all members.
+        overrides : (list) one dictionary per member containing the parsed input parameters to replace,
+            keyed by their attribute name (e.g. :code:`SPLero`, :code:`CDa`, :code:`CDm`, :code:`rainVal`).
+        workers : (int) number of processes (default: :code:`None` to use all available cores).
+        tEnd : (float) time in years up to run the members for (default: :code:`None` for the XML end time).
+        verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+
+    Returns:
+        - summary - pandas DataFrame with one row per member, also written as *ensemble.csv* in the output folder.
+
+    Note:
+        The parameters defining the mesh (DEM file, TIN resolution factor) are shared by all the members and
+        can not be overridden.
+    """
+
+    # Build the mesh once
+    input = xmlParser.xmlParser(xml, makeUniqueOutputDir=True)
+    recGrid, FVmesh = buildMesh.build_mesh(input, input.demfile, verbose)
+    blocks = []
+    gridShell = _share(recGrid, blocks)
+    meshShell = _share(FVmesh, blocks)
+
+    tasks = []
+    for i, params in enumerate(overrides):
+        for key in ("demfile", "Afactor"):
+            if key in params:
+                raise ValueError(
+                    "Input parameter %s defines the ensemble mesh and cannot be overridden."
+                    % key
+                )
+        filename, outDir = _member_xml(xml, input.outDir, i)
+        tasks.append((i, filename, dict(params), gridShell, meshShell, tEnd, verbose))
+
+    try:
+        with multiprocessing.Pool(processes=workers) as pool:
+            results = pool.map(_run_member, tasks, chunksize=1)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    summary = pd.DataFrame(results)
+    summary.to_csv(os.path.join(input.outDir, "ensemble.csv"), index=False)
+
+    return summary
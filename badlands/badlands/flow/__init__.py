@@ -11,3 +11,4 @@ Implementation related to **badlands** flow network algorithm.
 """
 
 from .flowNetwork  import flowNetwork
+from .depressionHierarchy import depressionHierarchy
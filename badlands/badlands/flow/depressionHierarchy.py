@@ -0,0 +1,264 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module defines the depression hierarchy kept between time steps.
+
+For each depression, the hierarchy stores the pit ID of the flooded nodes, the volume of the depression, its
+spill point and the depression (or edge, marine node) where it drains. Between consecutive time steps only a
+small part of the landscape usually changes, the hierarchy is therefore updated incrementally:
+
+- the pit IDs and volumes are only recomputed for the catchments of the real surface containing a node whose
+  elevation or filled elevation changed by more than a given tolerance, whose flooded state or receiver changed,
+- the draining paths are only recomputed for the groups of catchments of the filled surface linked by a
+  depression and containing a node whose receiver, pit ID or marine state changed.
+
+Note:
+    With a tolerance of 0 the hierarchy is identical to the one obtained by rebuilding it from scratch. A
+    positive tolerance keeps the volumes of slowly evolving depressions from the last time they were updated.
+    The hierarchy is invalidated when the TIN is rebuilt.
+"""
+
+import numpy
+
+import os
+
+if "READTHEDOCS" not in os.environ:
+    from badlands import flowalgo
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+
+class depressionHierarchy:
+    """
+    Class holding the depressions parameters between time steps.
+
+    Args:
+        tol: (float) elevation change in metres below which the depressions are not updated.
+        fullRatio: (float) proportion of modified nodes above which the hierarchy is rebuilt from scratch.
+    """
+
+    def __init__(self, tol=0.0, fullRatio=0.5):
+        """
+        Initialization.
+        """
+
+        self.tol = tol
+        self.fullRatio = fullRatio
+        self.reset()
+
+        return
+
+    def reset(self):
+        """
+        Release the hierarchy, this function is called when the TIN is rebuilt.
+        """
+
+        self.pitID = None
+        self.pitVolume = None
+        self.pitDrain = None
+        self.allDrain = None
+        self.spill = None
+
+        self.elev = None
+        self.fillH = None
+        self.flooded = None
+        self.marine = None
+        self.receivers = None
+        self.receivers1 = None
+        self.label = None
+        self.label1 = None
+        self.count1 = None
+
+        # Output buffers of the compiled kernels
+        self.bufID = None
+        self.bufVolume = None
+        self.bufDrain = None
+        self.bufAllDrain = None
+
+        # Number of nodes updated during the last call
+        self.updated = 0
+
+        return
+
+    def update(self, flow, fillH, elev, Acell, sealevel):
+        """
+        Update the depressions parameters for the current flow network.
+
+        Args:
+            flow: class describing the flow network with its receivers and stacks for both surfaces.
+            fillH: numpy array containing the filled elevations from Planchon & Darboux depression-less algorithm.
+            elev: numpy arrays containing the elevation of the TIN nodes.
+            Acell: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`)
+            sealevel: real value giving the sea-level height at considered time step.
+        """
+
+        nodeNb = len(elev)
+        rcv = flow.receivers
+        rcv1 = flow.receivers1
+        stack, offset = flow.localstack, flow.stackOffset
+        stack1, offset1 = flow.localstack1, flow.stackOffset1
+
+        # Catchments of both surfaces labelled by their base level
+        size = numpy.diff(offset)
+        label = -numpy.ones(nodeNb, dtype=int)
+        label[stack] = numpy.repeat(stack[offset[:-1]], size)
+        size1 = numpy.diff(offset1)
+        base1 = stack1[offset1[:-1]]
+        label1 = -numpy.ones(nodeNb, dtype=int)
+        label1[stack1] = numpy.repeat(base1, size1)
+        count1 = numpy.zeros(nodeNb, dtype=int)
+        count1[base1] = size1
+        flooded = fillH > elev
+        marine = fillH < sealevel
+
+        full = self.pitID is None or len(self.pitID) != nodeNb
+        if full:
+            self.elev = numpy.copy(elev)
+            self.fillH = numpy.copy(fillH)
+            self.pitID = -numpy.ones(nodeNb, dtype=numpy.int32)
+            self.pitVolume = numpy.zeros(nodeNb)
+            self.pitDrain = -numpy.ones(nodeNb, dtype=numpy.int32)
+            self.allDrain = -numpy.ones(nodeNb, dtype=numpy.int32)
+            self.spill = -numpy.ones(nodeNb, dtype=numpy.int32)
+            self.bufID = numpy.empty(nodeNb, dtype=numpy.int32)
+            self.bufVolume = numpy.empty(nodeNb)
+            self.bufDrain = numpy.empty(nodeNb, dtype=numpy.int32)
+            self.bufAllDrain = numpy.empty(nodeNb, dtype=numpy.int32)
+            changed = numpy.ones(nodeNb, dtype=bool)
+            redo1 = numpy.ones(len(size1), dtype=bool)
+        else:
+            changed = (
+                (numpy.abs(elev - self.elev) > self.tol)
+                | (numpy.abs(fillH - self.fillH) > self.tol)
+                | (flooded != self.flooded)
+            )
+            # Catchments of the real surface with modified nodes or extent
+            dirty = changed | (rcv1 != self.receivers1) | (label1 != self.label1)
+            redo1 = numpy.logical_or.reduceat(dirty[stack1], offset1[:-1])
+            redo1 |= count1[base1] != self.count1[base1]
+            if size1[redo1].sum() > self.fullRatio * nodeNb:
+                redo1[:] = True
+
+        # Pit ID and volume
+        oldPitID = numpy.copy(self.pitID)
+        oldPit = self.pitVolume > 0.0
+        if redo1.all():
+            sub1 = stack1
+        else:
+            sub1 = stack1[numpy.repeat(redo1, size1)]
+        if len(sub1) > 0:
+            pitID, pitVolume = self.bufID, self.bufVolume
+            flowalgo.basinparameters(sub1, rcv1, elev, fillH, Acell, pitID, pitVolume)
+            self.pitID[sub1] = pitID[sub1]
+            self.pitVolume[sub1] = numpy.maximum(pitVolume[sub1], 0.0)
+            self.elev[sub1] = elev[sub1]
+            self.fillH[sub1] = fillH[sub1]
+        isPit = self.pitVolume > 0.0
+
+        # Groups of filled surface catchments where the draining paths changed
+        if full or len(sub1) == nodeNb:
+            redo = numpy.ones(nodeNb, dtype=bool)
+        else:
+            changed |= (
+                (rcv != self.receivers)
+                | (self.pitID != oldPitID)
+                | (isPit != oldPit)
+                | (marine != self.marine)
+            )
+            if not changed.any():
+                redo = changed
+            else:
+                redo = self._linked_nodes(changed, label, oldPitID)
+                if redo.sum() > self.fullRatio * nodeNb:
+                    redo[:] = True
+
+        # Draining node of each depression
+        pIDs = numpy.where(isPit & redo)[0]
+        if len(pIDs) > 0:
+            # Order the pits based on filled elevation from top to bottom
+            orderPits = numpy.argsort(fillH[pIDs], kind="stable")[::-1]
+            # Find the depression or edge, marine point where a given pit is draining
+            pitDrain, allDrain = self.bufDrain, self.bufAllDrain
+            flowalgo.basindrainage(
+                orderPits, self.pitID, rcv, pIDs, fillH, sealevel, pitDrain
+            )
+            flowalgo.basindrainageall(orderPits, self.pitID, rcv, pIDs, allDrain)
+            self.pitDrain[redo] = pitDrain[redo]
+            self.allDrain[redo] = allDrain[redo]
+        else:
+            self.pitDrain[redo] = -1
+            self.allDrain[redo] = -1
+        self._spill_points(redo, fillH, rcv)
+
+        self.flooded = flooded
+        self.marine = marine
+        self.receivers = numpy.copy(rcv)
+        self.receivers1 = numpy.copy(rcv1)
+        self.label = label
+        self.label1 = label1
+        self.count1 = count1
+        self.updated = int(redo.sum())
+
+        return
+
+    def _linked_nodes(self, changed, label, oldPitID):
+        """
+        Find the nodes belonging to catchments of the filled surface linked to a modified node.
+
+        The draining path of a depression follows the receivers of the filled surface and jumps to the
+        depressions it encounters, catchments are therefore linked by the pit ID of their nodes. The
+        catchments of the previous and current time steps sharing a node are linked as well.
+
+        Args:
+            changed: numpy boolean-type array flagging the modified nodes.
+            label: numpy integer-type array giving the base level of each node on the filled surface.
+            oldPitID: numpy integer-type array containing the pit ID of each node at the previous update.
+
+        Returns:
+            - redo - numpy boolean-type array flagging the nodes where the draining paths need to be computed.
+        """
+
+        nodeNb = len(label)
+        oldLabel = self.label + nodeNb
+        pits = numpy.where(self.pitID >= 0)[0]
+        oldPits = numpy.where(oldPitID >= 0)[0]
+        src = numpy.concatenate((label, label[pits], oldLabel[oldPits]))
+        dst = numpy.concatenate(
+            (oldLabel, label[self.pitID[pits]], oldLabel[oldPitID[oldPits]])
+        )
+        graph = coo_matrix(
+            (numpy.ones(len(src)), (src, dst)), shape=(2 * nodeNb, 2 * nodeNb)
+        )
+        comp = connected_components(graph, directed=False)[1][label]
+        dirty = numpy.zeros(comp.max() + 1, dtype=bool)
+        dirty[comp[changed]] = True
+
+        return dirty[comp]
+
+    def _spill_points(self, redo, fillH, rcv):
+        """
+        Find the spill point of each depression, defined as the node receiving the overflow of its flooded
+        area. When a depression overflows through several nodes, the one with the lowest filled elevation is
+        chosen.
+
+        Args:
+            redo: numpy boolean-type array flagging the nodes to update.
+            fillH: numpy array containing the filled elevations from Planchon & Darboux depression-less algorithm.
+            rcv: numpy integer-type array containing the receivers of the filled surface.
+        """
+
+        self.spill[redo] = -1
+        ids = numpy.where(redo & (self.pitID >= 0))[0]
+        ids = ids[(self.pitID[rcv[ids]] != self.pitID[ids]) & (rcv[ids] != ids)]
+        if len(ids) > 0:
+            ids = ids[numpy.lexsort((fillH[ids], self.pitID[ids]))]
+            pits, first = numpy.unique(self.pitID[ids], return_index=True)
+            self.spill[pits] = rcv[ids[first]]
+
+        return
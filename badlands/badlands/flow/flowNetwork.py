@@ -32,7 +32,11 @@ if "READTHEDOCS" not in os.environ:
     from badlands import sfd
     from badlands import pdalgo
     from badlands import flowalgo
+    from badlands.flow import visualiseFlow
+    from badlands.flow.depressionHierarchy import depressionHierarchy
     from scipy.spatial import cKDTree
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
     from scipy.interpolate import RegularGridInterpolator
     from scipy.ndimage.filters import gaussian_filter
 
@@ -71,8 +75,9 @@ class flowNetwork:
         self.localbase1 = None
         self.receivers = None
         self.receivers1 = None
-        self.arrdonor = None
         self.delta = None
+        self.delta1 = None
+        self.baseNb = None
         self.donors = None
         self.donors1 = None
         self.localstack = None
@@ -80,12 +85,12 @@ class flowNetwork:
         self.stack = None
         self.stack1 = None
         self.partFlow = None
-        self.maxdonors = 0
         self.CFL = None
         self.erodibility = None
         self.mindt = None
         self.spl = False
         self.depo = 0
+        self.work = None
 
         self.discharge = None
         self.localsedflux = None
@@ -93,11 +98,15 @@ class flowNetwork:
         self.maxdep = None
         self.diff_cfl = None
         self.chi = None
+        self.viewKey = None
+        self.viewIDs = None
+        self.viewLines = None
         self.basinID = None
         self.pitID = None
         self.pitVolume = None
         self.pitDrain = None
         self.allDrain = None
+        self.depressions = depressionHierarchy(input.pitTol)
 
         self.xgrid = None
         self.ygrid = None
@@ -119,8 +128,23 @@ class flowNetwork:
         self.b = input.b
         self.deepb = input.deepbasin
         self.critdens = input.denscrit
+        self.overfill = input.overfill
+        self.overfillCheck = input.overfillCheck
+        self.overfillError = None
+        self.splSolver = input.splSolver
+        self.splCheck = input.splCheck
+        self.splError = None
+        self.routing = input.routing
+        self.routingTol = input.routingTol
+        self.routingFull = input.routingFull
+        self.routingStep = 0
+        self.routeUpdate = False
+        self.reset_routing()
         self.flowdensity = None
         self.sedload = None
+        self.outload = 0.0
+        self.erotot = 0.0
+        self.depotot = 0.0
         self.straTIN = 0
         self.activelay = None
 
@@ -146,14 +170,15 @@ class flowNetwork:
         return
 
     def compute_hillslope_diffusion(
-        self, elev, neighbours, edges, distances, globalIDs, type, Sc
+        self, elev, ngbOffset, neighbours, edges, distances, globalIDs, type, Sc
     ):
         """
         Perform hillslope evolution based on diffusion processes.
 
         Args:
             elev: numpy arrays containing the elevation of the TIN nodes.
-            neighbours: numpy integer-type array with the neighbourhood IDs.
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
             edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
             distances: numpy real-type array with the distances between each connection in the TIN.
             globalIDs: numpy integer-type array containing for local nodes their global IDs.
@@ -170,15 +195,28 @@ class flowNetwork:
                 tSc = numpy.zeros(1)
                 tSc[0] = Sc
                 diff_flux = sfd.diffusionnl(
-                    tSc, elev, self.borders2, neighbours, edges, distances, globalIDs
+                    tSc,
+                    elev,
+                    self.borders2,
+                    ngbOffset,
+                    neighbours,
+                    edges,
+                    distances,
+                    globalIDs,
                 )
             else:
                 diff_flux = sfd.diffusion(
-                    elev, self.borders2, neighbours, edges, distances, globalIDs
+                    elev,
+                    self.borders2,
+                    ngbOffset,
+                    neighbours,
+                    edges,
+                    distances,
+                    globalIDs,
                 )
         else:
             diff_flux = sfd.diffusionero(
-                elev, self.borders2, neighbours, edges, distances, globalIDs
+                elev, self.borders2, ngbOffset, neighbours, edges, distances, globalIDs
             )
 
         return diff_flux
@@ -187,6 +225,7 @@ class flowNetwork:
         self,
         elev,
         depoH,
+        ngbOffset,
         neighbours,
         edges,
         distances,
@@ -202,7 +241,8 @@ class flowNetwork:
         Args:
             elev: numpy arrays containing the elevation of the TIN nodes.
             dep: numpy arrays flagging the deposited nodes.
-            neighbours: numpy integer-type array with the neighbourhood IDs.
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
             edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
             distances: numpy real-type array with the distances between each connection in the TIN.
             globalIDs: numpy integer-type array containing for local nodes their global IDs.
@@ -219,6 +259,7 @@ class flowNetwork:
             elev,
             self.borders,
             depoH,
+            ngbOffset,
             neighbours,
             edges,
             distances,
@@ -235,7 +276,17 @@ class flowNetwork:
         return diff_flux, mindt
 
     def compute_failure_diffusion(
-        self, elev, depoH, neighbours, edges, distances, coeff, globalIDs, maxth, tstep
+        self,
+        elev,
+        depoH,
+        ngbOffset,
+        neighbours,
+        edges,
+        distances,
+        coeff,
+        globalIDs,
+        maxth,
+        tstep,
     ):
         """
         Perform slope failure transported sediments diffusion.
@@ -243,7 +294,8 @@ class flowNetwork:
         Args:
             elev: numpy arrays containing the elevation of the TIN nodes.
             dep: numpy arrays flagging the deposited nodes.
-            neighbours: numpy integer-type array with the neighbourhood IDs.
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
             edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
             distances: numpy real-type array with the distances between each connection in the TIN.
             globalIDs: numpy integer-type array containing for local nodes their global IDs.
@@ -260,6 +312,7 @@ class flowNetwork:
             elev,
             self.borders,
             depoH,
+            ngbOffset,
             neighbours,
             edges,
             distances,
@@ -298,6 +351,7 @@ class flowNetwork:
         dep,
         sdep,
         coeff,
+        ngbOffset,
         neighbours,
         seal,
         maxth,
@@ -312,7 +366,8 @@ class flowNetwork:
             elev: numpy arrays containing the elevation of the TIN nodes.
             dep: numpy arrays containing the rock deposition.
             coeff: numpy arrays containing the coefficient value for the diffusion algorithm.
-            neighbours: numpy integer-type array with the neighbourhood IDs.
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
             edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
             distances: numpy real-type array with the distances between each connection in the TIN.
             globalIDs: numpy integer-type array containing for local nodes their global IDs.
@@ -334,6 +389,7 @@ class flowNetwork:
             seal,
             maxth,
             coeff,
+            ngbOffset,
             neighbours,
             edges,
             distances,
@@ -343,7 +399,16 @@ class flowNetwork:
         return diff_prop, diff_flux
 
     def compute_sediment_hillslope(
-        self, elev, difflay, coeff, neighbours, edges, layh, distances, globalIDs
+        self,
+        elev,
+        difflay,
+        coeff,
+        ngbOffset,
+        neighbours,
+        edges,
+        layh,
+        distances,
+        globalIDs,
     ):
         """
         Perform sediment diffusion for multiple rock types.
@@ -352,7 +417,8 @@ class flowNetwork:
             elev: numpy arrays containing the elevation of the TIN nodes.
             difflay: numpy arrays containing the rock type fractions in the active layer.
             coeff: numpy arrays containing the coefficient value for the diffusion algorithm.
-            neighbours: numpy integer-type array with the neighbourhood IDs.
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
             edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
             layh: numpy arrays containing the thickness of the active layer.
             distances: numpy real-type array with the distances between each connection in the TIN.
@@ -374,6 +440,7 @@ class flowNetwork:
             difflay,
             layh,
             coeff,
+            ngbOffset,
             neighbours,
             edges,
             distances,
@@ -382,164 +449,327 @@ class flowNetwork:
 
         return sumdiff, ero, depo
 
-    def SFD_receivers(self, fillH, elev, neighbours, edges, distances, globalIDs):
+    def flow_graph(self, fillH, elev, ngbOffset, neighbours, globalIDs):
         """
-        **Single Flow Direction** function computes downslope flow directions by inspecting the neighborhood
-        elevations around each node. The SFD method assigns a unique flow direction towards the steepest
-        downslope neighbor.
+        Compute the **single flow direction** graphs of the filled and real surfaces in one pass.
+
+        The neighbourhood of each node is traversed only once to get the receivers of both surfaces, the
+        maximum elevation differences used for deposition and the donors of each node stored in compressed
+        sparse row format. The arrays are filled in place in buffers reused between time steps.
 
         Args:
             fillH: numpy array containing the filled elevations from Planchon & Darboux depression-less algorithm.
             elev: numpy arrays containing the elevation of the TIN nodes.
-            neighbours: numpy integer-type array with the neighbourhood IDs.
-            edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
-            distances: numpy real-type array with the distances between each connection in the TIN.
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
             globalIDs: numpy integer-type array containing for local nodes their global IDs.
 
-        To solve channel incision and landscape evolution, the algorithm follows the O(n)-efficient ordering
-        method from Braun and Willett (2013) and is based on a *single-flow-direction* (**SFD**) approximation
-        assuming that water goes down the path of the steepest slope.
-
-        .. seealso::
-            Braun J, Willett SD. A very efficient O(n), implicit and parallel method to solve the stream power equation governing fluvial incision and landscape evolution. Geomorphology. 2013;180–181(Supplement C):170–179.
+        Note:
+            The stacks are then built with :code:`flow_stacks`.
 
+            With the *incremental* routing, the receivers are only computed again around the nodes whose elevations
+            changed by more than :code:`routingTol` since the last update, or whose receiver is not downstream anymore.
+            A full computation is performed every :code:`routingFull` steps.
         """
 
-        # Call the SFD function from libUtils
-        # Get the directions from true surface
-        base1, receivers1 = sfd.directions_base(
-            elev, neighbours, edges, distances, globalIDs
+        work = self.work
+        self.receivers = work.get("receivers", dtype=numpy.int32)
+        self.receivers1 = work.get("receivers1", dtype=numpy.int32)
+        self.maxh = work.get("maxh")
+        self.maxdep = work.get("maxdep")
+        self.delta = work.get("delta", dtype=numpy.int32, extra=1)
+        self.delta1 = work.get("delta1", dtype=numpy.int32, extra=1)
+        self.donors = work.get("donors", dtype=numpy.int32)
+        self.donors1 = work.get("donors1", dtype=numpy.int32)
+        base = work.get("base", dtype=numpy.int32)
+        base1 = work.get("base1", dtype=numpy.int32)
+        self.baseNb = numpy.zeros(2, dtype=numpy.int32)
+        self.viewKey = None
+
+        # Incremental update except every routingFull steps
+        self.routeUpdate = (
+            self.routing == "incremental"
+            and self.fillRef is not None
+            and len(self.fillRef) == len(fillH)
+            and self.routingStep % self.routingFull != 0
         )
+        self.routingStep += 1
 
-        # Send local base level globally
-        bpos = numpy.where(base1 >= 0)[0]
-        self.base1 = base1[bpos]
-
-        # Send local receivers globally
-        self.receivers1 = receivers1
-
-        # Get the directions from filled surface
-        base, receivers, maxh, maxdep = sfd.directions(
-            fillH, elev, neighbours, edges, distances, globalIDs
-        )
-
-        # Send local base level globally
-        bpos = numpy.where(base >= 0)[0]
-        self.base = base[bpos]
-        numpy.random.shuffle(self.base)
+        if self.routeUpdate:
+            self.routeChanged = work.get("changed", dtype=numpy.int32)
+            sfd.flowupdate(
+                fillH,
+                elev,
+                self.fillRef,
+                self.elevRef,
+                self.routingTol,
+                ngbOffset,
+                neighbours,
+                globalIDs,
+                self.receivers,
+                self.receivers1,
+                self.maxh,
+                self.maxdep,
+                self.delta,
+                self.delta1,
+                self.donors,
+                self.donors1,
+                base,
+                base1,
+                self.baseNb,
+                self.routeChanged,
+                work.get("routemark", dtype=numpy.int32),
+            )
 
-        # Send local receivers globally
-        self.receivers = receivers
+            # Base levels keep their order, new ones are appended in random order
+            self.base = self._route_bases(self.routeBase, base[: self.baseNb[0]], True)
+            self.base1 = self._route_bases(self.routeBase1, base1[: self.baseNb[1]])
+        else:
+            sfd.flowgraph(
+                fillH,
+                elev,
+                ngbOffset,
+                neighbours,
+                globalIDs,
+                self.receivers,
+                self.receivers1,
+                self.maxh,
+                self.maxdep,
+                self.delta,
+                self.delta1,
+                self.donors,
+                self.donors1,
+                base,
+                base1,
+                self.baseNb,
+            )
 
-        # Send local maximum height globally
-        self.maxh = maxh
+            # Base levels of the filled surface are processed in random order
+            self.base = numpy.copy(base[: self.baseNb[0]])
+            numpy.random.shuffle(self.base)
+            self.base1 = numpy.copy(base1[: self.baseNb[1]])
+            if self.routing == "incremental":
+                self.fillRef = numpy.copy(fillH)
+                self.elevRef = numpy.copy(elev)
 
-        # Send local maximum deposition globally
-        self.maxdep = maxdep
+        base[: self.baseNb[0]] = self.base
+        base1[: self.baseNb[1]] = self.base1
 
         return
 
-    def _donors_number_array(self):
-        """
-        Creates an array containing the number of donors for each node.
+    def _route_bases(self, old, new, shuffle=False):
         """
+        Order the base levels obtained by the incremental update of the flow graph.
 
-        self.arrdonor = None
-        numPts = len(self.receivers)
-        self.arrdonor = numpy.zeros(numPts, dtype=int)
-        maxID = numpy.max(self.receivers)
-        self.arrdonor[: (maxID + 1)] = numpy.bincount(self.receivers)
-        self.maxdonors = self.arrdonor.max()
-
-        return
+        Args:
+            old: numpy integer-type array containing the base levels of the previous time step in stack order.
+            new: numpy integer-type array containing the current base levels.
+            shuffle: (bool) when :code:`True`, the new base levels are appended in random order.
 
-    def _delta_array(self):
-        """
-        Creates the "delta" array, which is a list containing, for each
-        node, the array index where that node's donor list begins.
+        Returns:
+            - base - numpy integer-type array containing the current base levels in stack order.
         """
 
-        self.delta = None
-        nbdonors = len(self.arrdonor)
-        self.delta = numpy.zeros(nbdonors + 1, dtype=int)
-        self.delta.fill(nbdonors)
-        self.delta[-2::-1] -= numpy.cumsum(self.arrdonor[::-1])
+        isNew = numpy.zeros(len(self.receivers), dtype=bool)
+        isNew[new] = True
+        keep = old[isNew[old]]
+        isNew[keep] = False
+        add = new[isNew[new]]
+        if shuffle:
+            numpy.random.shuffle(add)
 
-        return
+        return numpy.concatenate((keep, add)).astype(numpy.int32)
 
-    def _donors_number_array1(self):
+    def reset_routing(self):
         """
-        Creates an array containing the number of donors for each node.
+        Release the arrays of the incremental flow routing, this function is called when the TIN is rebuilt.
         """
 
-        self.arrdonor = None
-        numPts = len(self.receivers1)
-        self.arrdonor = numpy.zeros(numPts, dtype=int)
-        maxID = numpy.max(self.receivers1)
-        self.arrdonor[: (maxID + 1)] = numpy.bincount(self.receivers1)
-        self.maxdonors = self.arrdonor.max()
+        self.fillRef = None
+        self.elevRef = None
+        self.routeBase = None
+        self.routeBase1 = None
+        self.routeChanged = None
+        self.routeRebuilt = None
+        self.routeSource = None
+        self.routeLand = None
 
         return
 
-    def _delta_array1(self):
-        """
-        Creates the "delta" array, which is a list containing, for each
-        node, the array index where that node's donor list begins.
+    def flow_stacks(self):
         """
+        Creates the arrays of node IDs arranged in order from downstream to upstream for both the filled
+        and real surfaces, using the graphs obtained from :code:`flow_graph`.
 
-        self.delta = None
-        nbdonors = len(self.arrdonor)
-        self.delta = numpy.zeros(nbdonors + 1, dtype=int)
-        self.delta.fill(nbdonors)
-        self.delta[-2::-1] -= numpy.cumsum(self.arrdonor[::-1])
-
-        return
+        With the *incremental* routing, the donors trees of the catchments which did not change are copied from
+        the previous stacks.
 
-    def ordered_node_array_filled(self):
-        """
-        Creates an array of node IDs that is arranged in order from downstream
-        to upstream for filled surface.
+        Note:
+            The stacks, their offsets, the previous stacks and the traversal arrays of the compiled kernels are
+            workspace buffers sized once per mesh.
         """
 
-        # Build donors array for each node
-        self._donors_number_array()
-
-        # Create the delta array
-        self._delta_array()
-
-        # Using libUtils stack create the ordered node array
-        self.donors, lstcks = flowalgo.buildfa(
-            self.localbase, self.receivers, self.delta
-        )
-
-        # Create local stack
-        stids = numpy.where(lstcks > -1)[0]
-        self.localstack = lstcks[stids]
+        work = self.work
+        stack = work.get("stack", dtype=numpy.int32)
+        stack1 = work.get("stack1", dtype=numpy.int32)
+        offset = work.get("stackoffset", dtype=numpy.int32, extra=1)
+        offset1 = work.get("stackoffset1", dtype=numpy.int32, extra=1)
+        # Traversal workspaces of the compiled kernels
+        allocs = work.get("routeallocs", dtype=numpy.int32)
+        nxt = work.get("routenext", dtype=numpy.int32)
+        path = work.get("routepath", dtype=numpy.int32)
+
+        if self.routeUpdate:
+            # Only the donors trees of the modified catchments are traversed
+            self.routeRebuilt = work.get("rebuilt", dtype=numpy.int32)
+            rebuilt1 = work.get("rebuilt1", dtype=numpy.int32)
+            # Previous stacks are copied in a buffer shared by both surfaces
+            oldStack = work.get("oldstack", dtype=numpy.int32)
+            oldOffset = work.get("oldoffset", dtype=numpy.int32, extra=1)
+            mark = work.get("routemark", dtype=numpy.int32)
+            redo = work.get("routeredo", dtype=numpy.int32, extra=1)
+            oldNb = len(self.routeBase)
+            oldEnd = offset[oldNb]
+            oldStack[:oldEnd] = stack[:oldEnd]
+            oldOffset[: oldNb + 1] = offset[: oldNb + 1]
+            sfd.stackupdate(
+                self.base,
+                self.receivers,
+                self.routeChanged,
+                1,
+                self.delta,
+                self.donors,
+                oldStack[:oldEnd],
+                oldOffset[: oldNb + 1],
+                stack,
+                offset,
+                self.routeRebuilt,
+                mark,
+                redo,
+                allocs,
+                nxt,
+                path,
+            )
+            oldNb = len(self.routeBase1)
+            oldEnd = offset1[oldNb]
+            oldStack[:oldEnd] = stack1[:oldEnd]
+            oldOffset[: oldNb + 1] = offset1[: oldNb + 1]
+            sfd.stackupdate(
+                self.base1,
+                self.receivers1,
+                self.routeChanged,
+                2,
+                self.delta1,
+                self.donors1,
+                oldStack[:oldEnd],
+                oldOffset[: oldNb + 1],
+                stack1,
+                offset1,
+                rebuilt1,
+                mark,
+                redo,
+                allocs,
+                nxt,
+                path,
+            )
+            stackNb = [offset[self.baseNb[0]], offset1[self.baseNb[1]]]
+        else:
+            stackNb = numpy.zeros(2, dtype=numpy.int32)
+            sfd.flowstacks(
+                work.get("base", dtype=numpy.int32),
+                work.get("base1", dtype=numpy.int32),
+                self.baseNb,
+                self.receivers,
+                self.receivers1,
+                self.delta,
+                self.delta1,
+                self.donors,
+                self.donors1,
+                stack,
+                stack1,
+                offset,
+                offset1,
+                stackNb,
+                allocs,
+                nxt,
+                path,
+            )
+        self.localbase = self.base
+        self.localbase1 = self.base1
+        self.localstack = stack[: stackNb[0]]
+        self.localstack1 = stack1[: stackNb[1]]
+        self.stackOffset = offset[: self.baseNb[0] + 1]
+        self.stackOffset1 = offset1[: self.baseNb[1] + 1]
+        if self.routing == "incremental":
+            self.routeBase = self.base
+            self.routeBase1 = self.base1
 
         return
 
-    def ordered_node_array_elev(self):
-        """
-        Creates an array of node IDs that is arranged in order from downstream
-        to upstream for real surface.
+    def catchment_groups(self, depressions=False):
         """
+        Partition the stack of the filled surface in groups of independent catchments.
 
-        # Build donors array for each node
-        self._donors_number_array1()
+        The donors tree of each base level occupies a contiguous segment of the stack and its nodes only
+        exchange water and sediment with each other, except through depressions. Groups are processed
+        in parallel by the flow kernels and are ordered by decreasing number of nodes so that the largest
+        catchments are started first.
+
+        Args:
+            depressions: (bool) when :code:`True`, the catchments linked by a depression or by its draining
+                path are gathered in the same group.
 
-        # Create the delta array
-        self._delta_array1()
+        Returns
+        -------
+        group
+            numpy integer-type array giving the position of the first catchment of each group in member.
+        member
+            numpy integer-type array containing the catchments of each group in decreasing stack order.
+        """
 
-        # Using libUtils stack create the ordered node array
-        self.donors1, lstcks = flowalgo.buildfa(
-            self.localbase1, self.receivers1, self.delta
+        offset = self.stackOffset
+        segNb = len(offset) - 1
+        serial = (
+            numpy.array([0, segNb], dtype=numpy.int32),
+            numpy.arange(segNb - 1, -1, -1, dtype=numpy.int32),
         )
+        if segNb < 2 or sfd.get_threads()[0] == 1:
+            return serial
+
+        size = numpy.diff(offset)
+        comp = numpy.arange(segNb)
+        if depressions:
+            label = -numpy.ones(len(self.receivers), dtype=int)
+            label[self.localstack] = numpy.repeat(comp, size)
+            drain = numpy.asarray(self.pitDrain, dtype=int)
+            src = numpy.concatenate(
+                (numpy.where(self.pitID >= 0)[0], numpy.where(drain >= 0)[0])
+            )
+            dst = numpy.concatenate((self.pitID[self.pitID >= 0], drain[drain >= 0]))
+            lsrc = label[src]
+            ldst = label[dst[lsrc >= 0]]
+            lsrc = lsrc[lsrc >= 0]
+            # Depressions draining outside of the stack
+            if (ldst < 0).any():
+                return serial
+            cross = lsrc != ldst
+            if cross.any():
+                graph = coo_matrix(
+                    (numpy.ones(cross.sum()), (lsrc[cross], ldst[cross])),
+                    shape=(segNb, segNb),
+                )
+                comp = connected_components(graph, directed=False)[1]
 
-        # Create local stack
-        stids = numpy.where(lstcks > -1)[0]
-        self.localstack1 = lstcks[stids]
+        # Largest groups first, catchments of a group in decreasing stack order
+        grpNb = comp.max() + 1
+        count = numpy.bincount(comp, weights=size, minlength=grpNb)
+        rank = numpy.empty(grpNb, dtype=int)
+        rank[numpy.argsort(-count, kind="stable")] = numpy.arange(grpNb)
+        member = numpy.lexsort((-numpy.arange(segNb), rank[comp]))
+        group = numpy.zeros(grpNb + 1, dtype=numpy.int32)
+        numpy.cumsum(numpy.bincount(rank[comp], minlength=grpNb), out=group[1:])
 
-        return
+        return group, member.astype(numpy.int32)
 
     def compute_flow(self, sealevel, elev, Acell, rain):
         """
@@ -549,140 +779,277 @@ class flowNetwork:
             elev: numpy arrays containing the elevation of the TIN nodes.
             Acell: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`).
             rain: numpy float-type array containing the precipitation rate for each nodes (in :math:`{m/a}`).
+
+        Note:
+            With the *incremental* routing, the discharge is only computed again in the catchments rebuilt by
+            :code:`flow_stacks` or where the precipitation or the marine nodes changed.
+
+            The discharge and the active layer thickness are written in place by the compiled kernel in
+            workspace buffers sized once per mesh.
         """
 
         numPts = len(Acell)
+        dis = self.work.get("discharge")
+        lay = self.work.get("activelay")
+
+        source = numpy.zeros(numPts, dtype=float)
+        source[self.stack] = Acell[self.stack] * rain[self.stack]
+        land = elev >= sealevel
+
+        if self.routeUpdate and self.routeSource is not None:
+            # Discharge is only computed again in catchments rebuilt or with modified inputs
+            size = numpy.diff(self.stackOffset)
+            modified = (source != self.routeSource) | (land != self.routeLand)
+            redo = self.routeRebuilt[: len(size)] > 0
+            redo |= numpy.logical_or.reduceat(
+                modified[self.localstack], self.stackOffset[:-1]
+            )
+            # Each modified catchment forms a group, the other ones are not processed
+            member = numpy.where(redo)[0]
+            member = member[numpy.argsort(-size[member], kind="stable")]
+            group = numpy.arange(len(member) + 1, dtype=numpy.int32)
+            member = numpy.concatenate((member, numpy.where(~redo)[0]))
+            ids = self.localstack[numpy.repeat(redo, size)]
+            discharge = self.work.get("flowsource")
+            numpy.copyto(discharge, self.discharge)
+            discharge[ids] = source[ids]
+            flowalgo.discharge(
+                sealevel,
+                self.localstack,
+                self.receivers,
+                elev,
+                discharge,
+                self.stackOffset,
+                group,
+                member.astype(numpy.int32),
+                dis,
+                lay,
+            )
+            numpy.subtract(elev, elev[self.receivers], out=lay)
+        else:
+            # Compute discharge using libUtils, catchments are processed in parallel
+            group, member = self.catchment_groups()
+            flowalgo.discharge(
+                sealevel,
+                self.localstack,
+                self.receivers,
+                elev,
+                source,
+                self.stackOffset,
+                group,
+                member,
+                dis,
+                lay,
+            )
+        self.discharge = dis
+        self.activelay = lay
 
-        self.discharge = numpy.zeros(numPts, dtype=float)
-        self.discharge[self.stack] = Acell[self.stack] * rain[self.stack]
-
-        # Compute discharge using libUtils
-        self.discharge, self.activelay = flowalgo.discharge(
-            sealevel, self.localstack, self.receivers, elev, self.discharge
-        )
+        if self.routing == "incremental":
+            self.routeSource = source
+            self.routeLand = land
 
         return
 
-    def view_receivers(self, fillH, elev, neighbours, edges, distances, globalIDs, sea):
+    def view_products(self, step, elev, sealevel, sealimit, outPts, visXlim, visYlim):
         """
-        Single Flow Direction function computes downslope flow directions by inspecting the neighborhood
-        elevations around each node. The SFD method assigns a unique flow direction towards the steepest
-        downslope neighbor.
+        Computes the flow network output (polylines, catchment IDs and Chi parameter) from the stack of the
+        filled surface built during the last flow routing.
+
+        The receivers used for visualisation are the ones of the filled surface except for the nodes below
+        the sea limit which become base levels. The products are cached for the given output step and sea
+        limit and the flow routing arrays are not modified.
 
         Args:
-            fillH: numpy array containing the filled elevations from Planchon & Darboux depression-less algorithm.
+            step: output step.
             elev: numpy arrays containing the elevation of the TIN nodes.
-            neighbours: numpy integer-type array with the neighbourhood IDs.
-            edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
-            distances: numpy real-type array with the distances between each connection in the TIN.
-            globalIDs: numpy integer-type array containing for local nodes their global IDs.
-            sea: current elevation of sea level.
+            sealevel: real value giving the sea-level height at considered time step.
+            sealimit: elevation below which the flow network is not drawn.
+            outPts: numpy integer-type array containing the output node IDs.
+            visXlim: numpy array containing the X-axis extent of visualisation grid.
+            visYlim: numpy array containing the Y-axis extent of visualisation grid.
+
+        Returns
+        -------
+        flowIDs
+            numpy integer-type array containing the output node IDs for the flow network.
+        polylines
+            numpy 2D integer-type array containing the connectivity IDs for each polyline.
+        """
+
+        key = (step, sealevel, sealimit)
+        if self.viewKey == key:
+            return self.viewIDs, self.viewLines
 
-        .. image:: img/stack2.jpg
-           :scale: 80 %
-           :alt: SFD
-           :align: center
+        self.viewIDs, self.viewLines = visualiseFlow.output_Polylines(
+            outPts, self.receivers[outPts], visXlim, visYlim, self.xycoords
+        )
 
-        Nodal representation of the landform. Nodes are indicated as black circles. The lines
-        represent all the possible connections among neighboring nodes. The solid lines indicate
-        the connections following the steepest descent hypothesis (indicated by the arrows).
+        numPts = len(elev)
+        rcv = numpy.copy(self.receivers)
+        ids = numpy.where(elev < sealimit)[0]
+        rcv[ids] = ids
+        # Reorder the stack by catchment of the visualisation receivers, nodes keep their upstream order
+        root = rcv
+        while True:
+            jump = root[root]
+            if numpy.array_equal(jump, root):
+                break
+            root = jump
+        pos = numpy.empty(numPts, dtype=int)
+        pos[self.localstack] = numpy.arange(len(self.localstack))
+        stack = self.localstack[
+            numpy.argsort(pos[root[self.localstack]], kind="stable")
+        ]
+
+        idsl = numpy.where(elev < sealevel)[0]
+        rcv[idsl] = -1
+        self.chi, basinID = flowalgo.parameters(
+            stack, rcv, self.discharge, self.xycoords, 0
+        )
+        self.basinID = numpy.copy(basinID)
+        self.basinID[idsl] = -1
+        self.basinID[ids] = -1
+        self.viewKey = key
 
-        .. seealso::
-            Braun and Willett, 2013: A very efficient O(n), implicit and parallel method to solve
-            the stream power equation governing fluvial incision and landscape evolution - *Geomorphology*,
-            170-179, `doi:10.1016/j.geomorph.2012.10.008`_.
+        return self.viewIDs, self.viewLines
 
+    def compute_parameters_depression(self, fillH, elev, Acell, sealevel, debug=False):
         """
+        Calculates each depression maximum deposition volume and its downstream draining node.
 
-        # Call the SFD function from libUtils
-        base, receivers = sfd.dirview(
-            fillH, elev, neighbours, edges, distances, globalIDs, sea
-        )
+        Args:
+            fillH: numpy array containing the filled elevations from Planchon & Darboux depression-less algorithm.
+            elev: numpy arrays containing the elevation of the TIN nodes.
+            Acell: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`)
+            sealevel: real value giving the sea-level height at considered time step.
 
-        # Send local base level globally
-        bpos = numpy.where(base >= 0)[0]
-        self.base = base[bpos]
-        numpy.random.shuffle(self.base)
+        Note:
+            The depressions are kept between time steps in a :code:`depressionHierarchy` and only the
+            catchments where the surface changed are updated.
+        """
 
-        # Send local receivers globally
-        self.receivers = receivers
-        self.localbase = self.base
-        self.ordered_node_array_filled()
+        # Update the persistent depression hierarchy
+        self.depressions.update(self, fillH, elev, Acell, sealevel)
+        self.pitID = self.depressions.pitID
+        self.pitVolume = self.depressions.pitVolume
+        self.pitDrain = self.depressions.pitDrain
+        self.allDrain = self.depressions.allDrain
 
-        globalstack = self.localstack
-        self.stack = globalstack
+        # Debugging plotting function
+        if debug:
+            pIDs = numpy.where(self.pitVolume > 0.0)[0]
+            self._visualise_draining_path(pIDs, elev, self.pitDrain, fillH, "drain")
+            self._visualise_draining_path(pIDs, elev, self.allDrain, fillH, "alldrain")
 
         return
 
-    def compute_parameters(self, elevation, sealevel):
-        """
-        Calculates the catchment IDs and the Chi parameter (Willett 2014).
+    def _flux_error(self, fluxes, ref):
         """
+        Compare two solutions of the stream power volumetric fluxes.
 
-        # Get basin starting IDs for each local partition
-        cumbase = numpy.zeros(2)
-        for i in range(1):
-            cumbase[i + 1] = len(numpy.array_split(self.base, 1)[i]) + cumbase[i] + 1
+        Args:
+            fluxes: tuple containing the erosion, deposition and sediment load arrays to evaluate.
+            ref: tuple containing the same arrays for the reference solution.
 
-        # Compute discharge using libUtils
-        idsl = numpy.where(elevation < sealevel)[0]
-        rcv = numpy.copy(self.receivers)
-        rcv[idsl] = -1
-        chi, basinID = flowalgo.parameters(
-            self.localstack, rcv, self.discharge, self.xycoords, cumbase[0]
-        )
+        Returns:
+            - error - maximum relative difference (L1 norm) over the erosion, deposition and sediment load.
+        """
 
-        self.chi = chi
-        self.basinID = numpy.copy(basinID)
-        self.basinID[idsl] = -1
+        error = 0.0
+        for val, refval in zip(fluxes, ref):
+            norm = numpy.sum(numpy.abs(refval))
+            if norm > 0.0:
+                error = max(error, numpy.sum(numpy.abs(val - refval)) / norm)
 
-        return
+        return error
 
-    def compute_parameters_depression(self, fillH, elev, Acell, sealevel, debug=False):
+    def _stream_power(
+        self,
+        Acell,
+        elev,
+        fillH,
+        rivqs,
+        eroCoeff,
+        actlay,
+        perc_dep,
+        slp_cr,
+        sealevel,
+        dt,
+        group,
+        member,
+        implicit,
+    ):
         """
-        Calculates each depression maximum deposition volume and its downstream draining node.
+        Computes the stream power volumetric fluxes over a given time step.
 
         Args:
-            fillH: numpy array containing the filled elevations from Planchon & Darboux depression-less algorithm.
-            elev: numpy arrays containing the elevation of the TIN nodes.
             Acell: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`)
+            elev: numpy arrays containing the elevation of the TIN nodes.
+            fillH: numpy array containing the lake elevations.
+            rivqs: numpy arrays representing the sediment fluxes from rivers.
+            eroCoeff: numpy float-type array containing the erodibility of each rock type for each node.
+            actlay: active layer composition.
+            perc_dep: maximum percentage of deposition at any given time interval.
+            slp_cr: critical slope used to force aerial deposition for alluvial plain.
             sealevel: real value giving the sea-level height at considered time step.
-        """
+            dt: real value corresponding to the time step.
+            group: numpy integer-type array containing the offsets of each group of catchments in member.
+            member: numpy integer-type array containing the stack segments of each group.
+            implicit: (bool) when :code:`True`, the detachment-limited incision of continental nodes is
+                solved implicitly.
 
-        # Compute pit ID and volume using libUtils
-        pitID, pitVolume = flowalgo.basinparameters(
-            self.localstack1, self.receivers1, elev, fillH, Acell
-        )
+        Returns
+        -------
+        fluxes
+            tuple containing the deposition, erosion, sediment load, slope and flow density arrays.
+        """
 
-        self.pitID = pitID
-        self.pitVolume = pitVolume
-        self.pitVolume[self.pitVolume <= 0] = 0.0
-
-        # Find the depression node IDs
-        pIDs = numpy.where(self.pitVolume > 0.0)[0]
-        if len(pIDs) > 0:
-            xyidd = numpy.where(self.pitVolume == self.pitVolume.max())[0]
-            # Order the pits based on filled elevation from top to bottom
-            orderPits = numpy.argsort(fillH[pIDs])[::-1]
-            # Find the depression or edge, marine point where a given pit is draining
-            self.pitDrain = flowalgo.basindrainage(
-                orderPits, self.pitID, self.receivers, pIDs, fillH, sealevel
-            )
-            self.allDrain = flowalgo.basindrainageall(
-                orderPits, self.pitID, self.receivers, pIDs
+        rate = self.work.zeros("splrate")
+        if implicit:
+            rate = flowalgo.implicitspl(
+                self.localstack,
+                self.receivers,
+                self.xycoords,
+                self.discharge,
+                fillH,
+                elev,
+                eroCoeff,
+                actlay,
+                sealevel,
+                sealevel + self.deepb,
+                dt,
+                self.stackOffset,
             )
 
-            # Debugging plotting function
-            if debug:
-                self._visualise_draining_path(pIDs, elev, self.pitDrain, fillH, "drain")
-                self._visualise_draining_path(
-                    pIDs, elev, self.allDrain, fillH, "alldrain"
-                )
-        else:
-            self.pitDrain = -numpy.ones(len(pitID))
-            self.allDrain = -numpy.ones(len(pitID))
-
-        return
+        return flowalgo.streampower(
+            self.critdens,
+            self.localstack,
+            self.receivers,
+            self.pitID,
+            self.pitVolume,
+            self.pitDrain,
+            self.xycoords,
+            Acell,
+            self.maxh,
+            self.maxdep,
+            self.discharge,
+            fillH,
+            elev,
+            rivqs,
+            eroCoeff,
+            actlay,
+            perc_dep,
+            slp_cr,
+            sealevel,
+            sealevel + self.deepb,
+            dt,
+            self.borders,
+            int(implicit),
+            rate,
+            self.stackOffset,
+            group,
+            member,
+        )
 
     def compute_sedflux(
         self,
@@ -728,6 +1095,20 @@ class flowNetwork:
         newdt
             new time step to ensure flow computation stability.
 
+        Note:
+            When internally drained depressions overfill, the time step is reduced. By default (*rerun*) the
+            stream power is computed a second time with the reduced time step, whereas the *rescale* mode
+            linearly rescales the fluxes of the first pass. The rescaled fluxes are an approximation as the
+            deposition limits in depressions and the maximum deposition thickness do not scale linearly with the
+            time step. When :code:`overfillCheck` is set, both solutions are computed and their relative difference
+            is stored in :code:`overfillError`.
+
+            With the *implicit* solver, the detachment-limited incision of continental nodes is solved from
+            downstream to upstream following Braun and Willett (2013) and is not restricted by the flow CFL
+            condition. Marine nodes and the flux-dependent deposition keep the explicit formulation. When
+            :code:`splCheck` is set, the explicit fluxes are computed over the same time step and their relative
+            difference is stored in :code:`splError`.
+
         """
 
         check = False
@@ -735,9 +1116,9 @@ class flowNetwork:
         newdt = numpy.copy(dt)
 
         if actlay is None:
-            sedflux = numpy.zeros((len(elev), 1))
+            sedflux = self.work.zeros("sedflux", 1)
         else:
-            sedflux = numpy.zeros((len(elev), len(rockCk)))
+            sedflux = self.work.zeros("sedflux", len(rockCk))
 
         # Compute sediment flux using libUtils
         # Stream power law
@@ -762,30 +1143,48 @@ class flowNetwork:
             if actlay is None:
                 actlay = numpy.zeros((len(elev), 1))
 
-            cdepo, cero, sedload, slopeTIN, flowdensity = flowalgo.streampower(
-                self.critdens,
-                self.localstack,
-                self.receivers,
-                self.pitID,
-                self.pitVolume,
-                self.pitDrain,
-                self.xycoords,
+            # Catchments exchanging sediment through depressions are processed by the same thread
+            group, member = self.catchment_groups(depressions=True)
+
+            implicit = self.splSolver == "implicit"
+            fluxes = self._stream_power(
                 Acell,
-                self.maxh,
-                self.maxdep,
-                self.discharge,
-                fillH,
                 elev,
+                fillH,
                 rivqs,
                 eroCoeff,
                 actlay,
                 perc_dep,
                 slp_cr,
                 sealevel,
-                sealevel + self.deepb,
                 newdt,
-                self.borders,
+                group,
+                member,
+                implicit,
             )
+            cdepo, cero, sedload, slopeTIN, flowdensity = fluxes
+            if implicit and self.splCheck:
+                explicit = self._stream_power(
+                    Acell,
+                    elev,
+                    fillH,
+                    rivqs,
+                    eroCoeff,
+                    actlay,
+                    perc_dep,
+                    slp_cr,
+                    sealevel,
+                    newdt,
+                    group,
+                    member,
+                    False,
+                )
+                self.splError = self._flux_error(fluxes[:3], explicit[:3])
+                if verbose:
+                    print(
+                        "Implicit stream power relative difference with the explicit scheme:",
+                        self.splError,
+                    )
             if self.depo == 0:
                 volChange = cero
             else:
@@ -830,30 +1229,40 @@ class flowNetwork:
                 time1 = time.process_time()
 
             if newdt < dt:
-                cdepo, cero, sedload, slopeTIN, flowdensity = flowalgo.streampower(
-                    self.critdens,
-                    self.localstack,
-                    self.receivers,
-                    self.pitID,
-                    self.pitVolume,
-                    self.pitDrain,
-                    self.xycoords,
-                    Acell,
-                    self.maxh,
-                    self.maxdep,
-                    self.discharge,
-                    fillH,
-                    elev,
-                    rivqs,
-                    eroCoeff,
-                    actlay,
-                    perc_dep,
-                    slp_cr,
-                    sealevel,
-                    sealevel + self.deepb,
-                    newdt,
-                    self.borders,
-                )
+                if self.overfill == "rescale":
+                    # Approximate the fluxes over the admissible time step by linearly rescaling the first
+                    # pass, the depression and deposition limits are not linear in dt
+                    scale = newdt / dt
+                    cdepo *= scale
+                    cero *= scale
+                    sedload *= scale
+                if self.overfill == "rerun" or self.overfillCheck:
+                    rerun = self._stream_power(
+                        Acell,
+                        elev,
+                        fillH,
+                        rivqs,
+                        eroCoeff,
+                        actlay,
+                        perc_dep,
+                        slp_cr,
+                        sealevel,
+                        newdt,
+                        group,
+                        member,
+                        implicit,
+                    )
+                    if self.overfill == "rerun":
+                        cdepo, cero, sedload, slopeTIN, flowdensity = rerun
+                    else:
+                        self.overfillError = self._flux_error(
+                            (cdepo, cero, sedload), rerun[:3]
+                        )
+                        if verbose:
+                            print(
+                                "Overfill rescaling relative difference with the two-pass solution:",
+                                self.overfillError,
+                            )
                 volChange = cdepo + cero
                 if verbose:
                     print(
@@ -886,12 +1295,12 @@ class flowNetwork:
             self.flowdensity = den
             # Sediment volume going out
             outload = numpy.sum(sedload[self.outsideIDs, :])
+            self.outload = outload
 
             # Compute erosion
-            erosion = numpy.zeros(cero.shape)
-            erosion[self.insideIDs, :] = cero[self.insideIDs, :] / Acell[
-                self.insideIDs
-            ].reshape(len(self.insideIDs), 1)
+            invArea = self.work.insideInvArea.reshape(len(elev), 1)
+            erosion = self.work.get("erosion", cero.shape[1])
+            numpy.multiply(cero, invArea, out=erosion)
             if verbose:
                 print("   - Compute erosion ", time.process_time() - time1)
                 time1 = time.process_time()
@@ -899,12 +1308,13 @@ class flowNetwork:
             # Compute deposition
             if self.depo == 0:
                 # Purely erosive case
-                deposition = numpy.zeros(cdepo.shape)
+                deposition = self.work.zeros("deposition", cdepo.shape[1])
             else:
-                depo = numpy.zeros(cdepo.shape)
-                depo[self.insideIDs, :] = cdepo[self.insideIDs, :]
-                deposition = numpy.zeros(depo.shape)
-                tmpdep = numpy.zeros(depo.shape)
+                depo = self.work.get("depo", cdepo.shape[1])
+                numpy.multiply(
+                    cdepo, self.work.insideMask.reshape(len(elev), 1), out=depo
+                )
+                deposition = self.work.zeros("deposition", cdepo.shape[1])
 
                 # Compute alluvial plain deposition
                 (
@@ -936,23 +1346,30 @@ class flowNetwork:
                 # Compute land pit deposition
                 if nland > 0:
                     landIDs = landid[:nland]
-                    for p in range(len(landIDs)):
-                        tmp = numpy.where(self.pitID == landIDs[p])[0]
-                        if len(tmp) == 1:
-                            tmpdep[tmp, :] = (fillH[tmp] - elev[tmp]) * perc[
-                                landIDs[p], :
-                            ]
-                        else:
-                            tmpdep[tmp, :] = (fillH[tmp] - elev[tmp]).reshape(
-                                len(tmp), 1
-                            ) * perc[landIDs[p], :]
-                        tmpd = numpy.sum(
-                            tmpdep[tmp, :] * Acell[tmp].reshape(len(Acell[tmp]), 1)
-                        )
-                        dfrac = numpy.sum(depo[landIDs[p], :]) / tmpd
-                        tmpdep[tmp, :] *= dfrac
-                        deposition[tmp, :] += tmpdep[tmp, :]
-                        # depo[tmp,:] -= tmpdep[tmp,:]*Acell[tmp].reshape(len(Acell[tmp]),1)
+                    # Nodes belonging to the land pits
+                    isLand = numpy.zeros(len(elev), dtype=bool)
+                    isLand[landIDs] = True
+                    tmp = numpy.where(self.pitID >= 0)[0]
+                    tmp = tmp[isLand[self.pitID[tmp]]]
+                    pits = self.pitID[tmp]
+                    # Fill each pit proportionally to its depth
+                    tmpdep = (fillH[tmp] - elev[tmp]).reshape(len(tmp), 1) * perc[
+                        pits, :
+                    ]
+                    tmpd = numpy.bincount(
+                        pits,
+                        weights=numpy.sum(tmpdep, axis=1) * Acell[tmp],
+                        minlength=len(elev),
+                    )
+                    dfrac = numpy.zeros(len(elev))
+                    numpy.divide(
+                        numpy.sum(depo, axis=1),
+                        tmpd,
+                        out=dfrac,
+                        where=isLand & (tmpd > 0.0),
+                    )
+                    tmpdep *= dfrac[pits].reshape(len(tmp), 1)
+                    deposition[tmp, :] += tmpdep
                     depo[landIDs, :] = 0.0
                     if verbose:
                         print(
@@ -965,7 +1382,7 @@ class flowNetwork:
                 if nsea > 0:
                     # Distribute marine sediments based on angle of repose
                     seaIDs = seaid[:nsea]
-                    seavol = numpy.zeros(depo.shape)
+                    seavol = self.work.zeros("seavol", depo.shape[1])
                     seavol[seaIDs, :] = depo[seaIDs, :]
                     seadep = pdalgo.marine_distribution(
                         elev, seavol, sealevel, self.borders, seaIDs, slopeTIN
@@ -982,30 +1399,24 @@ class flowNetwork:
 
                 # Is there some remaining deposits?
                 if numpy.any(depo):
-                    deposition[self.insideIDs, :] += depo[self.insideIDs, :] / Acell[
-                        self.insideIDs
-                    ].reshape(len(self.insideIDs), 1)
+                    numpy.multiply(depo, invArea, out=depo)
+                    deposition += depo
 
             # Define erosion/deposition changes
-            sedflux[self.insideIDs, :] = (
-                erosion[self.insideIDs, :] + deposition[self.insideIDs, :]
-            )
+            numpy.add(erosion, deposition, out=sedflux)
+            sedflux[self.outsideIDs, :] = 0.0
 
-            erotot = -numpy.sum(
-                erosion[self.insideIDs, :]
-                * Acell[self.insideIDs].reshape(len(self.insideIDs), 1)
-            )
-            depotot = numpy.sum(
-                deposition[self.insideIDs, :]
-                * Acell[self.insideIDs].reshape(len(self.insideIDs), 1)
-            )
+            erotot = -numpy.sum(self.work.insideArea.dot(erosion))
+            depotot = numpy.sum(self.work.insideArea.dot(deposition))
             depotot += outload
             if self.depo > 0 and erotot > depotot and erotot > 0.0:
                 frac = depotot / erotot
-                erosion[self.insideIDs, :] *= frac
-                sedflux[self.insideIDs, :] = (
-                    erosion[self.insideIDs, :] + deposition[self.insideIDs, :]
-                )
+                erosion *= frac
+                numpy.add(erosion, deposition, out=sedflux)
+                sedflux[self.outsideIDs, :] = 0.0
+                erotot = depotot
+            self.erotot = erotot
+            self.depotot = depotot
 
             if verbose:
                 print("   - Total sediment flux time ", time.process_time() - time0)
@@ -1091,8 +1502,16 @@ class flowNetwork:
         Args:
             elev: numpy arrays containing the elevation of the TIN nodes.
             locIDs: numpy integer-type array containing local nodes global IDs.
+
+        Note:
+            With the *implicit* stream power solver the flow processes do not limit the time step.
         """
 
+        # The implicit solver is unconditionally stable
+        if self.splSolver == "implicit":
+            self.CFL = 1.0e6
+            return
+
         # Compute the local value for time stability
         dt = flowalgo.flowcfl(
             locIDs,
@@ -469,13 +469,14 @@ class forceSim:
 
         return tinRain
 
-    def disp_border(self, disp, neighbours, edge_length, boundPts):
+    def disp_border(self, disp, ngbOffset, neighbours, edge_length, boundPts):
         """
         This function defines the displacement of the TIN edges.
 
         Args:
             disp: numpy arrays containing the internal nodes displacement value.
-            neighbours: numpy integer-type array containing for each nodes its neigbhours IDs.
+            ngbOffset: numpy integer-type array containing for each nodes the position of its first neighbour.
+            neighbours: numpy integer-type array containing the neigbhours IDs of all nodes.
             edge_length: numpy float-type array containing the lengths to each neighbour.
             boundPts: number of nodes on the edges of the TIN surface.
 
@@ -487,12 +488,12 @@ class forceSim:
         disp[:boundPts] = 1.0e7
         missedPts = []
         for id in range(boundPts):
-            ngbhs = neighbours[id, :]
+            ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
             ids = numpy.where(ngbhs >= boundPts)[0]
             if len(ids) == 1:
                 disp[id] = disp[ngbhs[ids]]
             elif len(ids) > 1:
-                lselect = edge_length[id, ids]
+                lselect = edge_length[ngbOffset[id] + ids]
                 picked = numpy.argmin(lselect)
                 disp[id] = disp[ngbhs[ids[picked]]]
             else:
@@ -501,7 +502,7 @@ class forceSim:
         if len(missedPts) > 0:
             for p in range(len(missedPts)):
                 id = int(missedPts[p])
-                ngbhs = neighbours[id, :]
+                ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
                 ids = numpy.where((disp[ngbhs] < 9.0e6) & (ngbhs >= 0))[0]
                 if len(ids) == 0:
                     raise ValueError(
@@ -509,7 +510,7 @@ class forceSim:
                         "%d"
                         "." % id
                     )
-                lselect = edge_length[id, ids]
+                lselect = edge_length[ngbOffset[id] + ids]
                 picked = numpy.argmin(lselect)
                 disp[id] = disp[ngbhs[ids[picked]]]
 
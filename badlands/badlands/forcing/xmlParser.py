@@ -41,6 +41,7 @@ class xmlParser:
         self.fillmax = 200.0
         self.Afactor = 1
         self.nopit = 0
+        self.pitTiles = 1
         self.udw = 0
         self.searef = None
         self.poro0 = 0.0
@@ -56,6 +57,12 @@ class xmlParser:
         self.mesh = None
         self.minDT = 1.0
         self.maxDT = 1.0e6
+        self.adaptOut = False
+        self.tOutMin = None
+        self.tOutMax = None
+        self.outDzMax = None
+        self.outDzRMS = None
+        self.outFlux = None
 
         self.stratdx = 0.0
         self.laytime = 0.0
@@ -109,6 +116,14 @@ class xmlParser:
         self.spl = False
         self.deepbasin = -10000.0
         self.denscrit = 20000.0
+        self.overfill = "rerun"
+        self.overfillCheck = False
+        self.splSolver = "explicit"
+        self.splCheck = False
+        self.pitTol = 0.0
+        self.routing = "full"
+        self.routingTol = 0.0
+        self.routingFull = 10
 
         self.incisiontype = 0
         self.mp = 0.0
@@ -126,6 +141,10 @@ class xmlParser:
         self.Sfail = 0.0
         self.Cfail = 0.0
         self.CDr = 0.0
+        self.hillSolver = "explicit"
+        self.picardIt = 10
+        self.picardTol = 1.0e-3
+        self.transportSolver = "explicit"
         self.makeUniqueOutputDir = makeUniqueOutputDir
 
         self.outDir = None
@@ -279,6 +298,14 @@ class xmlParser:
             else:
                 self.nopit = 0
             element = None
+            element = grid.find("pit_tiles")
+            if element is not None:
+                self.pitTiles = int(element.text)
+                if self.pitTiles < 1:
+                    raise ValueError(
+                        "Number of depression filling tiles along each axis needs to be at least 1."
+                    )
+            element = None
             element = grid.find("udw")
             if element is not None:
                 self.udw = int(element.text)
@@ -375,6 +402,38 @@ class xmlParser:
                 self.maxDT = float(element.text)
             else:
                 self.maxDT = self.tDisplay
+            adapt = None
+            adapt = time.find("adaptive")
+            if adapt is not None:
+                self.adaptOut = True
+                element = None
+                element = adapt.find("maxdisplay")
+                if element is not None:
+                    self.tOutMax = float(element.text)
+                else:
+                    self.tOutMax = self.tDisplay
+                element = None
+                element = adapt.find("mindisplay")
+                if element is not None:
+                    self.tOutMin = float(element.text)
+                else:
+                    self.tOutMin = self.tOutMax / 10.0
+                if self.tOutMin <= 0.0 or self.tOutMin > self.tOutMax:
+                    raise ValueError(
+                        "Error in the definition of the adaptive output: minimum display interval needs to be positive and lower than the maximum one."
+                    )
+                element = None
+                element = adapt.find("dzmax")
+                if element is not None:
+                    self.outDzMax = float(element.text)
+                element = None
+                element = adapt.find("dzrms")
+                if element is not None:
+                    self.outDzRMS = float(element.text)
+                element = None
+                element = adapt.find("fluxchange")
+                if element is not None:
+                    self.outFlux = float(element.text)
         else:
             raise ValueError(
                 "Error in the XmL file: time structure definition is required!"
@@ -1051,6 +1110,62 @@ class xmlParser:
             if element is not None:
                 self.deepbasin = float(element.text)
             element = None
+            element = spl.find("overfill")
+            if element is not None:
+                self.overfill = element.text.strip()
+                if self.overfill not in ("rerun", "rescale"):
+                    raise ValueError(
+                        "Overfilled depressions treatment needs to be either rerun or rescale."
+                    )
+            element = None
+            element = spl.find("overfill_check")
+            if element is not None:
+                self.overfillCheck = int(element.text) > 0
+            element = None
+            element = spl.find("solver")
+            if element is not None:
+                self.splSolver = element.text.strip()
+                if self.splSolver not in ("explicit", "implicit"):
+                    raise ValueError(
+                        "Stream power solver needs to be either explicit or implicit."
+                    )
+            element = None
+            element = spl.find("solver_check")
+            if element is not None:
+                self.splCheck = int(element.text) > 0
+            element = None
+            element = spl.find("pit_tol")
+            if element is not None:
+                self.pitTol = float(element.text)
+                if self.pitTol < 0:
+                    raise ValueError(
+                        "Elevation change tolerance for depressions update needs to be positive."
+                    )
+            element = None
+            element = spl.find("routing")
+            if element is not None:
+                self.routing = element.text.strip()
+                if self.routing not in ("full", "incremental"):
+                    raise ValueError(
+                        "Flow routing needs to be either full or incremental."
+                    )
+            element = None
+            element = spl.find("routing_tol")
+            if element is not None:
+                self.routingTol = float(element.text)
+                if self.routingTol < 0:
+                    raise ValueError(
+                        "Elevation change tolerance for incremental flow routing needs to be positive."
+                    )
+            element = None
+            element = spl.find("routing_full")
+            if element is not None:
+                self.routingFull = int(element.text)
+                if self.routingFull < 1:
+                    raise ValueError(
+                        "Number of steps between full flow routing computations needs to be at least 1."
+                    )
+            element = None
             element = spl.find("diffprop")
             if element is not None:
                 self.diffprop = float(element.text)
@@ -1143,6 +1258,13 @@ class xmlParser:
             else:
                 self.bedslptype = 0
 
+        if self.splSolver == "implicit" and (
+            self.incisiontype > 0 or self.bedslptype > 0
+        ):
+            raise ValueError(
+                "The implicit stream power solver is only available for the detachment-limited law without bedload slope dependency."
+            )
+
         # Extract linear and nonlinear slope diffusion structure parameters
         creep = None
         creep = root.find("creep")
@@ -1189,6 +1311,38 @@ class xmlParser:
                 self.CDr = float(element.text)
             else:
                 self.CDr = 0.0
+            element = None
+            element = creep.find("solver")
+            if element is not None:
+                self.hillSolver = element.text.strip()
+                if self.hillSolver not in ("explicit", "implicit"):
+                    raise ValueError(
+                        "Hillslope diffusion solver needs to be either explicit or implicit."
+                    )
+            element = None
+            element = creep.find("picard_it")
+            if element is not None:
+                self.picardIt = int(element.text)
+                if self.picardIt < 1:
+                    raise ValueError(
+                        "Number of Picard iterations for non-linear diffusion needs to be at least 1."
+                    )
+            element = None
+            element = creep.find("picard_tol")
+            if element is not None:
+                self.picardTol = float(element.text)
+                if self.picardTol <= 0:
+                    raise ValueError(
+                        "Tolerance of the Picard iterations for non-linear diffusion needs to be positive."
+                    )
+            element = None
+            element = creep.find("transport_solver")
+            if element is not None:
+                self.transportSolver = element.text.strip()
+                if self.transportSolver not in ("explicit", "implicit"):
+                    raise ValueError(
+                        "Marine and slope failure diffusion solver needs to be either explicit or implicit."
+                    )
             self.Hillslope = True
         else:
             self.CDa = 0.0
@@ -11,3 +11,4 @@ Implementation related to **badlands** *hillslope* processes.
 """
 
 from .diffLinear import diffLinear
+from .diffImplicit import diffImplicit
@@ -0,0 +1,452 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module defines the implicit solver of the hillslope diffusion.
+
+The explicit hillslope diffusion is bounded by a CFL condition depending on the square of the smallest TIN edge.
+Here the diffusion equation is solved with a *backward Euler* scheme using the Finite Volume discretisation of the
+TIN: for each node *i* of area :math:`A_i`,
+
+.. math::
+
+  A_i \\frac{z_i^{t+\\Delta t} - z_i^t}{\\Delta t} = \\sum_j \\kappa_{ij} \\frac{l_{ij}}{d_{ij}} (z_j^{t+\\Delta t} - z_i^{t+\\Delta t})
+
+where :math:`l_{ij}` is the voronoi edge length and :math:`d_{ij}` the distance between the nodes. The interface
+coefficient :math:`\\kappa_{ij}` is the harmonic mean of the aerial or marine diffusion coefficients of the two
+nodes, the exchanged volumes are therefore symmetric and the scheme is mass-conservative.
+
+Nodes outside the diffusion domain keep their elevations. As for the explicit scheme, the nodes inside the domain
+exchange sediment with the fixed nodes of the domain and only lose sediment towards lower nodes on its edges.
+
+The sparse matrix factorisation is kept while the mesh, the time step, the aerial/marine coefficient split and the
+edges losing sediment are unchanged. The non-linear diffusion uses Picard iterations where the slope-dependent
+coefficients are evaluated with the elevations of the previous iteration.
+
+The same discretisation is used to diffuse the river-fed marine deposits and the slope failure material over a
+whole time step, instead of sub-cycling the explicit scheme.
+"""
+
+import numpy
+
+import os
+
+if "READTHEDOCS" not in os.environ:
+    from scipy.sparse import csc_matrix
+    from scipy.sparse.linalg import factorized
+
+
+class diffImplicit:
+    """
+    Class for solving the hillslope, marine and slope failure diffusion implicitly.
+
+    Args:
+        maxIt: (int) maximum number of Picard iterations for the non-linear diffusion.
+        tol: (float) elevation change in metres between two Picard iterations below which the solution is accepted.
+    """
+
+    def __init__(self, maxIt=10, tol=1.0e-3):
+        """
+        Initialization.
+        """
+
+        self.maxIt = maxIt
+        self.tol = tol
+        self.reset()
+
+        return
+
+    def reset(self):
+        """
+        Release the mesh connectivity and the cached factorisation, this function is called when the TIN is rebuilt.
+        """
+
+        self.rows = None
+        self.cols = None
+        self.weight = None
+
+        self.key = None
+        self.solve = None
+
+        # Number of factorisations and Picard iterations performed during the last call
+        self.factorisations = 0
+        self.iterations = 0
+
+        return
+
+    def __getstate__(self):
+        """
+        Drop the cached factorisation, which cannot be pickled, it is rebuilt by the next linear solve.
+        """
+
+        state = self.__dict__.copy()
+        state["key"] = None
+        state["solve"] = None
+
+        return state
+
+    def _edges(self, ngbOffset, neighbours, edges, distances):
+        """
+        Build the edges list of the Finite Volume discretisation.
+
+        Args:
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
+            edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
+            distances: numpy real-type array with the distances between each connection in the TIN.
+        """
+
+        if self.rows is not None and len(self.rows) == len(neighbours):
+            return
+
+        count = numpy.diff(ngbOffset)
+        self.rows = numpy.repeat(numpy.arange(len(count)), count)
+        self.cols = numpy.asarray(neighbours, dtype=int)
+        self.weight = numpy.zeros(len(neighbours))
+        valid = distances > 0.0
+        self.weight[valid] = edges[valid] / distances[valid]
+
+        return
+
+    def _matrix(self, ids, loc, cw, inner, bound, area, dt):
+        """
+        Assemble the backward Euler matrix for the nodes inside the diffusion domain.
+
+        Args:
+            ids: numpy integer-type array containing the nodes inside the diffusion domain.
+            loc: numpy integer-type array containing the position of each node in the linear system.
+            cw: numpy float-type array containing the diffusion coefficient times the geometric weight of each edge.
+            inner: numpy boolean-type array flagging the edges between two nodes of the domain.
+            bound: numpy boolean-type array flagging the edges between a node of the domain and a fixed node.
+            area: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`)
+            dt: real value corresponding to the time step.
+
+        Returns:
+            - mat - scipy sparse matrix in compressed sparse column format.
+        """
+
+        nb = len(ids)
+        edge = inner | bound
+        diag = area[ids] + dt * numpy.bincount(
+            loc[self.rows[edge]], weights=cw[edge], minlength=nb
+        )
+        rows = numpy.concatenate((numpy.arange(nb), loc[self.rows[inner]]))
+        cols = numpy.concatenate((numpy.arange(nb), loc[self.cols[inner]]))
+        vals = numpy.concatenate((diag, -dt * cw[inner]))
+
+        return csc_matrix((vals, (rows, cols)), shape=(nb, nb))
+
+    def diffuse(
+        self,
+        elev,
+        sea,
+        CDaerial,
+        CDmarine,
+        Sc,
+        area,
+        ngbOffset,
+        neighbours,
+        edges,
+        distances,
+        borders,
+        mask,
+        dt,
+        fixed=None,
+    ):
+        """
+        Compute the elevation change induced by hillslope diffusion over a time step.
+
+        Args:
+            elev: numpy arrays containing the elevation of the TIN nodes.
+            sea: float value giving the sea-level height at considered time step.
+            CDaerial: aerial diffusion coefficient (in :math:`{m}^2/a`).
+            CDmarine: marine diffusion coefficient (in :math:`{m}^2/a`).
+            Sc: critical slope parameter for non-linear diffusion (0 for linear diffusion).
+            area: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`)
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
+            edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
+            distances: numpy real-type array with the distances between each connection in the TIN.
+            borders: numpy integer-type array flagging the nodes inside the diffusion domain.
+            mask: numpy float-type array equal to 1 for the nodes inside the simulation domain.
+            dt: real value corresponding to the time step.
+            fixed: (int) ID of an additional node keeping its elevation (default: :code:`None`).
+
+        Returns:
+            - cdiff - numpy array containing erosion/deposition thicknesses induced by hillslope processes.
+        """
+
+        self._edges(ngbOffset, neighbours, edges, distances)
+        i, j = self.rows, self.cols
+        self.factorisations = 0
+        self.iterations = 0
+
+        # Nodes solved implicitly
+        aerial = elev >= sea
+        coeff = numpy.where(aerial, CDaerial, CDmarine)
+        active = (borders > 0) & (mask > 0) & (area > 0.0)
+        if fixed is not None:
+            active[fixed] = False
+        ids = numpy.where(active)[0]
+        cdiff = numpy.zeros(len(elev))
+        if len(ids) == 0 or dt <= 0.0:
+            return cdiff
+        loc = -numpy.ones(len(elev), dtype=int)
+        loc[ids] = numpy.arange(len(ids))
+
+        # Edges between nodes of the domain and towards fixed nodes
+        link = active[i] & (self.weight > 0.0)
+        inner = link & active[j]
+        outflow = link & (borders[j] < 1) & (elev[j] < elev[i])
+        bound = (link & ~active[j] & (borders[j] > 0)) | outflow
+
+        # Interface diffusion coefficients
+        kappa = numpy.zeros(len(i))
+        ci = coeff[i[inner]]
+        cj = coeff[j[inner]]
+        csum = ci + cj
+        kappa[inner] = numpy.where(
+            csum > 0.0, 2.0 * ci * cj / numpy.where(csum > 0.0, csum, 1.0), 0.0
+        )
+        kappa[bound] = coeff[i[bound]]
+        cw = kappa * self.weight
+
+        z0 = elev[ids]
+        rhs0 = area[ids] * z0
+
+        if Sc == 0.0:
+            # Linear diffusion: the factorisation is reused while the system is unchanged
+            key = self.key
+            if (
+                key is None
+                or key[0] != dt
+                or len(key[1]) != len(aerial)
+                or not numpy.array_equal(key[1], aerial)
+                or not numpy.array_equal(key[2], bound)
+            ):
+                self.solve = factorized(
+                    self._matrix(ids, loc, cw, inner, bound, area, dt)
+                )
+                self.key = (dt, aerial, bound)
+                self.factorisations = 1
+            rhs = rhs0 + dt * numpy.bincount(
+                loc[i[bound]], weights=cw[bound] * elev[j[bound]], minlength=len(ids)
+            )
+            z = self.solve(rhs)
+            self.iterations = 1
+        else:
+            # Non-linear diffusion: Picard iterations on the slope-dependent coefficients
+            Sc2 = Sc * Sc
+            dist = numpy.zeros(len(i))
+            dist[link] = distances[link]
+            znew = numpy.copy(elev)
+            z = z0
+            for it in range(self.maxIt):
+                slp = numpy.zeros(len(i))
+                edge = inner | bound
+                slp[edge] = (znew[j[edge]] - znew[i[edge]]) / dist[edge]
+                denom = numpy.maximum(1.0 - slp * slp / Sc2, 0.1)
+                cwnl = cw / denom
+                rhs = rhs0 + dt * numpy.bincount(
+                    loc[i[bound]],
+                    weights=cwnl[bound] * elev[j[bound]],
+                    minlength=len(ids),
+                )
+                mat = self._matrix(ids, loc, cwnl, inner, bound, area, dt)
+                z = factorized(mat)(rhs)
+                self.factorisations += 1
+                self.iterations += 1
+                change = numpy.abs(z - znew[ids]).max()
+                znew[ids] = z
+                if change < self.tol:
+                    break
+            self.key = None
+
+        cdiff[ids] = z - z0
+
+        return cdiff
+
+    def _layer_fluxes(self, elev, layer, mobile, cw, area, borders, maxth, dt):
+        """
+        Compute the sediment volumes exchanged along each edge during the diffusion of the mobile layer.
+
+        Args:
+            elev: numpy arrays containing the elevation of the TIN nodes.
+            layer: numpy array containing the mobile layer thickness of each node (in m).
+            mobile: numpy boolean-type array flagging the nodes able to lose sediment.
+            cw: numpy float-type array containing the diffusion coefficient times the geometric weight of each edge.
+            area: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`)
+            borders: numpy integer-type array flagging the nodes inside the simulation domain.
+            maxth: mobile layer thickness kept in place (in m).
+            dt: real value corresponding to the time step.
+
+        Returns:
+            - src - numpy integer-type array containing the node losing sediment along each edge.
+            - dst - numpy integer-type array containing the node receiving sediment along each edge.
+            - vol - numpy float-type array containing the sediment volume exchanged along each edge.
+        """
+
+        i, j = self.rows, self.cols
+        link = (borders[i] > 0) & (self.weight > 0.0)
+        up = numpy.where(elev[i] > elev[j], i, j)
+        inner = link & (borders[j] > 0) & mobile[up]
+        bound = link & (borders[j] < 1) & mobile[i] & (elev[i] > elev[j])
+        if not (inner.any() or bound.any()):
+            return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int), numpy.zeros(0)
+
+        # Nodes solved implicitly
+        active = numpy.zeros(len(elev), dtype=bool)
+        active[i[inner | bound]] = True
+        ids = numpy.where(active)[0]
+        loc = -numpy.ones(len(elev), dtype=int)
+        loc[ids] = numpy.arange(len(ids))
+
+        rhs = area[ids] * elev[ids] + dt * numpy.bincount(
+            loc[i[bound]], weights=cw[bound] * elev[j[bound]], minlength=len(ids)
+        )
+        z = numpy.copy(elev)
+        z[ids] = factorized(self._matrix(ids, loc, cw, inner, bound, area, dt))(rhs)
+        self.factorisations += 1
+
+        # Volumes exchanged along each edge, oriented from the node losing sediment
+        pair = (inner & (i < j)) | bound
+        src = i[pair]
+        dst = j[pair]
+        vol = dt * cw[pair] * (z[src] - z[dst])
+        swap = vol < 0.0
+        src, dst = numpy.where(swap, dst, src), numpy.where(swap, src, dst)
+        vol = numpy.abs(vol)
+
+        # Limit the volume leaving each node to its mobile layer and the volume it receives, minus a thickness
+        # maxth kept in place. Sediment moves towards lower elevations so the limiting factors are exact once
+        # propagated along the longest path.
+        out = numpy.bincount(src, weights=vol, minlength=len(elev))
+        avail = area * (numpy.maximum(layer, 0.0) - maxth)
+        scale = numpy.ones(len(elev))
+        for sweep in range(len(elev)):
+            inflow = numpy.bincount(dst, weights=vol * scale[src], minlength=len(elev))
+            limit = numpy.ones(len(elev))
+            over = out > numpy.maximum(avail + inflow, 0.0)
+            limit[over] = numpy.maximum(avail[over] + inflow[over], 0.0) / out[over]
+            if numpy.array_equal(limit, scale):
+                break
+            scale = limit
+        vol *= scale[src]
+
+        return src, dst, vol
+
+    def diffuse_layer(
+        self,
+        elev,
+        layer,
+        coeff,
+        area,
+        ngbOffset,
+        neighbours,
+        edges,
+        distances,
+        borders,
+        maxth,
+        dt,
+        sea=None,
+        rocks=None,
+    ):
+        """
+        Compute the diffusion of a mobile sediment layer (river-fed marine deposits or slope failure material)
+        over a time step with implicit solves.
+
+        Sediment is transported along an edge from its higher node when the mobile layer of this node is thicker
+        than :code:`maxth`. The diffusion equation is solved with a backward Euler scheme and the volumes leaving
+        each node are limited to the sediment it holds above :code:`maxth`, which keeps the scheme
+        mass-conservative. Nodes whose mobile layer exceeds :code:`maxth` at the end of the step start losing
+        sediment as well and the step is solved again until the set of nodes losing sediment does not change.
+
+        Args:
+            elev: numpy arrays containing the elevation of the TIN nodes.
+            layer: numpy array containing the mobile layer thickness of each node (in m).
+            coeff: diffusion coefficient (in :math:`{m}^2/a`).
+            area: numpy float-type array containing the voronoi area for each nodes (in :math:`{m}^2`)
+            ngbOffset: numpy integer-type array with the index of the first neighbour of each node.
+            neighbours: numpy integer-type array with the neighbourhood IDs stored in compressed sparse row format.
+            edges: numpy real-type array with the voronoi edges length for each neighbours of the TIN nodes.
+            distances: numpy real-type array with the distances between each connection in the TIN.
+            borders: numpy integer-type array flagging the nodes inside the simulation domain.
+            maxth: mobile layer thickness above which sediment is transported (in m).
+            dt: real value corresponding to the time step.
+            sea: sea-level height restricting the transport to marine nodes (default: :code:`None` for all nodes).
+            rocks: 2D numpy array containing the thickness of each rock type in the mobile layer (default: :code:`None`).
+
+        Returns:
+            - cdiff - numpy array containing erosion/deposition thicknesses induced by the diffusion.
+            - rdiff - 2D numpy array containing the erosion/deposition thicknesses of each rock type (:code:`None` when :code:`rocks` is not provided).
+        """
+
+        self._edges(ngbOffset, neighbours, edges, distances)
+        self.factorisations = 0
+        self.iterations = 0
+
+        nodeNb = len(elev)
+        cdiff = numpy.zeros(nodeNb)
+        rdiff = None
+        if rocks is not None:
+            rdiff = numpy.zeros(rocks.shape)
+        if dt <= 0.0 or coeff <= 0.0:
+            return cdiff, rdiff
+
+        invArea = numpy.zeros(nodeNb)
+        invArea[area > 0.0] = 1.0 / area[area > 0.0]
+        cw = coeff * self.weight
+        domain = (area > 0.0) & (borders > 0)
+        if sea is not None:
+            domain &= elev < sea
+
+        # Active set iterations on the nodes losing sediment
+        mobile = domain & (layer > maxth)
+        src = dst = numpy.zeros(0, dtype=int)
+        vol = numpy.zeros(0)
+        while mobile.any():
+            self.iterations += 1
+            src, dst, vol = self._layer_fluxes(
+                elev, layer, mobile, cw, area, borders, maxth, dt
+            )
+            change = numpy.bincount(dst, weights=vol, minlength=nodeNb)
+            change -= numpy.bincount(src, weights=vol, minlength=nodeNb)
+            change[borders < 1] = 0.0
+            cdiff = change * invArea
+            grown = mobile | (domain & (layer + cdiff > maxth))
+            if (grown == mobile).all():
+                break
+            mobile = grown
+
+        # Rock types leave each node with the proportions of its mobile layer mixed with the sediment it receives
+        if rocks is not None and len(vol) > 0:
+            inflow = numpy.bincount(dst, weights=vol, minlength=nodeNb)
+            mixed = area * numpy.sum(rocks, axis=1) + inflow
+            valid = mixed > 0.0
+            rin = numpy.zeros(rocks.shape)
+            for sweep in range(nodeNb):
+                frac = numpy.zeros(rocks.shape)
+                frac[valid] = (area[valid, None] * rocks[valid] + rin[valid]) / mixed[
+                    valid, None
+                ]
+                prev = rin
+                rin = numpy.zeros(rocks.shape)
+                for r in range(rocks.shape[1]):
+                    rin[:, r] = numpy.bincount(
+                        dst, weights=vol * frac[src, r], minlength=nodeNb
+                    )
+                if numpy.array_equal(rin, prev):
+                    break
+            for r in range(rocks.shape[1]):
+                rchange = rin[:, r] - numpy.bincount(
+                    src, weights=vol * frac[src, r], minlength=nodeNb
+                )
+                rchange[borders < 1] = 0.0
+                rdiff[:, r] = rchange * invArea
+
+        return cdiff, rdiff
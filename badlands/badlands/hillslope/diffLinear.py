@@ -46,6 +46,7 @@ class diffLinear:
         self.Sfail = None
         self.Cfail = None
         self.updatedt = 0
+        self.implicit = None
 
         return
 
@@ -82,7 +83,7 @@ class diffLinear:
 
         return
 
-    def dt_stabilityCs(self, elev, neighbours, distances, globalIDs, borders):
+    def dt_stabilityCs(self, elev, ngbOffset, neighbours, distances, globalIDs, borders):
         """
         This function computes the maximal timestep to ensure computation stability
         of the non-linear hillslope processes.
@@ -104,7 +105,7 @@ class diffLinear:
             Sc[0] = self.Sc
             mCD = numpy.zeros(1)
             mCD[0] = maxCD
-            CFL = sfd.diffnlcfl(Sc, mCD, elev, borders, neighbours, distances, globalIDs)
+            CFL = sfd.diffnlcfl(Sc, mCD, elev, borders, ngbOffset, neighbours, distances, globalIDs)
         else:
             CFL[0] = 1.e6
 
@@ -16,7 +16,12 @@
 Main components of **badlands** workflow.
 """
 
+import copy
 import time
+import pickle
+import shutil
+import signal
+from contextlib import contextmanager
 import numpy as np
 
 from scipy.spatial import cKDTree
@@ -27,6 +32,7 @@ import os
 if "READTHEDOCS" not in os.environ:
     from badlands import (
         diffLinear,
+        diffImplicit,
         flowNetwork,
         buildMesh,
         waveSed,
@@ -35,8 +41,92 @@ if "READTHEDOCS" not in os.environ:
         xmlParser,
         carbGrowth,
         pelagicGrowth,
+        runProfile,
+        stepTelemetry,
+        eventScheduler,
+        workSpace,
+        outputPolicy,
+        sfd,
     )
 
+# Simulation state captured by Model.snapshot
+_modelState = (
+    "tNow",
+    "waveID",
+    "outputStep",
+    "outStrata",
+    "applyDisp",
+    "next_carbStep",
+    "elevation",
+    "cumdiff",
+    "cumhill",
+    "cumfail",
+    "cumflex",
+    "wavediff",
+    "slopeTIN",
+    "rain",
+    "disp",
+    "prop",
+    "fillH",
+    "tinFlex",
+    "oldsed",
+    "carbval",
+    "carbval2",
+    "carbMaxGrowthSp1",
+    "carbMaxGrowthSp2",
+    "pelaval",
+)
+_forceState = (
+    "next_rain",
+    "next_disp",
+    "next_display",
+    "next_flexure",
+    "next_layer",
+    "next_wave",
+    "next_carb",
+    "sealevel",
+    "dispX",
+    "dispY",
+    "dispZ",
+    "uDisp",
+    "injected_disps",
+    "rivQs",
+    "rivQw",
+    "meanH",
+    "meanU",
+    "meanV",
+    "meanS",
+    "time3d",
+)
+_strataState = ("strata", "straTIN", "carbTIN", "outPolicy")
+# Flow attributes depending only on the mesh
+_flowShared = (
+    "xycoords",
+    "parentIDs",
+    "domain",
+    "work",
+    "xgrid",
+    "ygrid",
+    "xi",
+    "yi",
+    "xyi",
+    "distances",
+    "indices",
+    "onIDs",
+)
+# Hillslope attributes holding solver caches, kept by the model when restoring a snapshot
+_hillslopeShared = ("implicit",)
+
+
+def _copy(val):
+    """
+    Copy numpy arrays, other values are returned unchanged.
+    """
+
+    if isinstance(val, np.ndarray):
+        return np.copy(val)
+    return val
+
 
 class Model(object):
     """
@@ -73,14 +163,28 @@ class Model(object):
         self.pelaval = None
         self.applyDisp = False
         self.simStarted = False
+        self.scheduler = None
+        self.outStrata = 0
+        self.outPolicy = None
+        self.resumed = False
+        self.preempted = False
+        self._signal = None
 
-    def load_xml(self, filename, verbose=False):
+        # Wall-clock and CPU time spent in each simulation phase
+        self.profiler = runProfile.runProfile()
+
+        # Constraint limiting each time step
+        self.telemetry = stepTelemetry.stepTelemetry()
+
+    def load_xml(self, filename, verbose=False, overrides=None, mesh=None):
         """
         Load the XML input file describing the experiment parameters.
 
         Args:
             filename : (str) path to the XML file to load.
             verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+            overrides : (dict) parsed input parameters to replace, keyed by their attribute name (e.g. :code:`SPLero`, :code:`CDa`).
+            mesh : (tuple) regular grid and finite volume mesh already built with :code:`buildMesh.build_mesh`.
 
         Note:
             * Additional information regarding the input file XML options are found on badlands website_.
@@ -93,6 +197,13 @@ class Model(object):
 
         # Only the first node should create a unique output dir
         self.input = xmlParser.xmlParser(filename, makeUniqueOutputDir=True)
+        if overrides is not None:
+            for key, val in overrides.items():
+                if not hasattr(self.input, key):
+                    raise ValueError(
+                        "Unknown input parameter %s cannot be overridden." % key
+                    )
+                setattr(self.input, key, val)
         self.tNow = self.input.tStart
 
         # Seed the random number generator consistently on all nodes
@@ -104,7 +215,7 @@ class Model(object):
         # If there's no demfile specified, we assume that it will be loaded
         # later using _build_mesh
         if self.input.demfile:
-            self._build_mesh(self.input.demfile, verbose)
+            self._build_mesh(self.input.demfile, verbose, mesh)
 
         # Initialise carbonate evolution if any
         if self.input.carbonate:
@@ -122,7 +233,7 @@ class Model(object):
         # self.waveMobile = np.zeros(self.totPts, dtype=float)
         # self.waveED = np.zeros(self.totPts, dtype=float)
 
-    def _build_mesh(self, filename, verbose):
+    def _build_mesh(self, filename, verbose, mesh=None):
         """
         Build TIN based on regular grid.
         """
@@ -150,7 +261,7 @@ class Model(object):
             self.wave,
             self.straTIN,
             self.carbTIN,
-        ) = buildMesh.construct_mesh(self.input, filename, verbose)
+        ) = buildMesh.construct_mesh(self.input, filename, verbose, mesh)
 
         if self.input.waveSed:
             self.wavediff = np.zeros((self.totPts))
@@ -170,6 +281,10 @@ class Model(object):
         self.hillslope.Cfail = self.input.Cfail
         self.hillslope.Sc = self.input.Sc
         self.hillslope.updatedt = 0
+        if "implicit" in (self.input.hillSolver, self.input.transportSolver):
+            self.hillslope.implicit = diffImplicit(
+                self.input.picardIt, self.input.picardTol
+            )
 
         # Define flow parameters
         self.flow = flowNetwork(self.input)
@@ -184,6 +299,22 @@ class Model(object):
         self.flow.depo = self.input.depo
         self.flow.xgrid = None
 
+        # Reusable arrays for the sediment flux computation
+        self.work = workSpace.workSpace(self.totPts, self.input.rockNb)
+        self.flow.work = self.work
+
+        # Change-triggered output
+        if self.input.adaptOut:
+            self.outPolicy = outputPolicy.outputPolicy(
+                self.input.tOutMin,
+                self.input.tOutMax,
+                self.input.outDzMax,
+                self.input.outDzRMS,
+                self.input.outFlux,
+            )
+        else:
+            self.outPolicy = None
+
         reassignID = np.where(parentIDs < len(parentIDs))[0]
         if len(reassignID) > 0:
             tmpTree = cKDTree(self.flow.xycoords[len(parentIDs) :, :2])
@@ -280,24 +411,855 @@ class Model(object):
         self.flow.sedload = None
         self.flow.flowdensity = None
         self.flow.domain = None
+        self.flow.depressions.reset()
+        self.flow.reset_routing()
         self.hillslope.updatedt = 0
+        if self.hillslope.implicit is not None:
+            self.hillslope.implicit.reset()
+        self.work.reset(self.totPts)
 
         self.carbval = None
         self.carbval2 = None
         self.pelaval = None
         self.prop = np.zeros((self.totPts, 1))
 
-    def run_to_time(self, tEnd, verbose=False):
+    def _shared_memo(self):
+        """
+        Memo dictionary used to share the read-only mesh and forcing objects when copying the model components.
+        """
+
+        memo = {}
+        shared = [
+            self.input,
+            self.recGrid,
+            self.FVmesh,
+            self.force,
+            self.lGIDs,
+            self.inIDs,
+            self.inGIDs,
+            self.flow.xycoords,
+        ]
+        shared += list(vars(self.FVmesh).values())
+        for obj in shared:
+            if obj is not None:
+                memo[id(obj)] = obj
+
+        return memo
+
+    def snapshot(self):
+        """
+        Capture the dynamic state of the simulation in memory.
+
+        The snapshot contains the elevation and cumulative erosion/deposition fields, the flow and hillslope
+        state, the stratigraphic meshes, the forcing cursors and the times of the scheduled processes.
+        The finite volume mesh is not duplicated.
+
+        Returns:
+            - snap - dictionary describing the simulation state, to be used with :code:`restore`.
+        """
+
+        memo = self._shared_memo()
+        snap = {"mesh": self.FVmesh}
+        snap["model"] = {key: _copy(getattr(self, key, None)) for key in _modelState}
+        snap["flow"] = {
+            key: _copy(val)
+            for key, val in vars(self.flow).items()
+            if key not in _flowShared
+        }
+        snap["hillslope"] = {
+            key: _copy(val)
+            for key, val in vars(self.hillslope).items()
+            if key not in _hillslopeShared
+        }
+        snap["force"] = {key: _copy(getattr(self.force, key)) for key in _forceState}
+        snap["strata"] = {
+            key: copy.deepcopy(getattr(self, key), memo) for key in _strataState
+        }
+        if self.input.flexure:
+            snap["flexure"] = _copy(self.flex.previous_flex)
+        snap["scheduler"] = {}
+        if self.scheduler is not None:
+            for name, event in self.scheduler.events.items():
+                snap["scheduler"][name] = (event["time"], event["enabled"])
+
+        return snap
+
+    def restore(self, snap):
+        """
+        Reset the simulation to a previously captured state.
+
+        Args:
+            snap : (dict) simulation state obtained from :code:`snapshot`.
+
+        Note:
+            The snapshot is not modified and can be restored several times. The incremental flow routing relies on
+            the graph of the previous step, which is kept in the workspace buffers and not in the snapshot: the flow
+            routing is therefore fully computed on the next step.
+        """
+
+        if snap["mesh"] is not self.FVmesh:
+            raise ValueError(
+                "The snapshot has been taken on a different TIN and cannot be restored."
+            )
+
+        memo = self._shared_memo()
+        for key, val in snap["model"].items():
+            setattr(self, key, _copy(val))
+        for key, val in snap["flow"].items():
+            setattr(self.flow, key, _copy(val))
+        for key, val in snap["hillslope"].items():
+            setattr(self.hillslope, key, _copy(val))
+        for key, val in snap["force"].items():
+            setattr(self.force, key, _copy(val))
+        for key, val in snap["strata"].items():
+            setattr(self, key, copy.deepcopy(val, memo))
+        if self.input.flexure:
+            self.flex.previous_flex = _copy(snap["flexure"])
+        for name, (tEvent, enabled) in snap["scheduler"].items():
+            self.scheduler.reschedule(name, tEvent)
+            if enabled:
+                self.scheduler.enable(name)
+            else:
+                self.scheduler.disable(name)
+
+        # Next step computes the full flow graph and stacks
+        self.flow.reset_routing()
+
+    def fork(self, outDir=None):
+        """
+        Create an independent copy of the model to branch the simulation into another scenario.
+
+        The finite volume mesh arrays (neighbours, edges lengths, voronoi edges, control volumes...) and the
+        forcing maps are shared with the parent model, whereas all the evolving fields are duplicated.
+
+        Args:
+            outDir : (str) output directory of the new model (default: :code:`None` to keep the parent one).
+
+        Returns:
+            - model - the new **badlands** model.
+        """
+
+        snap = self.snapshot()
+        memo = self._shared_memo()
+
+        model = copy.copy(self)
+        model.input = copy.copy(self.input)
+        model.recGrid = copy.copy(self.recGrid)
+        model.force = copy.copy(self.force)
+        model.flow = copy.copy(self.flow)
+        model.flow.depressions = copy.copy(self.flow.depressions)
+        model.flow.depressions.reset()
+        model.flow.reset_routing()
+        model.hillslope = copy.copy(self.hillslope)
+        if self.hillslope.implicit is not None:
+            model.hillslope.implicit = copy.copy(self.hillslope.implicit)
+            model.hillslope.implicit.reset()
+        if self.input.flexure:
+            model.flex = copy.copy(self.flex)
+            model.flex.flex = copy.copy(self.flex.flex)
+        if self.wave is not None:
+            model.wave = copy.deepcopy(self.wave, memo)
+        if self.mapero is not None:
+            model.mapero = copy.deepcopy(self.mapero, memo)
+
+        # Own buffers, profiler, telemetry and processes
+        model.work = workSpace.workSpace(self.totPts, self.input.rockNb)
+        model.flow.work = model.work
+        model.profiler = runProfile.runProfile()
+        model.telemetry = stepTelemetry.stepTelemetry()
+        if self.scheduler is not None:
+            model._build_scheduler()
+        model.restore(snap)
+
+        if outDir is not None:
+            os.makedirs(outDir)
+            os.makedirs(outDir + "/h5")
+            os.makedirs(outDir + "/xmf")
+            shutil.copy(self.input.inputfile, outDir)
+            model.input.outDir = outDir
+            for key in _strataState:
+                obj = getattr(model, key)
+                if obj is not None and hasattr(obj, "folder"):
+                    obj.folder = outDir
+
+        return model
+
+    def set_threads(self, nb=0):
+        """
+        Define the number of threads used to compute the flow directions, the stacks, the discharge and the
+        stream power law. The last three are shared between threads catchment by catchment.
+
+        Args:
+            nb : (int) number of threads (default: :code:`0` to use all available cores).
+
+        Returns:
+            - nb - number of threads actually used (1 when **badlands** has been compiled without OpenMP).
+        """
+
+        sfd.set_threads(nb)
+
+        return int(sfd.get_threads()[0])
+
+    @property
+    def profile(self):
+        """
+        Accumulated wall-clock and CPU times of the simulation phases.
+
+        Returns:
+            - totals - dictionary mapping each phase name (*pitfill*, *receivers*, *stack*, *depressions*, *discharge*,
+              *streampower*, *marine*, *failure*, *hillslope*, *rain*, *tectonics*, *flexure*, *waves*, *carbonate*, *strata*,
+              *checkpoint*...)
+              to its total *wall* and *cpu* times in seconds and its number of *calls*.
+        """
+
+        return self.profiler.summary()
+
+    def write_profile(self, filename=None):
+        """
+        Export the recorded simulation phases as a Chrome-trace JSON file.
+
+        Args:
+            filename : (str) name of the JSON file (default: :code:`profile.json` in the output directory).
+
+        Note:
+            The file can be visualised with *chrome://tracing* or *Perfetto*.
+        """
+
+        if filename is None:
+            filename = os.path.join(self.input.outDir, "profile.json")
+        self.profiler.write_trace(filename)
+
+    @property
+    def step_telemetry(self):
+        """
+        Per-step time step attribution.
+
+        Returns:
+            - records - numpy structured array with, for each time step, the simulation time (*tNow*), the time step (*dt*),
+              the constraint which has bounded it (*limiter*: hillslope, flow, event, minDT, maxDT or overfill), the value
+              of this constraint (*value*), the number of *marine* diffusion and slope *failure* sub-iterations and the
+              relative difference between the implicit and explicit stream power (*splError*, NaN when not checked).
+        """
+
+        return self.telemetry.array()
+
+    def write_telemetry(self, filename=None):
+        """
+        Write the per-step time step attribution in a CSV file.
+
+        Args:
+            filename : (str) name of the CSV file (default: :code:`telemetry.csv` in the output directory).
+        """
+
+        if filename is None:
+            filename = os.path.join(self.input.outDir, "telemetry.csv")
+        self.telemetry.write_csv(filename)
+
+    def write_restart(self, filename=None):
+        """
+        Write a restart file containing the complete state of the simulation.
+
+        Contrary to the HDF5 outputs, which are interpolated on the new TIN when restarting a simulation, the
+        restart file stores the exact state of the model so that a simulation resumed with :code:`load_restart`
+        gives the same results as an uninterrupted one.
+
+        Args:
+            filename : (str) name of the restart file (default: :code:`restart.pkl` in the output directory).
+
+        Returns:
+            - filename - name of the restart file.
+        """
+
+        if filename is None:
+            filename = os.path.join(self.input.outDir, "restart.pkl")
+
+        snap = self.snapshot()
+        del snap["mesh"]
+        state = {
+            "totPts": self.totPts,
+            "outDir": self.input.outDir,
+            "tDisplay": self.input.tDisplay,
+            "random": np.random.get_state(),
+            "snapshot": snap,
+        }
+
+        # Write in a temporary file first to always keep a valid restart file
+        with open(filename + ".tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + ".tmp", filename)
+
+        return filename
+
+    def load_restart(self, filename):
+        """
+        Resume a simulation from a restart file written by :code:`write_restart`.
+
+        Args:
+            filename : (str) name of the restart file.
+
+        Note:
+            The XML input file used to build the model with :code:`load_xml` needs to be the one of the
+            interrupted simulation. Outputs are then appended to the output directory of this simulation.
+
+        Warning:
+            Simulations using 3D displacements rebuild the TIN during the run and cannot be resumed.
+        """
+
+        with open(filename, "rb") as f:
+            state = pickle.load(f)
+
+        if state["totPts"] != self.totPts:
+            raise ValueError(
+                "The restart file has been written on a different TIN and cannot be loaded."
+            )
+
+        self.input.tDisplay = state["tDisplay"]
+        if not self.simStarted:
+            self._start_simulation()
+        snap = state["snapshot"]
+        snap["mesh"] = self.FVmesh
+        self.restore(snap)
+        np.random.set_state(state["random"])
+
+        # Append outputs to the interrupted simulation
+        self.input.outDir = state["outDir"]
+        for key in _strataState:
+            obj = getattr(self, key)
+            if obj is not None and hasattr(obj, "folder"):
+                obj.folder = state["outDir"]
+        self.resumed = True
+
+    @contextmanager
+    def _preemption_handlers(self):
+        """
+        Catch the termination signals sent by batch schedulers while the simulation runs.
+        """
+
+        def handler(signum, frame):
+            self._signal = signum
+
+        previous = {}
+        self._signal = None
+        for sig in (signal.SIGTERM, getattr(signal, "SIGUSR1", None)):
+            if sig is None:
+                continue
+            try:
+                previous[sig] = signal.signal(sig, handler)
+            except ValueError:
+                # Signals can only be caught in the main thread
+                pass
+        try:
+            yield
+        finally:
+            for sig, prev in previous.items():
+                signal.signal(sig, prev)
+
+    def _start_simulation(self):
+        """
+        Define the times of the non-flow related processes at the beginning of the simulation.
+        """
+
+        self.force.next_rain = self.force.T_rain[0, 0]
+        self.force.next_disp = self.force.T_disp[0, 0]
+        self.force.next_carb = self.force.T_carb[0, 0]
+
+        self.force.next_display = self.input.tStart
+        if self.input.laytime > 0:
+            self.force.next_layer = self.input.tStart + self.input.laytime
+        else:
+            self.force.next_layer = self.input.tEnd + 1000.0
+        self.exitTime = self.input.tEnd
+        if self.input.flexure:
+            self.force.next_flexure = self.input.tStart + self.input.ftime
+        else:
+            self.force.next_flexure = self.exitTime + self.input.tDisplay
+        self._build_scheduler()
+        self.simStarted = True
+
+    def _build_scheduler(self):
+        """
+        Register the non-flow related processes with the event scheduler.
+
+        Processes of stage 0 are performed before the computation of the stream network and the
+        output (stage 1) after it.
+        """
+
+        self.scheduler = eventScheduler.eventScheduler(self.profiler)
+        self.scheduler.register("rain", self._rain_event, self.force.next_rain, 0)
+        self.scheduler.register(
+            "tectonics", self._tectonics_event, self.force.next_disp, 1
+        )
+        if self.input.flexure:
+            self.scheduler.register(
+                "flexure", self._flexure_event, self.force.next_flexure, 2
+            )
+        if self.input.waveOn or self.input.waveSed:
+            self.scheduler.register("waves", self._waves_event, self.force.next_wave, 3)
+        if self.input.carb:
+            self.scheduler.register(
+                "carbonate", self._carbonate_event, self.next_carbStep, 4
+            )
+        if self.input.laytime > 0:
+            self.scheduler.register(
+                "strata", self._strata_event, self.force.next_layer, 5
+            )
+        self.scheduler.register(
+            "output", self._output_event, self.force.next_display, 0, stage=1
+        )
+
+    def _rain_event(self, tNow, verbose=False):
+        """
+        Load precipitation rate.
+        """
+
+        if tNow == self.input.tStart:
+            ref_elev = buildMesh.get_reference_elevation(
+                self.input, self.recGrid, self.elevation
+            )
+            self.force.getSea(tNow, self.input.udw, ref_elev)
+        self.rain = np.zeros(self.totPts, dtype=float)
+        self.rain[self.inIDs] = self.force.get_Rain(tNow, self.elevation, self.inIDs)
+
+        return self.force.next_rain
+
+    def _tectonics_event(self, tNow, verbose=False):
+        """
+        Load tectonic grid.
+        """
+
+        if not self.input.disp3d:
+            # Vertical displacements
+            ldisp = np.zeros(self.totPts, dtype=float)
+            ldisp.fill(-1.0e6)
+            ldisp[self.inIDs] = self.force.load_Tecto_map(tNow, self.inIDs)
+            self.disp = self.force.disp_border(
+                ldisp,
+                self.FVmesh.ngbOffset,
+                self.FVmesh.neighbours,
+                self.FVmesh.edge_length,
+                self.recGrid.boundsPt,
+            )
+            self.applyDisp = True
+        else:
+            # 3D displacements
+            if self.input.laytime == 0:
+                updateMesh = self.force.load_Disp_map(
+                    tNow, self.FVmesh.node_coords[:, :2], self.inIDs
+                )
+            else:
+                # Define 3D displacements on the stratal regions
+                if self.strata is not None:
+                    updateMesh, regdX, regdY = self.force.load_Disp_map(
+                        tNow,
+                        self.FVmesh.node_coords[:, :2],
+                        self.inIDs,
+                        True,
+                        self.strata.xyi,
+                        self.strata.ids,
+                    )
+                else:
+                    updateMesh = self.force.load_Disp_map(
+                        tNow,
+                        self.FVmesh.node_coords[:, :2],
+                        self.inIDs,
+                    )
+
+            # Update mesh when a 3D displacements field has been loaded
+            if updateMesh:
+                self.force.dispZ = self.force.disp_border(
+                    self.force.dispZ,
+                    self.FVmesh.ngbOffset,
+                    self.FVmesh.neighbours,
+                    self.FVmesh.edge_length,
+                    self.recGrid.boundsPt,
+                )
+                # Define flexural flags
+                fflex = 0
+                flexiso = None
+                if self.input.flexure:
+                    flexiso = self.cumflex
+                    fflex = 1
+                # Define stratal flags
+                fstrat = 0
+                sload = None
+                if (
+                    self.input.udw == 1
+                    and tNow == self.input.tStart
+                    and self.strata is not None
+                ):
+                    if self.strata.oldload is None:
+                        self.strata.oldload = np.zeros(len(self.elevation), dtype=float)
+                if self.strata is not None:
+                    if self.strata.oldload is None:
+                        self.strata.oldload = np.zeros(len(self.elevation), dtype=float)
+                if self.input.laytime > 0 and self.strata.oldload is not None:
+                    sload = self.strata.oldload
+                    fstrat = 1
+                # Define erodibility map flags
+                fero = 0
+                vKe = None
+                vTh = None
+                if self.input.erolays is not None:
+                    if self.input.erolays >= 0:
+                        fero = 1
+                        vKe = self.mapero.Ke
+                        vTh = self.mapero.thickness
+                # Apply horizontal displacements
+                (
+                    self.recGrid.tinMesh,
+                    self.elevation,
+                    self.cumdiff,
+                    self.cumhill,
+                    self.cumfail,
+                    self.wavediff,
+                    fcum,
+                    scum,
+                    Ke,
+                    Th,
+                ) = self.force.apply_XY_displacements(
+                    self.recGrid.areaDel,
+                    self.fixIDs,
+                    self.elevation,
+                    self.cumdiff,
+                    self.cumhill,
+                    self.cumfail,
+                    self.wavediff,
+                    tflex=flexiso,
+                    scum=sload,
+                    Te=vTh,
+                    Ke=vKe,
+                    flexure=fflex,
+                    strat=fstrat,
+                    ero=fero,
+                )
+                # Update relevant parameters in deformed TIN
+                if fflex == 1:
+                    self.cumflex = fcum
+                if fero == 1:
+                    self.mapero.Ke = Ke
+                    self.mapero.thickness = Th
+                # Rebuild the computational mesh
+                self._rebuild_mesh(verbose)
+
+                # In case where the paleoflow workflow is used
+                if self.force.uDisp is not None:
+                    self.elevation += self.force.uDisp
+
+                # Update the stratigraphic mesh
+                if self.input.laytime > 0 and self.strata is not None:
+                    self.strata.move_mesh(regdX, regdY, scum, verbose)
+
+        return self.force.next_disp
+
+    def _flexure_event(self, tNow, verbose=False):
+        """
+        Compute isostatic flexure.
+        """
+
+        flextime = time.perf_counter()
+        ref_elev = buildMesh.get_reference_elevation(
+            self.input, self.recGrid, self.elevation
+        )
+        self.force.getSea(tNow, self.input.udw, ref_elev)
+        self.tinFlex = self.flex.get_flexure(
+            self.elevation,
+            self.cumdiff,
+            self.force.sealevel,
+            self.recGrid.boundsPt,
+            initFlex=False,
+        )
+        # Get border values
+        self.tinFlex = self.force.disp_border(
+            self.tinFlex,
+            self.FVmesh.ngbOffset,
+            self.FVmesh.neighbours,
+            self.FVmesh.edge_length,
+            self.recGrid.boundsPt,
+        )
+        # Update flexural parameters
+        self.elevation += self.tinFlex
+        self.cumflex += self.tinFlex
+        # Update next flexure time
+        self.force.next_flexure += self.input.ftime
+        print(
+            "   - Compute flexural isostasy %0.02f seconds"
+            % (time.perf_counter() - flextime)
+        )
+
+        return self.force.next_flexure
+
+    def _waves_event(self, tNow, verbose=False):
+        """
+        Compute wavesed parameters.
+        """
+
+        wavetime = time.perf_counter()
+        if self.carbTIN is not None:
+            # Update erosion/deposition due to SPM processes on carbTIN
+            self.carbTIN.update_layers(self.cumdiff - self.oldsed, self.elevation)
+            self.carbTIN.get_active_layer(self.input.tWave * self.input.wEro)
+            actlay = self.carbTIN.alay
+        else:
+            actlay = None
+        # Compute wave field and associated bottom current conditions
+        waveED, nactlay = self.wave.compute_wavesed(
+            tNow, self.input, self.force, self.elevation, actlay
+        )
+        # Wave-remobilized sediments sent to stream network if mobilized over steep slopes
+        # slopeVal = 0.01
+        # slopeBool = (self.slopeTIN > slopeVal).astype(int)
+        # waveDep = waveED.clip(min=0)  # keep positive values (deposition)
+        # self.waveMobile = np.multiply(slopeBool, waveDep)
+        # self.waveED = np.subtract(waveED, self.waveMobile)
+        # self.force.waveFlux = (
+        #     np.multiply(self.waveMobile, self.FVmesh.control_volumes)
+        #     / self.input.tWave
+        # )
+
+        # Update elevation / cumulative changes based on wave-induced sediment transport
+        self.elevation += waveED
+        self.cumdiff += waveED
+        self.wavediff += waveED
+        # self.elevation += self.waveED
+        # self.cumdiff += self.waveED
+        # self.wavediff += self.waveED
+        print(
+            "   - Compute wave-induced sediment transport %0.02f seconds"
+            % (time.perf_counter() - wavetime)
+        )
+        # Update carbonate active layer
+        if nactlay is not None:
+            self.carbTIN.update_active_layer(nactlay, self.elevation)
+        # Update next wave time step
+        self.force.next_wave += self.input.tWave
+
+        return self.force.next_wave
+
+    def _carbonate_event(self, tNow, verbose=False):
+        """
+        Compute carbonate evolution.
+        """
+
+        carbtime = time.perf_counter()
+        depth = self.elevation - self.force.sealevel
+        if self.carbTIN is not None:
+            # Update erosion/deposition due to river and diffusion on carbTIN
+            self.carbTIN.update_layers(self.cumdiff - self.oldsed, self.elevation)
+
+        # Compute reef growth
+        if self.input.carbonate:
+
+            # Load carbonate growth rates for species 1 and 2 during a given growth event
+            if self.force.next_carb <= tNow and self.force.next_carb < self.input.tEnd:
+                (
+                    self.carbMaxGrowthSp1,
+                    self.carbMaxGrowthSp2,
+                ) = self.force.get_carbGrowth(tNow, self.inIDs)
+            self.carbval, self.carbval2 = self.carb.computeCarbonate(
+                self.force.meanH,
+                self.cumdiff - self.oldsed,
+                depth,
+                self.carbMaxGrowthSp1,
+                self.carbMaxGrowthSp2,
+                self.input.tCarb,
+            )
+
+            if self.carbval2 is not None:
+                self.cumdiff += self.carbval + self.carbval2
+                self.elevation += self.carbval + self.carbval2
+            else:
+                self.cumdiff += self.carbval
+                self.elevation += self.carbval
+            if self.carbTIN is not None:
+                self.carbTIN.paleoDepth[:, self.carbTIN.step] = self.elevation
+                self.carbTIN.depoThick[:, self.carbTIN.step, 1] += self.carbval
+                self.carbTIN.layerThick[:, self.carbTIN.step] += self.carbval
+                if self.carbval2 is not None:
+                    self.carbTIN.depoThick[:, self.carbTIN.step, 2] += self.carbval2
+                    self.carbTIN.layerThick[:, self.carbTIN.step] += self.carbval2
+        # Compute pelagic rain
+        if self.input.pelagic:
+            self.pelaval = self.pelagic.computePelagic(depth, self.input.tCarb)
+            self.cumdiff += self.pelaval
+            self.elevation += self.pelaval
+            if self.carbTIN is not None:
+                self.carbTIN.paleoDepth[:, self.carbTIN.step] = self.elevation
+                self.carbTIN.depoThick[:, self.carbTIN.step, 0] += self.pelaval
+                self.carbTIN.layerThick[:, self.carbTIN.step] += self.pelaval
+        # Update proportion based on top layer
+        if self.prop is not None:
+            ids = np.where(self.carbTIN.layerThick[:, self.carbTIN.step] > 0.0)[0]
+            self.prop.fill(0.0)
+            self.prop[ids, 0] = (
+                self.carbTIN.depoThick[ids, self.carbTIN.step, 0]
+                / self.carbTIN.layerThick[ids, self.carbTIN.step]
+            )
+            if self.input.carbonate:
+                self.prop[ids, 1] = (
+                    self.carbTIN.depoThick[ids, self.carbTIN.step, 1]
+                    / self.carbTIN.layerThick[ids, self.carbTIN.step]
+                )
+                if self.carbval2 is not None:
+                    self.prop[ids, 2] = (
+                        self.carbTIN.depoThick[ids, self.carbTIN.step, 2]
+                        / self.carbTIN.layerThick[ids, self.carbTIN.step]
+                    )
+
+        # Update current cumulative erosion deposition
+        self.oldsed = np.copy(self.cumdiff)
+        self.next_carbStep += self.input.tCarb
+
+        print(
+            "   - Compute carbonate growth %0.02f seconds"
+            % (time.perf_counter() - carbtime)
+        )
+
+        return self.next_carbStep
+
+    def _strata_event(self, tNow, verbose=False):
+        """
+        Update next stratal layer time.
+        """
+
+        self.force.next_layer += self.input.laytime
+        if self.straTIN is not None:
+            self.straTIN.step += 1
+        if self.strata:
+            sub = self.strata.buildStrata(
+                self.elevation,
+                self.cumdiff,
+                self.force.sealevel,
+                self.recGrid.boundsPt,
+                self.outStrata,
+                self.outputStep,
+            )
+            self.elevation += sub
+            self.cumdiff += sub
+        self.outStrata = 0
+
+        return self.force.next_layer
+
+    def _output_event(self, tNow, verbose=False):
+        """
+        Create checkpoint files and write HDF5 output.
+        """
+
+        if self.force.next_display > self.input.tStart:
+            self.outStrata = 1
+        checkPoints.write_checkpoints(
+            self.input,
+            self.recGrid,
+            self.lGIDs,
+            self.inIDs,
+            tNow,
+            self.FVmesh,
+            self.force,
+            self.flow,
+            self.rain,
+            self.elevation,
+            self.fillH,
+            self.cumdiff,
+            self.cumhill,
+            self.cumfail,
+            self.wavediff,
+            self.outputStep,
+            self.prop,
+            self.mapero,
+            self.cumflex,
+        )
+
+        if self.straTIN is not None and self.outputStep % self.input.tmesh == 0:
+            meshtime = time.perf_counter()
+            self.straTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep)
+            print(
+                "   - Write sediment mesh output %0.02f seconds"
+                % (time.perf_counter() - meshtime)
+            )
+
+        if self.carbTIN is not None and self.outputStep % self.input.tmesh == 0:
+            meshtime = time.perf_counter()
+            self.carbTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep)
+            print(
+                "   - Write carbonate mesh output %0.02f seconds"
+                % (time.perf_counter() - meshtime)
+            )
+
+        # Update next display time
+        self.force.next_display = self._next_display(tNow)
+        self.outputStep += 1
+        if self.carbTIN is not None:
+            self.carbTIN.step += 1
+
+        return self.force.next_display
+
+    def coupling_fields(self):
+        """
+        Get the fields exchanged with an external model (e.g. a geodynamic code) in coupling mode.
+
+        Returns:
+            - fields - dictionary of numpy arrays (*elevation*, *cumdiff* and *disp*, plus *dispX*, *dispY* and *dispZ* for 3D displacements).
+
+        Warning:
+            The arrays are views on the model state and are not copied: they are only valid until the next call
+            to :code:`run_to_time` and should be copied if they need to be kept.
+        """
+
+        fields = {"elevation": self.elevation, "cumdiff": self.cumdiff}
+        if self.input.disp3d:
+            fields["disp"] = self.force.dispZ
+            fields["dispX"] = self.force.dispX
+            fields["dispY"] = self.force.dispY
+            fields["dispZ"] = self.force.dispZ
+        else:
+            fields["disp"] = self.disp
+
+        return fields
+
+    def _next_display(self, tNow):
+        """
+        Time of the next output following the one written at the current time.
+        """
+
+        if self.outPolicy is None:
+            return self.force.next_display + self.input.tDisplay
+
+        sedload = None
+        if self.flow.sedload is not None:
+            sedload = self.flow.sedload[self.inIDs]
+        tNext = self.outPolicy.mark(tNow, self.elevation[self.inIDs], sedload)
+        if tNow < self.input.tEnd:
+            tNext = min(tNext, self.input.tEnd)
+
+        return tNext
+
+    def run_to_time(
+        self, tEnd, verbose=False, coupled=False, steady=None, walltime_budget=None
+    ):
         """
         Run the simulation to a specified point in time.
 
         Args:
             tEnd : (float) time in years up to run the model for...
             verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+            coupled : (bool) when :code:`True`, the model is driven by an external loop performing many short calls
+                and the forced end-of-call flexure, stratal layer and output computations are skipped (default: :code:`False`).
+            steady : (steadyState) optional monitor stopping the simulation (or coarsening the output interval) once
+                topographic steady state is reached (default: :code:`None`).
+            walltime_budget : (float) wall-clock time in seconds allowed for this call (default: :code:`None`).
 
         Warning:
             If specified end time (**tEnd**) is greater than the one defined in the XML input file priority
             is given to the XML value.
+
+        Note:
+            In coupling mode, flexure, stratal layers and outputs are only performed at the intervals defined in
+            the XML input file. The exchanged fields are available through :code:`coupling_fields`.
+
+        Tip:
+            When the wall-clock budget is nearly exhausted or when a *SIGTERM* / *SIGUSR1* signal is received
+            (e.g. sent by a batch scheduler), the current time step is completed, a restart file is written with
+            :code:`write_restart` and the function returns with :code:`preempted` set to :code:`True`.
+            The simulation is then resumed with :code:`load_restart`.
         """
 
         assert hasattr(
@@ -312,384 +1274,203 @@ class Model(object):
 
         # Define non-flow related processes times
         if not self.simStarted:
-            self.force.next_rain = self.force.T_rain[0, 0]
-            self.force.next_disp = self.force.T_disp[0, 0]
-            self.force.next_carb = self.force.T_carb[0, 0]
-
-            self.force.next_display = self.input.tStart
-            if self.input.laytime > 0:
-                self.force.next_layer = self.input.tStart + self.input.laytime
-            else:
-                self.force.next_layer = self.input.tEnd + 1000.0
-            self.exitTime = self.input.tEnd
-            if self.input.flexure:
-                self.force.next_flexure = self.input.tStart + self.input.ftime
-            else:
-                self.force.next_flexure = self.exitTime + self.input.tDisplay
-            self.simStarted = True
-
-        outStrata = 0
-        last_time = time.process_time()
-        last_output = time.process_time()
+            self._start_simulation()
+
+        # The stratal output flag is kept when resuming an interrupted simulation
+        if not coupled and not self.resumed:
+            self.outStrata = 0
+        self.resumed = False
+        self.preempted = False
+        start_time = time.perf_counter()
+        last_time = time.perf_counter()
+        last_output = time.perf_counter()
+        max_step = 0.0
+        converged = False
 
         # Perform main simulation loop
-        while self.tNow < tEnd:
-            # At most, display output every 5 seconds
-            tloop = time.process_time() - last_time
-            if time.process_time() - last_output >= 5.0:
-                print("tNow = %s (step took %0.02f seconds)" % (self.tNow, tloop))
-                last_output = time.process_time()
-            last_time = time.process_time()
-
-            # Load precipitation rate
-            if (
-                self.force.next_rain <= self.tNow
-                and self.force.next_rain < self.input.tEnd
-            ):
-                if self.tNow == self.input.tStart:
-                    ref_elev = buildMesh.get_reference_elevation(
-                        self.input, self.recGrid, self.elevation
-                    )
-                    self.force.getSea(self.tNow, self.input.udw, ref_elev)
-                self.rain = np.zeros(self.totPts, dtype=float)
-                self.rain[self.inIDs] = self.force.get_Rain(
-                    self.tNow, self.elevation, self.inIDs
+        with self._preemption_handlers():
+            while self.tNow < tEnd:
+                # At most, display output every 5 seconds
+                tloop = time.perf_counter() - last_time
+                if time.perf_counter() - last_output >= 5.0:
+                    print("tNow = %s (step took %0.02f seconds)" % (self.tNow, tloop))
+                    last_output = time.perf_counter()
+                last_time = time.perf_counter()
+
+                # Keep the elevation at the beginning of the step for the steady state monitor
+                if steady is not None:
+                    tStep = self.tNow
+                    elevStep = self.work.get("steady")
+                    np.copyto(elevStep, self.elevation)
+
+                # Perform the processes which are due before computing the stream network
+                self.scheduler.run(self.tNow, 0, verbose)
+
+                # Compute stream network
+                self.fillH, self.elevation = buildFlux.streamflow(
+                    self.input,
+                    self.FVmesh,
+                    self.recGrid,
+                    self.force,
+                    self.hillslope,
+                    self.flow,
+                    self.elevation,
+                    self.lGIDs,
+                    self.rain,
+                    self.tNow,
+                    verbose,
+                    prof=self.profiler,
                 )
 
-            # Initialize waveFlux at tStart
-            # if self.tNow == self.input.tStart:
-            #     self.force.initWaveFlux(self.inIDs)
+                # Create checkpoint files and write HDF5 output
+                self.scheduler.run(self.tNow, 1, verbose)
 
-            # Load tectonic grid
-            if not self.input.disp3d:
-                # Vertical displacements
-                if (
-                    self.force.next_disp <= self.tNow
-                    and self.force.next_disp < self.input.tEnd
-                ):
-                    ldisp = np.zeros(self.totPts, dtype=float)
-                    ldisp.fill(-1.0e6)
-                    ldisp[self.inIDs] = self.force.load_Tecto_map(self.tNow, self.inIDs)
-                    self.disp = self.force.disp_border(
-                        ldisp,
-                        self.FVmesh.neighbours,
-                        self.FVmesh.edge_length,
-                        self.recGrid.boundsPt,
-                    )
-                    self.applyDisp = True
-            else:
-                # 3D displacements
-                if (
-                    self.force.next_disp <= self.tNow
-                    and self.force.next_disp < self.input.tEnd
-                ):
-                    if self.input.laytime == 0:
-                        updateMesh = self.force.load_Disp_map(
-                            self.tNow, self.FVmesh.node_coords[:, :2], self.inIDs
-                        )
-                    else:
-                        # Define 3D displacements on the stratal regions
-                        if self.strata is not None:
-                            updateMesh, regdX, regdY = self.force.load_Disp_map(
-                                self.tNow,
-                                self.FVmesh.node_coords[:, :2],
-                                self.inIDs,
-                                True,
-                                self.strata.xyi,
-                                self.strata.ids,
-                            )
-                        else:
-                            updateMesh = self.force.load_Disp_map(
-                                self.tNow, self.FVmesh.node_coords[:, :2], self.inIDs
-                            )
+                # Get the maximum time before updating one of the above processes / components
+                tStop = tEnd
+                tNext = self.scheduler.next_time()
+                if tNext is not None:
+                    tStop = min(tNext, tEnd)
 
-                    # Update mesh when a 3D displacements field has been loaded
-                    if updateMesh:
-                        self.force.dispZ = self.force.disp_border(
-                            self.force.dispZ,
-                            self.FVmesh.neighbours,
-                            self.FVmesh.edge_length,
-                            self.recGrid.boundsPt,
-                        )
-                        # Define flexural flags
-                        fflex = 0
-                        flexiso = None
-                        if self.input.flexure:
-                            flexiso = self.cumflex
-                            fflex = 1
-                        # Define stratal flags
-                        fstrat = 0
-                        sload = None
-                        if (
-                            self.input.udw == 1
-                            and self.tNow == self.input.tStart
-                            and self.strata is not None
-                        ):
-                            if self.strata.oldload is None:
-                                self.strata.oldload = np.zeros(
-                                    len(self.elevation), dtype=float
-                                )
-                        if self.strata is not None:
-                            if self.strata.oldload is None:
-                                self.strata.oldload = np.zeros(
-                                    len(self.elevation), dtype=float
-                                )
-                        if self.input.laytime > 0 and self.strata.oldload is not None:
-                            sload = self.strata.oldload
-                            fstrat = 1
-                        # Define erodibility map flags
-                        fero = 0
-                        vKe = None
-                        vTh = None
-                        if self.input.erolays is not None:
-                            if self.input.erolays >= 0:
-                                fero = 1
-                                vKe = self.mapero.Ke
-                                vTh = self.mapero.thickness
-                        # Apply horizontal displacements
-                        (
-                            self.recGrid.tinMesh,
-                            self.elevation,
-                            self.cumdiff,
-                            self.cumhill,
-                            self.cumfail,
-                            self.wavediff,
-                            fcum,
-                            scum,
-                            Ke,
-                            Th,
-                        ) = self.force.apply_XY_displacements(
-                            self.recGrid.areaDel,
-                            self.fixIDs,
-                            self.elevation,
-                            self.cumdiff,
-                            self.cumhill,
-                            self.cumfail,
-                            self.wavediff,
-                            tflex=flexiso,
-                            scum=sload,
-                            Te=vTh,
-                            Ke=vKe,
-                            flexure=fflex,
-                            strat=fstrat,
-                            ero=fero,
-                        )
-                        # Update relevant parameters in deformed TIN
-                        if fflex == 1:
-                            self.cumflex = fcum
-                        if fero == 1:
-                            self.mapero.Ke = Ke
-                            self.mapero.thickness = Th
-                        # Rebuild the computational mesh
-                        self._rebuild_mesh(verbose)
-
-                        # In case where the paleoflow workflow is used
-                        if self.force.uDisp is not None:
-                            self.elevation += self.force.uDisp
-
-                        # Update the stratigraphic mesh
-                        if self.input.laytime > 0 and self.strata is not None:
-                            self.strata.move_mesh(regdX, regdY, scum, verbose)
-
-            # Compute isostatic flexure
-            if self.tNow >= self.force.next_flexure:
-                flextime = time.process_time()
-                ref_elev = buildMesh.get_reference_elevation(
-                    self.input, self.recGrid, self.elevation
-                )
-                self.force.getSea(self.tNow, self.input.udw, ref_elev)
-                self.tinFlex = self.flex.get_flexure(
+                (
+                    self.tNow,
                     self.elevation,
                     self.cumdiff,
-                    self.force.sealevel,
-                    self.recGrid.boundsPt,
-                    initFlex=False,
-                )
-                # Get border values
-                self.tinFlex = self.force.disp_border(
-                    self.tinFlex,
-                    self.FVmesh.neighbours,
-                    self.FVmesh.edge_length,
-                    self.recGrid.boundsPt,
-                )
-                # Update flexural parameters
-                self.elevation += self.tinFlex
-                self.cumflex += self.tinFlex
-                # Update next flexure time
-                self.force.next_flexure += self.input.ftime
-                print(
-                    "   - Compute flexural isostasy %0.02f seconds"
-                    % (time.process_time() - flextime)
-                )
-
-            # Compute wavesed parameters
-            if self.tNow >= self.force.next_wave:
-                wavetime = time.process_time()
-                if self.carbTIN is not None:
-                    # Update erosion/deposition due to SPM processes on carbTIN
-                    self.carbTIN.update_layers(
-                        self.cumdiff - self.oldsed, self.elevation
-                    )
-                    self.carbTIN.get_active_layer(self.input.tWave * self.input.wEro)
-                    actlay = self.carbTIN.alay
-                else:
-                    actlay = None
-                # Compute wave field and associated bottom current conditions
-                waveED, nactlay = self.wave.compute_wavesed(
-                    self.tNow, self.input, self.force, self.elevation, actlay
-                )
-                # Wave-remobilized sediments sent to stream network if mobilized over steep slopes
-                # slopeVal = 0.01
-                # slopeBool = (self.slopeTIN > slopeVal).astype(int)
-                # waveDep = waveED.clip(min=0)  # keep positive values (deposition)
-                # self.waveMobile = np.multiply(slopeBool, waveDep)
-                # self.waveED = np.subtract(waveED, self.waveMobile)
-                # self.force.waveFlux = (
-                #     np.multiply(self.waveMobile, self.FVmesh.control_volumes)
-                #     / self.input.tWave
-                # )
-
-                # Update elevation / cumulative changes based on wave-induced sediment transport
-                self.elevation += waveED
-                self.cumdiff += waveED
-                self.wavediff += waveED
-                # self.elevation += self.waveED
-                # self.cumdiff += self.waveED
-                # self.wavediff += self.waveED
-                print(
-                    "   - Compute wave-induced sediment transport %0.02f seconds"
-                    % (time.process_time() - wavetime)
+                    self.cumhill,
+                    self.cumfail,
+                    self.slopeTIN,
+                ) = buildFlux.sediment_flux(
+                    self.input,
+                    self.recGrid,
+                    self.hillslope,
+                    self.FVmesh,
+                    self.flow,
+                    self.force,
+                    self.rain,
+                    self.lGIDs,
+                    self.applyDisp,
+                    self.straTIN,
+                    self.mapero,
+                    self.cumdiff,
+                    self.cumhill,
+                    self.cumfail,
+                    self.fillH,
+                    self.disp,
+                    self.inGIDs,
+                    self.elevation,
+                    self.tNow,
+                    tStop,
+                    verbose,
+                    prof=self.profiler,
+                    tel=self.telemetry,
                 )
-                # Update carbonate active layer
-                if nactlay is not None:
-                    self.carbTIN.update_active_layer(nactlay, self.elevation)
-                # Update next wave time step
-                self.force.next_wave += self.input.tWave
-
-            # Compute carbonate evolution
-            if self.tNow >= self.next_carbStep:
-                carbtime = time.process_time()
-                depth = self.elevation - self.force.sealevel
-                if self.carbTIN is not None:
-                    # Update erosion/deposition due to river and diffusion on carbTIN
-                    self.carbTIN.update_layers(
-                        self.cumdiff - self.oldsed, self.elevation
-                    )
 
-                # Compute reef growth
-                if self.input.carbonate:
-
-                    # Load carbonate growth rates for species 1 and 2 during a given growth event
+                # Bring the next output forward when the surface has changed significantly
+                if self.outPolicy is not None:
+                    sedload = None
+                    if self.flow.sedload is not None:
+                        sedload = self.flow.sedload[self.inIDs]
                     if (
-                        self.force.next_carb <= self.tNow
-                        and self.force.next_carb < self.input.tEnd
-                    ):
-                        (
-                            self.carbMaxGrowthSp1,
-                            self.carbMaxGrowthSp2,
-                        ) = self.force.get_carbGrowth(self.tNow, self.inIDs)
-                    self.carbval, self.carbval2 = self.carb.computeCarbonate(
-                        self.force.meanH,
-                        self.cumdiff - self.oldsed,
-                        depth,
-                        self.carbMaxGrowthSp1,
-                        self.carbMaxGrowthSp2,
-                        self.input.tCarb,
-                    )
-
-                    if self.carbval2 is not None:
-                        self.cumdiff += self.carbval + self.carbval2
-                        self.elevation += self.carbval + self.carbval2
-                    else:
-                        self.cumdiff += self.carbval
-                        self.elevation += self.carbval
-                    if self.carbTIN is not None:
-                        self.carbTIN.paleoDepth[:, self.carbTIN.step] = self.elevation
-                        self.carbTIN.depoThick[:, self.carbTIN.step, 1] += self.carbval
-                        self.carbTIN.layerThick[:, self.carbTIN.step] += self.carbval
-                        if self.carbval2 is not None:
-                            self.carbTIN.depoThick[
-                                :, self.carbTIN.step, 2
-                            ] += self.carbval2
-                            self.carbTIN.layerThick[
-                                :, self.carbTIN.step
-                            ] += self.carbval2
-                # Compute pelagic rain
-                if self.input.pelagic:
-                    self.pelaval = self.pelagic.computePelagic(depth, self.input.tCarb)
-                    self.cumdiff += self.pelaval
-                    self.elevation += self.pelaval
-                    if self.carbTIN is not None:
-                        self.carbTIN.paleoDepth[:, self.carbTIN.step] = self.elevation
-                        self.carbTIN.depoThick[:, self.carbTIN.step, 0] += self.pelaval
-                        self.carbTIN.layerThick[:, self.carbTIN.step] += self.pelaval
-                # Update proportion based on top layer
-                if self.prop is not None:
-                    ids = np.where(self.carbTIN.layerThick[:, self.carbTIN.step] > 0.0)[
-                        0
-                    ]
-                    self.prop.fill(0.0)
-                    self.prop[ids, 0] = (
-                        self.carbTIN.depoThick[ids, self.carbTIN.step, 0]
-                        / self.carbTIN.layerThick[ids, self.carbTIN.step]
-                    )
-                    if self.input.carbonate:
-                        self.prop[ids, 1] = (
-                            self.carbTIN.depoThick[ids, self.carbTIN.step, 1]
-                            / self.carbTIN.layerThick[ids, self.carbTIN.step]
+                        self.outPolicy.due(
+                            self.tNow, self.elevation[self.inIDs], sedload
                         )
-                        if self.carbval2 is not None:
-                            self.prop[ids, 2] = (
-                                self.carbTIN.depoThick[ids, self.carbTIN.step, 2]
-                                / self.carbTIN.layerThick[ids, self.carbTIN.step]
+                        and self.tNow < self.force.next_display
+                    ):
+                        self.force.next_display = self.tNow
+                        self.scheduler.reschedule("output", self.tNow)
+
+                # Check convergence towards steady state
+                if steady is not None and len(elevStep) == len(self.elevation):
+                    if steady.update(
+                        self.tNow,
+                        self.tNow - tStep,
+                        self.elevation[self.inIDs] - elevStep[self.inIDs],
+                        self.FVmesh.control_volumes[self.inIDs],
+                        self.flow.outload,
+                        self.flow.erotot,
+                    ):
+                        print("Steady state reached at tNow = %s" % self.tNow)
+                        if steady.action == "stop":
+                            converged = True
+                            break
+                        # Coarsen the output interval
+                        self.input.tDisplay *= steady.coarsen
+                        if self.outPolicy is not None:
+                            self.outPolicy.minInterval *= steady.coarsen
+                            self.outPolicy.maxInterval *= steady.coarsen
+                            next_display = (
+                                self.outPolicy.tLast + self.outPolicy.maxInterval
+                            )
+                        else:
+                            next_display = (
+                                self.force.next_display
+                                + (1.0 - 1.0 / steady.coarsen) * self.input.tDisplay
                             )
+                        self.force.next_display = min(next_display, self.input.tEnd)
+                        self.scheduler.reschedule("output", self.force.next_display)
+
+                # Stop before the wall-clock budget is exhausted or when the job is preempted
+                max_step = max(max_step, time.perf_counter() - last_time)
+                if self.tNow >= tEnd:
+                    break
+                if self._signal is not None:
+                    self.preempted = True
+                elif walltime_budget is not None:
+                    elapsed = time.perf_counter() - start_time
+                    self.preempted = elapsed + 2.0 * max_step >= walltime_budget
+                if self.preempted:
+                    break
+
+        if self.preempted:
+            with self.profiler.phase("checkpoint"):
+                filename = self.write_restart()
+            print(
+                "Simulation interrupted at tNow = %s, restart file written in %s"
+                % (self.tNow, filename)
+            )
+            return
+
+        if coupled:
+            # Outputs are only written on the XML cadence, the last one at the end of the simulation
+            if converged:
+                self.scheduler.reschedule("output", self.tNow)
+            if converged or self.tNow >= self.input.tEnd:
+                self.scheduler.run(self.tNow, 1, verbose)
+            return
 
-                # Update current cumulative erosion deposition
-                self.oldsed = np.copy(self.cumdiff)
-                self.next_carbStep += self.input.tCarb
+        tloop = time.perf_counter() - last_time
+        print("tNow = %s (%0.02f seconds)" % (self.tNow, tloop))
 
-                print(
-                    "   - Compute carbonate growth %0.02f seconds"
-                    % (time.process_time() - carbtime)
+        # Isostatic flexure
+        if self.input.flexure:
+            with self.profiler.phase("flexure"):
+                self.scheduler.reschedule(
+                    "flexure", self._flexure_event(self.tNow, verbose)
                 )
 
-            # Update next stratal layer time
-            if self.tNow >= self.force.next_layer:
+        # Update next stratal layer time
+        if self.tNow >= self.force.next_layer:
+            with self.profiler.phase("strata"):
                 self.force.next_layer += self.input.laytime
-                if self.straTIN is not None:
-                    self.straTIN.step += 1
-                if self.strata:
-                    sub = self.strata.buildStrata(
-                        self.elevation,
-                        self.cumdiff,
-                        self.force.sealevel,
-                        self.recGrid.boundsPt,
-                        outStrata,
-                        self.outputStep,
-                    )
-                    self.elevation += sub
-                    self.cumdiff += sub
-                outStrata = 0
-
-            # Compute stream network
-            self.fillH, self.elevation = buildFlux.streamflow(
-                self.input,
-                self.FVmesh,
-                self.recGrid,
-                self.force,
-                self.hillslope,
-                self.flow,
-                self.elevation,
-                self.lGIDs,
-                self.rain,
-                self.tNow,
-                verbose,
-            )
+                sub = self.strata.buildStrata(
+                    self.elevation,
+                    self.cumdiff,
+                    self.force.sealevel,
+                    self.recGrid.boundsPt,
+                    1,
+                    self.outputStep + 1,
+                )
+                self.elevation += sub
+                self.cumdiff += sub
+            self.scheduler.reschedule("strata", self.force.next_layer)
 
-            # Create checkpoint files and write HDF5 output
-            if self.tNow >= self.force.next_display:
-                if self.force.next_display > self.input.tStart:
-                    outStrata = 1
+        # Create checkpoint files and write HDF5 output
+        if (
+            self.input.udw == 0
+            or converged
+            or self.tNow == self.input.tEnd
+            or self.tNow == self.force.next_display
+        ):
+            with self.profiler.phase("checkpoint"):
                 checkPoints.write_checkpoints(
                     self.input,
                     self.recGrid,
@@ -713,169 +1494,30 @@ class Model(object):
                 )
 
                 if self.straTIN is not None and self.outputStep % self.input.tmesh == 0:
-                    meshtime = time.process_time()
+                    meshtime = time.perf_counter()
                     self.straTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep)
                     print(
                         "   - Write sediment mesh output %0.02f seconds"
-                        % (time.process_time() - meshtime)
+                        % (time.perf_counter() - meshtime)
                     )
 
                 if self.carbTIN is not None and self.outputStep % self.input.tmesh == 0:
-                    meshtime = time.process_time()
+                    meshtime = time.perf_counter()
                     self.carbTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep)
                     print(
                         "   - Write carbonate mesh output %0.02f seconds"
-                        % (time.process_time() - meshtime)
+                        % (time.perf_counter() - meshtime)
                     )
 
-                # Update next display time
-                last_output = time.process_time()
-                self.force.next_display += self.input.tDisplay
+                self.force.next_display = self._next_display(self.tNow)
                 self.outputStep += 1
+                if self.straTIN is not None:
+                    self.straTIN.write_hdf5_stratigraphy(
+                        self.lGIDs, self.outputStep - 1
+                    )
                 if self.carbTIN is not None:
+                    self.carbTIN.write_hdf5_stratigraphy(
+                        self.lGIDs, self.outputStep - 1
+                    )
                     self.carbTIN.step += 1
-
-            # Get the maximum time before updating one of the above processes / components
-            tStop = min(
-                [
-                    self.force.next_display,
-                    self.force.next_layer,
-                    self.force.next_flexure,
-                    tEnd,
-                    self.force.next_wave,
-                    self.force.next_disp,
-                    self.force.next_rain,
-                    self.next_carbStep,
-                ]
-            )
-
-            (
-                self.tNow,
-                self.elevation,
-                self.cumdiff,
-                self.cumhill,
-                self.cumfail,
-                self.slopeTIN,
-            ) = buildFlux.sediment_flux(
-                self.input,
-                self.recGrid,
-                self.hillslope,
-                self.FVmesh,
-                self.flow,
-                self.force,
-                self.rain,
-                self.lGIDs,
-                self.applyDisp,
-                self.straTIN,
-                self.mapero,
-                self.cumdiff,
-                self.cumhill,
-                self.cumfail,
-                self.fillH,
-                self.disp,
-                self.inGIDs,
-                self.elevation,
-                self.tNow,
-                tStop,
-                verbose,
-            )
-
-        tloop = time.process_time() - last_time
-        print("tNow = %s (%0.02f seconds)" % (self.tNow, tloop))
-
-        # Isostatic flexure
-        if self.input.flexure:
-            flextime = time.process_time()
-            ref_elev = buildMesh.get_reference_elevation(
-                self.input, self.recGrid, self.elevation
-            )
-            self.force.getSea(self.tNow, self.input.udw, ref_elev)
-            self.tinFlex = self.flex.get_flexure(
-                self.elevation,
-                self.cumdiff,
-                self.force.sealevel,
-                self.recGrid.boundsPt,
-                initFlex=False,
-            )
-            # Get border values
-            self.tinFlex = self.force.disp_border(
-                self.tinFlex,
-                self.FVmesh.neighbours,
-                self.FVmesh.edge_length,
-                self.recGrid.boundsPt,
-            )
-            # Update flexural parameters
-            self.elevation += self.tinFlex
-            self.cumflex += self.tinFlex
-            # Update next flexure time
-            self.force.next_flexure += self.input.ftime
-            print(
-                "   - Compute flexural isostasy %0.02f seconds"
-                % (time.process_time() - flextime)
-            )
-
-        # Update next stratal layer time
-        if self.tNow >= self.force.next_layer:
-            self.force.next_layer += self.input.laytime
-            sub = self.strata.buildStrata(
-                self.elevation,
-                self.cumdiff,
-                self.force.sealevel,
-                self.recGrid.boundsPt,
-                1,
-                self.outputStep + 1,
-            )
-            self.elevation += sub
-            self.cumdiff += sub
-
-        # Create checkpoint files and write HDF5 output
-        if (
-            self.input.udw == 0
-            or self.tNow == self.input.tEnd
-            or self.tNow == self.force.next_display
-        ):
-            checkPoints.write_checkpoints(
-                self.input,
-                self.recGrid,
-                self.lGIDs,
-                self.inIDs,
-                self.tNow,
-                self.FVmesh,
-                self.force,
-                self.flow,
-                self.rain,
-                self.elevation,
-                self.fillH,
-                self.cumdiff,
-                self.cumhill,
-                self.cumfail,
-                self.wavediff,
-                self.outputStep,
-                self.prop,
-                self.mapero,
-                self.cumflex,
-            )
-
-            if self.straTIN is not None and self.outputStep % self.input.tmesh == 0:
-                meshtime = time.process_time()
-                self.straTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep)
-                print(
-                    "   - Write sediment mesh output %0.02f seconds"
-                    % (time.process_time() - meshtime)
-                )
-
-            if self.carbTIN is not None and self.outputStep % self.input.tmesh == 0:
-                meshtime = time.process_time()
-                self.carbTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep)
-                print(
-                    "   - Write carbonate mesh output %0.02f seconds"
-                    % (time.process_time() - meshtime)
-                )
-
-            self.force.next_display += self.input.tDisplay
-            self.outputStep += 1
-            if self.straTIN is not None:
-                self.straTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep - 1)
-            if self.carbTIN is not None:
-                self.carbTIN.write_hdf5_stratigraphy(self.lGIDs, self.outputStep - 1)
-                self.carbTIN.step += 1
+            self.scheduler.reschedule("output", self.force.next_display)
@@ -11,3 +11,9 @@ Implementation related to **badlands** main simulation functions.
 """
 
 from . import waveSed
+from . import runProfile
+from . import stepTelemetry
+from . import eventScheduler
+from . import workSpace
+from . import steadyState
+from . import outputPolicy
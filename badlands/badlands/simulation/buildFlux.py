@@ -18,7 +18,7 @@ from matplotlib import path
 import os
 
 if "READTHEDOCS" not in os.environ:
-    from badlands import elevationTIN, buildMesh
+    from badlands import elevationTIN, buildMesh, runProfile, workSpace
 
 
 def streamflow(
@@ -33,6 +33,7 @@ def streamflow(
     rain,
     tNow,
     verbose=False,
+    prof=None,
 ):
     """
     Compute stream flow.
@@ -49,6 +50,7 @@ def streamflow(
         rain: numpy 1D array containing rainfall precipitation values.
         tNow: simulation time step.
         verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+        prof: class recording the time spent in each phase (default: :code:`None`).
 
     Returns
     -------
@@ -58,86 +60,65 @@ def streamflow(
         numpy 1D array containing the elevations.
     """
 
+    if prof is None:
+        prof = runProfile.runProfile(enabled=verbose)
+
     # Update sea-level
-    walltime = time.process_time()
-    ref_elev = buildMesh.get_reference_elevation(input, recGrid, elevation)
-    force.getSea(tNow, input.udw, ref_elev)
-    fillH = None
-
-    # Update river input
-    force.getRivers(tNow)
-    riverrain = rain + force.rivQw
-
-    # Build an initial depression-less surface at start time if required
-    if input.tStart == tNow and input.nopit == 1:
-        fillH = elevationTIN.pit_stack(elevation, input.nopit, force.sealevel)
-        elevation = fillH
-    else:
-        fillH = elevationTIN.pit_stack(elevation, 0, force.sealevel)
+    with prof.phase("pitfill"):
+        ref_elev = buildMesh.get_reference_elevation(input, recGrid, elevation)
+        force.getSea(tNow, input.udw, ref_elev)
+        fillH = None
+
+        # Update river input
+        force.getRivers(tNow)
+        riverrain = rain + force.rivQw
+
+        # Build an initial depression-less surface at start time if required
+        if input.tStart == tNow and input.nopit == 1:
+            fillH = elevationTIN.pit_stack(
+                elevation, input.nopit, force.sealevel, FVmesh.pitTiles
+            )
+            elevation = fillH
+        else:
+            fillH = elevationTIN.pit_stack(
+                elevation, 0, force.sealevel, FVmesh.pitTiles, flow.work.get("fillH")
+            )
 
     if verbose and input.spl:
-        print(
-            " -   depression-less algorithm PD with stack",
-            time.process_time() - walltime,
-        )
+        print(" -   depression-less algorithm PD with stack", prof.elapsed("pitfill"))
 
     # Compute stream network
-    walltime = time.process_time()
-    flow.SFD_receivers(
-        fillH, elevation, FVmesh.neighbours, FVmesh.vor_edges, FVmesh.edge_length, lGIDs
-    )
+    with prof.phase("receivers"):
+        flow.flow_graph(fillH, elevation, FVmesh.ngbOffset, FVmesh.neighbours, lGIDs)
 
     if verbose:
-        print(" -   compute receivers parallel ", time.process_time() - walltime)
+        print(" -   compute receivers parallel ", prof.elapsed("receivers"))
 
-    # Distribute evenly local minimas to processors on filled surface
-    walltime = time.process_time()
-    flow.localbase = flow.base
-    flow.ordered_node_array_filled()
-    if verbose:
-        print(
-            " -   compute stack order locally for filled surface",
-            time.process_time() - walltime,
-        )
+    # Build the stacks of the filled and real surfaces
+    with prof.phase("stack"):
+        flow.flow_stacks()
+        flow.stack = flow.localstack
+        flow.stack1 = flow.localstack1
 
-    walltime = time.process_time()
-    flow.stack = flow.localstack
     if verbose:
         print(
-            " -   send stack order for filled surface globally ",
-            time.process_time() - walltime,
-        )
-
-    # Distribute evenly local minimas on real surface
-    walltime = time.process_time()
-    flow.localbase1 = flow.base1
-    flow.ordered_node_array_elev()
-    if verbose:
-        print(
-            " -   compute stack order locally for real surface",
-            time.process_time() - walltime,
-        )
-
-    walltime = time.process_time()
-    flow.stack1 = flow.localstack1
-    if verbose:
-        print(
-            " -   send stack order for real surface globally ",
-            time.process_time() - walltime,
+            " -   compute stack order for filled and real surfaces",
+            prof.elapsed("stack"),
         )
 
     # Compute a unique ID for each local depression and their downstream draining nodes
-    flow.compute_parameters_depression(
-        fillH, elevation, FVmesh.control_volumes, force.sealevel
-    )
+    with prof.phase("depressions"):
+        flow.compute_parameters_depression(
+            fillH, elevation, FVmesh.control_volumes, force.sealevel
+        )
     if verbose:
-        print(" -   compute depressions ", time.process_time() - walltime)
+        print(" -   compute depressions ", prof.elapsed("depressions"))
 
     # Compute discharge
-    walltime = time.process_time()
-    flow.compute_flow(force.sealevel, elevation, FVmesh.control_volumes, riverrain)
+    with prof.phase("discharge"):
+        flow.compute_flow(force.sealevel, elevation, FVmesh.control_volumes, riverrain)
     if verbose:
-        print(" -   compute discharge ", time.process_time() - walltime)
+        print(" -   compute discharge ", prof.elapsed("discharge"))
 
     return fillH, elevation
 
@@ -164,6 +145,8 @@ def sediment_flux(
     tNow,
     tEnd,
     verbose=False,
+    prof=None,
+    tel=None,
 ):
     """
     Compute sediment fluxes.
@@ -190,6 +173,8 @@ def sediment_flux(
         tNow: simulation time step.
         tEnd: simulation end time.
         verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+        prof: class recording the time spent in each phase (default: :code:`None`).
+        tel: class recording which constraint has limited the time step (default: :code:`None`).
 
     Returns
     -------
@@ -206,24 +191,29 @@ def sediment_flux(
 
     """
 
-    flow_time = time.process_time()
+    if prof is None:
+        prof = runProfile.runProfile(enabled=verbose)
+    if flow.work is None:
+        flow.work = workSpace.workSpace(len(elevation))
+    work = flow.work
+    flow_time = time.perf_counter()
 
     # Get active layer
     if straTIN is not None:
-        walltime = time.process_time()
-        flow.activelay[flow.activelay < 1.0] = 1.0
-        flow.activelay[flow.activelay > straTIN.activeh] = straTIN.activeh
-        straTIN.get_active_layer(flow.activelay, verbose)
-        activelay = straTIN.alayR
-        flow.straTIN = 1
-        # Set the average erodibility based on rock types in the active layer
-        flow.erodibility = np.sum(
-            straTIN.rockCk * activelay / flow.activelay.reshape(len(elevation), 1),
-            axis=1,
-        )
-        eroCk = straTIN.rockCk
+        with prof.phase("activelayer"):
+            flow.activelay[flow.activelay < 1.0] = 1.0
+            flow.activelay[flow.activelay > straTIN.activeh] = straTIN.activeh
+            straTIN.get_active_layer(flow.activelay, verbose)
+            activelay = straTIN.alayR
+            flow.straTIN = 1
+            # Set the average erodibility based on rock types in the active layer
+            flow.erodibility = np.sum(
+                straTIN.rockCk * activelay / flow.activelay.reshape(len(elevation), 1),
+                axis=1,
+            )
+            eroCk = straTIN.rockCk
         if verbose:
-            print(" -   Get active layer ", time.process_time() - walltime)
+            print(" -   Get active layer ", prof.elapsed("activelayer"))
     else:
         activelay = None
         eroCk = 0.0
@@ -270,70 +260,95 @@ def sediment_flux(
         flow.borders2 = np.zeros(len(FVmesh.control_volumes), dtype=int)
         flow.borders2[flow.insideIDs2] = 1
         flow.outsideIDs2 = np.where(flow.borders2 == 0)[0]
+        work.insideMask = None
+    if work.insideMask is None:
+        work.set_inside(flow.insideIDs, FVmesh.control_volumes)
 
     # Compute CFL condition
-    walltime = time.process_time()
-    if input.Hillslope and hillslope.updatedt == 0:
-        if hillslope.Sc == 0:
-            hillslope.dt_stability(FVmesh.edge_length[inGIDs, : FVmesh.maxNgbh])
-        else:
-            hillslope.dt_stabilityCs(
-                elevation, FVmesh.neighbours, FVmesh.edge_length, lGIDs, flow.borders2
-            )
-            if hillslope.CFL < input.minDT:
-                print(
-                    "Decrease your hillslope diffusion coefficients to ensure stability."
+    with prof.phase("cfl"):
+        if input.Hillslope and hillslope.updatedt == 0:
+            if input.hillSolver == "implicit" and straTIN is None:
+                # The implicit hillslope diffusion is unconditionally stable
+                hillslope.CFL = 1.0e6
+                hillslope.updatedt = 1
+            elif hillslope.Sc == 0:
+                hillslope.dt_stability(FVmesh.edge_length)
+            else:
+                hillslope.dt_stabilityCs(
+                    elevation,
+                    FVmesh.ngbOffset,
+                    FVmesh.neighbours,
+                    FVmesh.edge_length,
+                    lGIDs,
+                    flow.borders2,
                 )
-                sys.exit(0)
-        hillslope.dt_stability_ms(FVmesh.edge_length[inGIDs, : FVmesh.maxNgbh])
-        hillslope.dt_stability_fail(FVmesh.edge_length[inGIDs, : FVmesh.maxNgbh])
-    elif hillslope.CFL is None:
-        hillslope.CFL = tEnd - tNow
-
-    flow.dt_stability(fillH, inGIDs)
-    CFLtime = min(flow.CFL, hillslope.CFL)
-    if CFLtime > 1.0:
-        CFLtime = float(round(CFLtime - 0.5, 0))
-    if verbose:
-        print("CFL for hillslope and flow ", hillslope.CFL, flow.CFL, CFLtime)
-    CFLtime = min(CFLtime, tEnd - tNow)
-    if input.minDT > 1:
-        if CFLtime < input.minDT:
-            if input.minDT > tEnd - tNow:
-                CFLtime = tEnd - tNow
+                if hillslope.CFL < input.minDT:
+                    print(
+                        "Decrease your hillslope diffusion coefficients to ensure stability."
+                    )
+                    sys.exit(0)
+            hillslope.dt_stability_ms(FVmesh.edge_length)
+            hillslope.dt_stability_fail(FVmesh.edge_length)
+        elif hillslope.CFL is None:
+            hillslope.CFL = tEnd - tNow
+
+        flow.dt_stability(fillH, inGIDs)
+        CFLtime = min(flow.CFL, hillslope.CFL)
+        if hillslope.CFL < flow.CFL:
+            limiter, limit = "hillslope", hillslope.CFL
+        else:
+            limiter, limit = "flow", flow.CFL
+        if CFLtime > 1.0:
+            CFLtime = float(round(CFLtime - 0.5, 0))
+        if verbose:
+            print("CFL for hillslope and flow ", hillslope.CFL, flow.CFL, CFLtime)
+        if tEnd - tNow < CFLtime:
+            limiter, limit = "event", tEnd - tNow
+        CFLtime = min(CFLtime, tEnd - tNow)
+        boundDT = CFLtime
+        if input.minDT > 1:
+            if CFLtime < input.minDT:
+                if input.minDT > tEnd - tNow:
+                    CFLtime = tEnd - tNow
+                else:
+                    CFLtime = max(input.minDT, CFLtime)
             else:
                 CFLtime = max(input.minDT, CFLtime)
         else:
             CFLtime = max(input.minDT, CFLtime)
-    else:
-        CFLtime = max(input.minDT, CFLtime)
-    CFLtime = min(input.maxDT, CFLtime)
+        if CFLtime > boundDT:
+            limiter, limit = "minDT", input.minDT
+        if input.maxDT < CFLtime:
+            limiter, limit = "maxDT", input.maxDT
+        CFLtime = min(input.maxDT, CFLtime)
     if verbose:
-        print(" -   Get CFL time step ", time.process_time() - walltime)
+        print(" -   Get CFL time step ", prof.elapsed("cfl"))
 
     # Compute sediment fluxes
     if input.erolays and input.erolays >= 0:
-        oldelev = np.copy(elevation)
+        oldelev = work.get("oldelev")
+        np.copyto(oldelev, elevation)
 
     # Initial cumulative elevation change
-    walltime = time.process_time()
-    timestep, sedchange, erosion, deposition, slopeTIN = flow.compute_sedflux(
-        FVmesh.control_volumes,
-        elevation,
-        rain,
-        fillH,
-        CFLtime,
-        activelay,
-        eroCk,
-        force.rivQs,
-        force.sealevel,
-        input.perc_dep,
-        input.slp_cr,
-        FVmesh.neighbours,
-        verbose=False,
-    )
+    with prof.phase("streampower"):
+        timestep, sedchange, erosion, deposition, slopeTIN = flow.compute_sedflux(
+            FVmesh.control_volumes,
+            elevation,
+            rain,
+            fillH,
+            CFLtime,
+            activelay,
+            eroCk,
+            force.rivQs,
+            force.sealevel,
+            input.perc_dep,
+            input.slp_cr,
+            FVmesh.neighbours,
+            verbose=False,
+        )
 
     if timestep < CFLtime:
+        limiter, limit = "overfill", timestep
         if input.minDT > tEnd - tNow:
             CFLtime = tEnd - tNow
         else:
@@ -342,210 +357,298 @@ def sediment_flux(
         CFLtime = max(input.minDT, CFLtime)
 
     if verbose:
-        print(" -   Get stream fluxes ", time.process_time() - walltime)
+        print(" -   Get stream fluxes ", prof.elapsed("streampower"))
 
-    ed = np.sum(sedchange, axis=1)
+    ed = np.sum(sedchange, axis=1, out=work.get("ed"))
     elevation += ed
     cumdiff += ed
 
     # Compute marine sediment diffusion
+    marineIt = 0
+    failIt = 0
     if hillslope.CDriver > 0.0:
-        walltime = time.process_time()
-
-        # Initialise marine sediments diffusion array
-        it = 0
-        sumdep = np.sum(deposition, axis=1)
-        maxth = 0.1
-        diffstep = timestep
-        diffcoeff = hillslope.sedfluxmarine(
-            force.sealevel, elevation, FVmesh.control_volumes
-        )
+        with prof.phase("marine"):
 
-        # Perform river related sediment diffusion
-        while diffstep > 0.0 and it < 1000:
-            # Define maximum time step
-            maxstep = min(hillslope.CFLms, diffstep)
-            # Compute maximum marine fluxes and maximum timestep to avoid excessive diffusion erosion
-            diffmarine, mindt = flow.compute_marine_diffusion(
-                elevation,
-                sumdep,
-                FVmesh.neighbours,
-                FVmesh.vor_edges,
-                FVmesh.edge_length,
-                diffcoeff,
-                lGIDs,
-                force.sealevel,
-                maxth,
-                maxstep,
-            )
-            diffmarine[flow.outsideIDs] = 0.0
-            maxstep = min(mindt, maxstep)
-            # if maxstep < input.minDT:
-            #    print 'WARNING: marine diffusion time step is smaller than minimum timestep:',maxstep
-            #    print 'You will need to decrease your diffusion coefficient for criver'
-            #    stop
-
-            # Update diffusion time step and total diffused thicknesses
-            diffstep -= maxstep
-
-            # Distribute rock based on their respective proportions in the deposited columns
-            if straTIN is not None:
-                # Compute multi-rock diffusion
-                sedpropflux, difftot = flow.compute_sediment_marine(
+            # Initialise marine sediments diffusion array
+            it = 0
+            sumdep = np.sum(deposition, axis=1, out=work.get("sumdep"))
+            maxth = 0.1
+            diffstep = timestep
+
+            if input.transportSolver == "implicit":
+                # Perform river related sediment diffusion over the time step in a single solve
+                diffmarine, sedpropflux = hillslope.implicit.diffuse_layer(
                     elevation,
-                    deposition,
                     sumdep,
-                    diffcoeff * maxstep,
+                    hillslope.CDriver,
+                    FVmesh.control_volumes,
+                    FVmesh.ngbOffset,
                     FVmesh.neighbours,
-                    force.sealevel,
-                    maxth,
                     FVmesh.vor_edges,
                     FVmesh.edge_length,
-                    lGIDs,
+                    flow.borders,
+                    maxth,
+                    timestep,
+                    force.sealevel,
+                    deposition if straTIN is not None else None,
                 )
-                difftot[flow.outsideIDs] = 0.0
-                sedpropflux[flow.outsideIDs, :] = 0.0
-
-                # Update deposition for each rock type
-                deposition += sedpropflux
-                deposition[deposition < 0] = 0.0
+                diffmarine[flow.outsideIDs] = 0.0
+                if straTIN is not None:
+                    # Update deposition for each rock type
+                    sedpropflux[flow.outsideIDs, :] = 0.0
+                    deposition += sedpropflux
+                    deposition[deposition < 0] = 0.0
 
                 # Update elevation, erosion/deposition
-                sumdep += difftot
-                elevation += difftot
-                cumdiff += difftot
+                sumdep += diffmarine
+                elevation += diffmarine
+                cumdiff += diffmarine
+                it = 1
             else:
-                # Update elevation, erosion/deposition
-                sumdep += diffmarine * maxstep
-                elevation += diffmarine * maxstep
-                cumdiff += diffmarine * maxstep
-            it += 1
+                diffcoeff = hillslope.sedfluxmarine(
+                    force.sealevel, elevation, FVmesh.control_volumes
+                )
+
+                # Perform river related sediment diffusion
+                while diffstep > 0.0 and it < 1000:
+                    # Define maximum time step
+                    maxstep = min(hillslope.CFLms, diffstep)
+                    # Compute maximum marine fluxes and maximum timestep to avoid excessive diffusion erosion
+                    diffmarine, mindt = flow.compute_marine_diffusion(
+                        elevation,
+                        sumdep,
+                        FVmesh.ngbOffset,
+                        FVmesh.neighbours,
+                        FVmesh.vor_edges,
+                        FVmesh.edge_length,
+                        diffcoeff,
+                        lGIDs,
+                        force.sealevel,
+                        maxth,
+                        maxstep,
+                    )
+                    diffmarine[flow.outsideIDs] = 0.0
+                    maxstep = min(mindt, maxstep)
+                    # if maxstep < input.minDT:
+                    #    print 'WARNING: marine diffusion time step is smaller than minimum timestep:',maxstep
+                    #    print 'You will need to decrease your diffusion coefficient for criver'
+                    #    stop
+
+                    # Update diffusion time step and total diffused thicknesses
+                    diffstep -= maxstep
+
+                    # Distribute rock based on their respective proportions in the deposited columns
+                    if straTIN is not None:
+                        # Compute multi-rock diffusion
+                        sedpropflux, difftot = flow.compute_sediment_marine(
+                            elevation,
+                            deposition,
+                            sumdep,
+                            diffcoeff * maxstep,
+                            FVmesh.ngbOffset,
+                            FVmesh.neighbours,
+                            force.sealevel,
+                            maxth,
+                            FVmesh.vor_edges,
+                            FVmesh.edge_length,
+                            lGIDs,
+                        )
+                        difftot[flow.outsideIDs] = 0.0
+                        sedpropflux[flow.outsideIDs, :] = 0.0
+
+                        # Update deposition for each rock type
+                        deposition += sedpropflux
+                        deposition[deposition < 0] = 0.0
+
+                        # Update elevation, erosion/deposition
+                        sumdep += difftot
+                        elevation += difftot
+                        cumdiff += difftot
+                    else:
+                        # Update elevation, erosion/deposition
+                        diffmarine *= maxstep
+                        sumdep += diffmarine
+                        elevation += diffmarine
+                        cumdiff += diffmarine
+                    it += 1
+            marineIt = it
 
     # Compute slope failures
     if hillslope.Sfail > 0.0:
-        walltime = time.process_time()
-
-        # Initialise sediments diffusion array
-        it = 0
-        walltime = time.process_time()
-        erofail = flow.compute_failure(elevation, hillslope.Sfail)
-
-        # Add slope failure erosion
-        slumpID = np.where(erofail < 0)[0]
-        sumdep = -erofail
-        maxth = 0.1
-        diffstep = timestep
-        diffcoeff = hillslope.sedfluxfailure(FVmesh.control_volumes)
-
-        # Perform river related sediment diffusion
-        if len(slumpID) > 0:
-            while diffstep > 0.0 and it < 2000:
-                # Define maximum time step
-                maxstep = min(hillslope.CFLfail, diffstep)
-                # Compute maximum marine fluxes and maximum timestep to avoid excessive diffusion erosion
-                difffail, mindt = flow.compute_failure_diffusion(
+        with prof.phase("failure"):
+
+            # Initialise sediments diffusion array
+            it = 0
+            erofail = flow.compute_failure(elevation, hillslope.Sfail)
+
+            # Add slope failure erosion
+            slumpID = np.where(erofail < 0)[0]
+            sumdep = np.negative(erofail, out=work.get("sumdep"))
+            maxth = 0.1
+            diffstep = timestep
+            diffcoeff = hillslope.sedfluxfailure(FVmesh.control_volumes)
+
+            # Perform slope failure diffusion over the time step in a single solve
+            if len(slumpID) > 0 and input.transportSolver == "implicit":
+                difffail = hillslope.implicit.diffuse_layer(
                     elevation,
                     sumdep,
+                    hillslope.Cfail,
+                    FVmesh.control_volumes,
+                    FVmesh.ngbOffset,
                     FVmesh.neighbours,
                     FVmesh.vor_edges,
                     FVmesh.edge_length,
-                    diffcoeff,
-                    lGIDs,
+                    flow.borders,
                     maxth,
-                    maxstep,
-                )
-
+                    timestep,
+                )[0]
                 difffail[flow.outsideIDs] = 0.0
-                maxstep = min(mindt, maxstep)
-
-                # Update diffusion time step and total diffused thicknesses
-                diffstep -= maxstep
 
                 # Update elevation, erosion/deposition
-                sumdep += difffail * maxstep
-                elevation += difffail * maxstep
-                cumdiff += difffail * maxstep
-                cumfail += difffail * maxstep
-                it += 1
+                sumdep += difffail
+                elevation += difffail
+                cumdiff += difffail
+                cumfail += difffail
+                it = 1
+
+            # Perform river related sediment diffusion
+            elif len(slumpID) > 0:
+                while diffstep > 0.0 and it < 2000:
+                    # Define maximum time step
+                    maxstep = min(hillslope.CFLfail, diffstep)
+                    # Compute maximum marine fluxes and maximum timestep to avoid excessive diffusion erosion
+                    difffail, mindt = flow.compute_failure_diffusion(
+                        elevation,
+                        sumdep,
+                        FVmesh.ngbOffset,
+                        FVmesh.neighbours,
+                        FVmesh.vor_edges,
+                        FVmesh.edge_length,
+                        diffcoeff,
+                        lGIDs,
+                        maxth,
+                        maxstep,
+                    )
+
+                    difffail[flow.outsideIDs] = 0.0
+                    maxstep = min(mindt, maxstep)
+
+                    # Update diffusion time step and total diffused thicknesses
+                    diffstep -= maxstep
+
+                    # Update elevation, erosion/deposition
+                    difffail *= maxstep
+                    sumdep += difffail
+                    elevation += difffail
+                    cumdiff += difffail
+                    cumfail += difffail
+                    it += 1
+            failIt = it
 
         if verbose:
             print(
                 " -   Get slope failure sediment fluxes ",
-                time.process_time() - walltime,
+                prof.elapsed("failure"),
             )
 
     # Compute hillslope processes
     dtype = 1
     if straTIN is None:
         dtype = 0
-    walltime = time.process_time()
-    area = np.copy(FVmesh.control_volumes)
-    area[flow.outsideIDs2] = 0.0
-    diffcoeff = hillslope.sedflux(force.sealevel, elevation, FVmesh.control_volumes)
-    diffcoeff[flow.outsideIDs2] = 0.0
-    diff_flux = flow.compute_hillslope_diffusion(
-        elevation,
-        FVmesh.neighbours,
-        FVmesh.vor_edges,
-        FVmesh.edge_length,
-        lGIDs,
-        dtype,
-        hillslope.Sc,
-    )
-    diff_flux[flow.outsideIDs2] = 0.0
-    cdiff = diffcoeff * diff_flux * timestep
-
-    if straTIN is None:
-        if input.btype == "outlet":
-            cdiff[flow.insideIDs[0]] = 0.0
-        # Update dataset
-        elevation[flow.insideIDs] += cdiff[flow.insideIDs]
-        cumdiff[flow.insideIDs] += cdiff[flow.insideIDs]
-        cumhill[flow.insideIDs] += cdiff[flow.insideIDs]
-    else:
-        straTIN.update_layers(erosion, deposition, elevation, verbose)
-
-        # Get the active layer thickness to erode using diffusion
-        maxlayh = -cdiff
-        maxlayh[maxlayh < 1.0] = 1.0
-        straTIN.get_active_layer(maxlayh)
-        # Compute multi-rock diffusion
-        tdiff, erosion, deposition = flow.compute_sediment_hillslope(
-            elevation,
-            straTIN.alayR,
-            diffcoeff * timestep,
-            FVmesh.neighbours,
-            FVmesh.vor_edges,
-            maxlayh,
-            FVmesh.edge_length,
-            lGIDs,
-        )
-        if input.btype == "outlet":
-            tdiff[flow.insideIDs[0], :] = 0.0
-
-        # Update dataset
-        elevation += tdiff
-        cumdiff += tdiff
-        cumhill += tdiff
-        # Update active layer
-        straTIN.update_layers(erosion, deposition, elevation, verbose)
-
-    if input.btype == "slope":
-        elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs] - 0.1
-    elif input.btype == "flat":
-        elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs]
-    elif input.btype == "wall":
-        elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs] + 100.0
-    elif input.btype == "outlet":
-        elevation[1 : len(flow.parentIDs)] = elevation[flow.parentIDs[1:]] + 100.0
-    elif input.btype == "wall1":
-        elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs] - 0.1
-        elevation[: recGrid.nx + 1] = (
-            elevation[flow.parentIDs[: recGrid.nx + 1]] + 100.0
-        )
+    with prof.phase("hillslope"):
+        if input.hillSolver == "implicit" and straTIN is None:
+            fixed = None
+            if input.btype == "outlet":
+                fixed = flow.insideIDs[0]
+            cdiff = hillslope.implicit.diffuse(
+                elevation,
+                force.sealevel,
+                hillslope.CDaerial,
+                hillslope.CDmarine,
+                hillslope.Sc,
+                FVmesh.control_volumes,
+                FVmesh.ngbOffset,
+                FVmesh.neighbours,
+                FVmesh.vor_edges,
+                FVmesh.edge_length,
+                flow.borders2,
+                work.insideMask,
+                timestep,
+                fixed,
+            )
+        else:
+            diffcoeff = hillslope.sedflux(
+                force.sealevel, elevation, FVmesh.control_volumes
+            )
+            diffcoeff[flow.outsideIDs2] = 0.0
+            diff_flux = flow.compute_hillslope_diffusion(
+                elevation,
+                FVmesh.ngbOffset,
+                FVmesh.neighbours,
+                FVmesh.vor_edges,
+                FVmesh.edge_length,
+                lGIDs,
+                dtype,
+                hillslope.Sc,
+            )
+            diff_flux[flow.outsideIDs2] = 0.0
+            diffcoeff *= timestep
+            cdiff = np.multiply(diffcoeff, diff_flux, out=work.get("cdiff"))
+
+        if straTIN is None:
+            if input.btype == "outlet":
+                cdiff[flow.insideIDs[0]] = 0.0
+            # Update dataset
+            cdiff *= work.insideMask
+            elevation += cdiff
+            cumdiff += cdiff
+            cumhill += cdiff
+        else:
+            straTIN.update_layers(erosion, deposition, elevation, verbose)
+
+            # Get the active layer thickness to erode using diffusion
+            maxlayh = np.negative(cdiff, out=work.get("maxlayh"))
+            np.maximum(maxlayh, 1.0, out=maxlayh)
+            straTIN.get_active_layer(maxlayh)
+            # Compute multi-rock diffusion
+            tdiff, erosion, deposition = flow.compute_sediment_hillslope(
+                elevation,
+                straTIN.alayR,
+                diffcoeff,
+                FVmesh.ngbOffset,
+                FVmesh.neighbours,
+                FVmesh.vor_edges,
+                maxlayh,
+                FVmesh.edge_length,
+                lGIDs,
+            )
+            if input.btype == "outlet":
+                tdiff[flow.insideIDs[0], :] = 0.0
+
+            # Update dataset
+            elevation += tdiff
+            cumdiff += tdiff
+            cumhill += tdiff
+            # Update active layer
+            straTIN.update_layers(erosion, deposition, elevation, verbose)
+
+        if input.btype == "slope":
+            elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs] - 0.1
+        elif input.btype == "flat":
+            elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs]
+        elif input.btype == "wall":
+            elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs] + 100.0
+        elif input.btype == "outlet":
+            elevation[1 : len(flow.parentIDs)] = elevation[flow.parentIDs[1:]] + 100.0
+        elif input.btype == "wall1":
+            elevation[: len(flow.parentIDs)] = elevation[flow.parentIDs] - 0.1
+            elevation[: recGrid.nx + 1] = (
+                elevation[flow.parentIDs[: recGrid.nx + 1]] + 100.0
+            )
 
     if verbose:
-        print(" -   Get hillslope fluxes ", time.process_time() - walltime)
+        print(" -   Get hillslope fluxes ", prof.elapsed("hillslope"))
 
     # Update erodibility values
     if input.erolays and input.erolays >= 0:
@@ -553,10 +656,13 @@ def sediment_flux(
         flow.erodibility = mapero.erodibility
 
     if applyDisp:
-        elevation += disp * timestep
+        elevation += np.multiply(disp, timestep, out=work.get("disp"))
+
+    if tel is not None:
+        tel.record(tNow, timestep, limiter, limit, marineIt, failIt, flow.splError)
 
     tNow += timestep
 
     if verbose:
-        print(" - Flow computation ", time.process_time() - flow_time)
+        print(" - Flow computation ", time.perf_counter() - flow_time)
     return tNow, elevation, cumdiff, cumhill, cumfail, slopeTIN
@@ -31,7 +31,49 @@ if "READTHEDOCS" not in os.environ:
     )
 
 
-def construct_mesh(input, filename, verbose=False):
+def build_mesh(input, filename, verbose=False):
+    """
+    Build the TIN from the regular grid and its Finite Volume discretisation.
+
+    Args:
+        input: class containing XML input file parameters.
+        filename: (str) this is a string containing the path to the regular grid file.
+        verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+
+    Returns
+    -------
+    recGrid
+        class describing the regular grid characteristics.
+    FVmesh
+        class describing the finite volume mesh.
+    """
+
+    # Get DEM regular grid and create Badlands TIN.
+    recGrid = raster2TIN.raster2TIN(filename, areaDelFactor=input.Afactor)
+
+    # Partition the TIN
+    walltime = time.process_time()
+    FVmesh = FVmethod.FVmethod(
+        recGrid.tinMesh["vertices"],
+        recGrid.tinMesh["triangles"],
+        recGrid.tinMesh["edges"],
+    )
+
+    # Define Finite Volume parameters
+    walltime = time.process_time()
+    totPts = len(recGrid.tinMesh["vertices"][:, 0])
+    lGIDs = np.arange(totPts)
+    FVmesh.control_volumes = np.zeros(totPts, dtype=np.float)
+
+    # Compute Finite Volume parameters
+    FVmesh.construct_FV(lGIDs, verbose)
+    if verbose:
+        print(" - FV mesh ", time.process_time() - walltime)
+
+    return recGrid, FVmesh
+
+
+def construct_mesh(input, filename, verbose=False, mesh=None):
     """
     The following function is taking parsed values from the XML to:
 
@@ -43,6 +85,7 @@ def construct_mesh(input, filename, verbose=False):
         input: class containing XML input file parameters.
         filename: (str) this is a string containing the path to the regular grid file.
         verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+        mesh: (tuple) regular grid and finite volume mesh already built with :code:`build_mesh` (default: :code:`None`).
 
     Returns
     -------
@@ -93,8 +136,11 @@ def construct_mesh(input, filename, verbose=False):
     strata = None
     mapero = None
 
-    # Get DEM regular grid and create Badlands TIN.
-    recGrid = raster2TIN.raster2TIN(filename, areaDelFactor=input.Afactor)
+    # Get DEM regular grid, Badlands TIN and Finite Volume mesh
+    if mesh is None:
+        recGrid, FVmesh = build_mesh(input, filename, verbose)
+    else:
+        recGrid, FVmesh = mesh
 
     fixIDs = recGrid.boundsPt + recGrid.edgesPt
 
@@ -142,29 +188,9 @@ def construct_mesh(input, filename, verbose=False):
         else:
             force.merge3d = input.merge3d
 
-    # Partition the TIN
-    walltime = time.process_time()
-    FVmesh = FVmethod.FVmethod(
-        recGrid.tinMesh["vertices"],
-        recGrid.tinMesh["triangles"],
-        recGrid.tinMesh["edges"],
-    )
-
-    # Define Finite Volume parameters
-    walltime = time.process_time()
     totPts = len(recGrid.tinMesh["vertices"][:, 0])
     lGIDs = np.arange(totPts)
     inGIDs = lGIDs
-    FVmesh.neighbours = np.zeros((totPts, 20), dtype=np.int32, order="F")
-    FVmesh.neighbours.fill(-2)
-    FVmesh.edge_length = np.zeros((totPts, 20), dtype=np.float, order="F")
-    FVmesh.vor_edges = np.zeros((totPts, 20), dtype=np.float, order="F")
-    FVmesh.control_volumes = np.zeros(totPts, dtype=np.float)
-
-    # Compute Finite Volume parameters
-    FVmesh.construct_FV(lGIDs, verbose)
-    if verbose:
-        print(" - FV mesh ", time.process_time() - walltime)
 
     # Define TIN parameters
     if input.flexure:
@@ -254,7 +280,10 @@ def construct_mesh(input, filename, verbose=False):
 
     # Stratigraphic grid in case of carbonate and/or pelagic growth functions
     if input.carbonate:
-        layNb = int((input.tEnd - input.tStart) / input.tDisplay) + 2
+        if input.adaptOut:
+            layNb = int((input.tEnd - input.tStart) / input.tOutMin) + 2
+        else:
+            layNb = int((input.tEnd - input.tStart) / input.tDisplay) + 2
         bPts = recGrid.boundsPt
         ePts = recGrid.edgesPt
         if input.carbonate2:
@@ -362,10 +391,6 @@ def reconstruct_mesh(recGrid, input, verbose=False):
     totPts = len(recGrid.tinMesh["vertices"][:, 0])
     lGIDs = np.arange(totPts)
     inGIDs = lGIDs
-    FVmesh.neighbours = np.zeros((totPts, 20), dtype=np.int32, order="F")
-    FVmesh.neighbours.fill(-2)
-    FVmesh.edge_length = np.zeros((totPts, 20), dtype=np.float, order="F")
-    FVmesh.vor_edges = np.zeros((totPts, 20), dtype=np.float, order="F")
     FVmesh.control_volumes = np.zeros(totPts, dtype=np.float)
 
     # Compute Finite Volume parameters
@@ -376,6 +401,7 @@ def reconstruct_mesh(recGrid, input, verbose=False):
 
     inIDs = lGIDs[recGrid.boundsPt :]
     elevationTIN.assign_parameter_pit(
+        FVmesh.ngbOffset,
         FVmesh.neighbours,
         FVmesh.control_volumes,
         input.diffnb,
@@ -385,6 +411,13 @@ def reconstruct_mesh(recGrid, input, verbose=False):
         recGrid.boundsPt,
         input.fillmax,
     )
+    FVmesh.pitTiles = elevationTIN.pit_tiles(
+        FVmesh.node_coords[:, 0],
+        FVmesh.node_coords[:, 1],
+        FVmesh.ngbOffset,
+        FVmesh.neighbours,
+        input.pitTiles,
+    )
 
     return FVmesh, lGIDs, inIDs, inGIDs, totPts
 
@@ -455,6 +488,7 @@ def _define_TINparams(totPts, inIDs, input, FVmesh, recGrid, verbose=False):
     # Assign boundary values
     elevation, parentIDs = elevationTIN.update_border_elevation(
         local_elev,
+        FVmesh.ngbOffset,
         FVmesh.neighbours,
         FVmesh.edge_length,
         recGrid.boundsPt,
@@ -463,6 +497,7 @@ def _define_TINparams(totPts, inIDs, input, FVmesh, recGrid, verbose=False):
 
     # Define pit filling algorithm
     elevationTIN.assign_parameter_pit(
+        FVmesh.ngbOffset,
         FVmesh.neighbours,
         FVmesh.control_volumes,
         input.diffnb,
@@ -472,6 +507,13 @@ def _define_TINparams(totPts, inIDs, input, FVmesh, recGrid, verbose=False):
         recGrid.boundsPt,
         input.fillmax,
     )
+    FVmesh.pitTiles = elevationTIN.pit_tiles(
+        FVmesh.node_coords[:, 0],
+        FVmesh.node_coords[:, 1],
+        FVmesh.ngbOffset,
+        FVmesh.neighbours,
+        input.pitTiles,
+    )
 
     if verbose:
         print(" - define paramters on TIN grid ", time.process_time() - walltime)
@@ -627,7 +669,11 @@ def _init_flexure(
         elevation, cumdiff, force.sealevel, recGrid.boundsPt, initFlex=True
     )
     tinFlex = force.disp_border(
-        tinFlex, FVmesh.neighbours, FVmesh.edge_length, recGrid.boundsPt
+        tinFlex,
+        FVmesh.ngbOffset,
+        FVmesh.neighbours,
+        FVmesh.edge_length,
+        recGrid.boundsPt,
     )
     cumflex += tinFlex
     if verbose:
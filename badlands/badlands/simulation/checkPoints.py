@@ -111,36 +111,26 @@ def write_checkpoints(
     tnodes[0] = len(lGIDs)
 
     # Done for every visualisation step
-    flowIDs, polylines = visualiseFlow.output_Polylines(
+    if deepb >= 5000.0:
+        deepb = force.sealevel
+    flowIDs, polylines = flow.view_products(
+        step,
+        elevation,
+        force.sealevel,
+        deepb,
         FVmesh.outPts,
-        flow.receivers[FVmesh.outPts],
         visXlim,
         visYlim,
-        FVmesh.node_coords[:, :2],
     )
     fnodes = np.zeros(1)
     fnodes[0] = len(flowIDs)
     fline = np.zeros(1)
     fline[0] = len(polylines[:, 0])
 
-    # Compute flow parameters
-    if deepb >= 5000.0:
-        deepb = force.sealevel
-    flow.view_receivers(
-        fillH,
-        elevation,
-        FVmesh.neighbours,
-        FVmesh.vor_edges,
-        FVmesh.edge_length,
-        lGIDs,
-        deepb,
-    )  # force.sealevel)
-    flow.compute_parameters(elevation, force.sealevel)
     visdis = np.copy(flow.discharge)
-    seaIDs = np.where(elevation < deepb)[0]  # force.sealevel)[0]
+    seaIDs = np.where(elevation < deepb)[0]
     if len(seaIDs) > 0:
         visdis[seaIDs] = 1.0
-        flow.basinID[seaIDs] = -1
     visdis[visdis < 1.0] = 1.0
 
     rockOn = False
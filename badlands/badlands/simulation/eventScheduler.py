@@ -0,0 +1,222 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module defines the event scheduler used in the **badlands** main simulation loop.
+
+Each process (rain, tectonics, flexure, waves, carbonate, strata, output...) is registered with the time of its
+next occurrence and a callback. The callback performs the process and returns the time of the following occurrence.
+Pending events are kept in a heap so that the main loop only runs the processes which are due and directly gets
+the time of the next event to bound the flow time step.
+
+Note:
+    Events are invalidated lazily: rescheduling or disabling a process does not modify the heap, outdated entries
+    are simply discarded when they reach the top.
+"""
+
+import heapq
+import itertools
+
+
+class eventScheduler:
+    """
+    Class for scheduling the non-flow processes of the simulation.
+
+    Args:
+        prof: class recording the time spent in each process (default: :code:`None`).
+    """
+
+    def __init__(self, prof=None):
+        """
+        Initialization.
+        """
+
+        self.prof = prof
+        self.heap = []
+        self.events = {}
+        self.counter = itertools.count()
+
+        return
+
+    def register(self, name, callback, time, priority=0, stage=0):
+        """
+        Register a new process.
+
+        Args:
+            name: (str) process name.
+            callback: function performing the process, it takes the current time and the verbose flag as arguments
+                and returns the next event time (:code:`None` to stop the process).
+            time: time of the first occurrence.
+            priority: (int) order of execution of processes due at the same time (lowest first).
+            stage: (int) stage of the simulation loop in which the process is performed.
+        """
+
+        self.events[name] = {
+            "callback": callback,
+            "time": None,
+            "seq": None,
+            "priority": priority,
+            "stage": stage,
+            "enabled": True,
+        }
+        self.reschedule(name, time)
+
+        return
+
+    def reschedule(self, name, time):
+        """
+        Change the time of the next occurrence of a given process.
+
+        Args:
+            name: (str) process name.
+            time: new event time (:code:`None` to remove the pending event).
+        """
+
+        event = self.events[name]
+        event["time"] = time
+        event["seq"] = next(self.counter)
+        if time is not None:
+            heapq.heappush(self.heap, (time, event["priority"], event["seq"], name))
+
+        return
+
+    def defer(self, name, time):
+        """
+        Postpone a given process so that it is not performed before the specified time.
+
+        Args:
+            name: (str) process name.
+            time: earliest time of the next occurrence.
+        """
+
+        event = self.events[name]
+        if event["time"] is not None and event["time"] < time:
+            self.reschedule(name, time)
+
+        return
+
+    def enable(self, name):
+        """
+        Re-activate a given process.
+
+        Args:
+            name: (str) process name.
+        """
+
+        event = self.events[name]
+        event["enabled"] = True
+        self.reschedule(name, event["time"])
+
+        return
+
+    def disable(self, name):
+        """
+        De-activate a given process, its pending events are ignored.
+
+        Args:
+            name: (str) process name.
+        """
+
+        self.events[name]["enabled"] = False
+
+        return
+
+    def time(self, name):
+        """
+        Time of the next occurrence of a given process.
+
+        Args:
+            name: (str) process name.
+
+        Returns:
+            - time - next event time (:code:`None` if the process is not scheduled).
+        """
+
+        return self.events[name]["time"]
+
+    def _valid(self, entry):
+        """
+        Check if a heap entry corresponds to a pending event.
+        """
+
+        event = self.events.get(entry[3])
+        if event is None or not event["enabled"]:
+            return False
+        return event["seq"] == entry[2]
+
+    def next_time(self, stage=None):
+        """
+        Get the time of the next pending event.
+
+        Args:
+            stage: (int) when specified only the processes of this stage are considered.
+
+        Returns:
+            - time - next event time (:code:`None` when no event is pending).
+        """
+
+        # Discard outdated entries
+        while self.heap and not self._valid(self.heap[0]):
+            heapq.heappop(self.heap)
+
+        if stage is None:
+            if self.heap:
+                return self.heap[0][0]
+            return None
+
+        times = [
+            entry[0]
+            for entry in self.heap
+            if self.events[entry[3]]["stage"] == stage and self._valid(entry)
+        ]
+        if len(times) > 0:
+            return min(times)
+
+        return None
+
+    def run(self, tNow, stage=0, verbose=False):
+        """
+        Perform all processes of a given stage which are due at the current time.
+
+        Args:
+            tNow: current simulation time.
+            stage: (int) stage of the simulation loop.
+            verbose : (bool) when :code:`True`, output additional debug information (default: :code:`False`).
+
+        Returns:
+            - names - list of the processes which have been performed.
+        """
+
+        # Collect due events
+        due = []
+        kept = []
+        while self.heap and self.heap[0][0] <= tNow:
+            entry = heapq.heappop(self.heap)
+            if not self._valid(entry):
+                continue
+            if self.events[entry[3]]["stage"] == stage:
+                due.append(entry)
+            else:
+                kept.append(entry)
+        for entry in kept:
+            heapq.heappush(self.heap, entry)
+
+        # Each process is performed once and scheduled for its next occurrence
+        names = []
+        for entry in due:
+            name = entry[3]
+            event = self.events[name]
+            if self.prof is not None:
+                with self.prof.phase(name):
+                    time = event["callback"](tNow, verbose)
+            else:
+                time = event["callback"](tNow, verbose)
+            self.reschedule(name, time)
+            names.append(name)
+
+        return names
@@ -0,0 +1,125 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module defines the change-triggered output policy.
+
+Instead of writing an output every display interval, a new output is created when the surface has changed
+significantly since the last one:
+
+- the maximum elevation change exceeds a given threshold (in m),
+- the root mean square of the elevation change exceeds a given threshold (in m),
+- the relative change of the river sediment load exceeds a given threshold.
+
+A minimum interval prevents outputs from being written too often during rapid events whereas a maximum
+interval guarantees that outputs are still created during quiescent periods.
+
+Note:
+    Each output records its own simulation time in the **XmF** file so that the **XDmF** time series
+    references the irregular output times.
+"""
+
+import numpy
+
+
+class outputPolicy:
+    """
+    Class deciding when outputs are written.
+
+    Args:
+        minInterval: (float) minimum time in years between two outputs.
+        maxInterval: (float) maximum time in years between two outputs.
+        dzMax: (float) threshold on the maximum elevation change in m (:code:`None` to ignore).
+        dzRMS: (float) threshold on the RMS elevation change in m (:code:`None` to ignore).
+        fluxChange: (float) threshold on the relative change of the sediment load (:code:`None` to ignore).
+    """
+
+    def __init__(
+        self, minInterval, maxInterval, dzMax=None, dzRMS=None, fluxChange=None
+    ):
+        """
+        Initialization.
+        """
+
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.dzMax = dzMax
+        self.dzRMS = dzRMS
+        self.fluxChange = fluxChange
+
+        self.tLast = None
+        self.elevRef = None
+        self.fluxRef = None
+
+        return
+
+    def mark(self, tNow, elevation, sedload=None):
+        """
+        Store the state of the surface at the time of an output.
+
+        Args:
+            tNow: simulation time of the output.
+            elevation: numpy float-type array containing the elevation of the nodes inside the domain.
+            sedload: numpy float-type array containing the river sediment load of the same nodes.
+
+        Returns:
+            - tNext - latest time of the next output.
+        """
+
+        self.tLast = tNow
+        self.elevRef = numpy.copy(elevation)
+        if sedload is not None:
+            self.fluxRef = numpy.copy(sedload)
+        else:
+            self.fluxRef = None
+
+        return tNow + self.maxInterval
+
+    def due(self, tNow, elevation, sedload=None):
+        """
+        Check if the changes since the last output require a new one.
+
+        Args:
+            tNow: current simulation time.
+            elevation: numpy float-type array containing the elevation of the nodes inside the domain.
+            sedload: numpy float-type array containing the river sediment load of the same nodes.
+
+        Returns:
+            - due - (bool) :code:`True` when an output needs to be written.
+        """
+
+        if self.tLast is None:
+            return False
+        if tNow - self.tLast < self.minInterval:
+            return False
+        if tNow - self.tLast >= self.maxInterval:
+            return True
+
+        # Mesh has been rebuilt since the last output
+        if len(elevation) != len(self.elevRef):
+            return True
+
+        if self.dzMax is not None or self.dzRMS is not None:
+            dz = numpy.abs(elevation - self.elevRef)
+            if self.dzMax is not None and dz.max() > self.dzMax:
+                return True
+            if self.dzRMS is not None and numpy.sqrt(numpy.mean(dz * dz)) > self.dzRMS:
+                return True
+
+        if self.fluxChange is not None and sedload is not None:
+            if self.fluxRef is None or len(sedload) != len(self.fluxRef):
+                return True
+            ref = numpy.linalg.norm(self.fluxRef)
+            if ref > 0.0:
+                change = numpy.linalg.norm(sedload - self.fluxRef) / ref
+            else:
+                change = float(numpy.linalg.norm(sedload) > 0.0)
+            if change > self.fluxChange:
+                return True
+
+        return False
@@ -0,0 +1,146 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module records the time spent in each phase of a **badlands** simulation.
+
+For every phase (pit filling, flow routing, stream power, hillslope, flexure, output...) both the wall-clock
+and the CPU times are accumulated. Totals are exposed through :code:`Model.profile` and the individual calls
+can be exported as a Chrome-trace JSON file (readable with *chrome://tracing* or *Perfetto*).
+"""
+
+import os
+import time
+import json
+from contextlib import contextmanager
+
+
+class runProfile:
+    """
+    Class for accumulating wall-clock and CPU time of the simulation phases.
+
+    Args:
+        enabled: (bool) when :code:`False` phases are not recorded.
+        maxEvents: (int) maximum number of individual calls kept for the trace export.
+    """
+
+    def __init__(self, enabled=True, maxEvents=200000):
+        """
+        Initialization.
+        """
+
+        self.enabled = enabled
+        self.maxEvents = maxEvents
+        self.reset()
+
+        return
+
+    def reset(self):
+        """
+        Clear all recorded phases and trace events.
+        """
+
+        self.totals = {}
+        self.last = {}
+        self.events = []
+        self.origin = time.perf_counter()
+
+        return
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager timing the enclosed block under the given phase name.
+
+        Args:
+            name: (str) phase name.
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu = time.process_time() - cpu0
+            rec = self.totals.get(name)
+            if rec is None:
+                self.totals[name] = [wall, cpu, 1]
+            else:
+                rec[0] += wall
+                rec[1] += cpu
+                rec[2] += 1
+            self.last[name] = wall
+            if len(self.events) < self.maxEvents:
+                self.events.append((name, wall0 - self.origin, wall, cpu))
+
+    def elapsed(self, name):
+        """
+        Wall-clock duration of the last call of a given phase.
+
+        Args:
+            name: (str) phase name.
+
+        Returns:
+            - wall - wall-clock time in seconds (0 if the phase has not been recorded).
+        """
+
+        return self.last.get(name, 0.0)
+
+    def summary(self):
+        """
+        Get the accumulated times for each phase.
+
+        Returns:
+            - totals - dictionary mapping each phase name to its total *wall* and *cpu* times (in seconds) and its number of *calls*.
+        """
+
+        totals = {}
+        for name, rec in self.totals.items():
+            totals[name] = {"wall": rec[0], "cpu": rec[1], "calls": rec[2]}
+
+        return totals
+
+    def write_trace(self, filename):
+        """
+        Write the recorded phases as a Chrome-trace JSON file.
+
+        Args:
+            filename: (str) name of the JSON file.
+        """
+
+        pid = os.getpid()
+        trace = []
+        for name, start, wall, cpu in self.events:
+            trace.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start * 1.0e6,
+                    "dur": wall * 1.0e6,
+                    "pid": pid,
+                    "tid": 0,
+                    "args": {"cpu": cpu},
+                }
+            )
+
+        with open(filename, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": trace,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"totals": self.summary()},
+                },
+                f,
+            )
+
+        return
@@ -0,0 +1,166 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module monitors the convergence of a **badlands** simulation towards topographic steady state.
+
+At every time step the following norms are recorded:
+
+- *maxRate* / *rmsRate*: maximum and root mean square of the elevation change rate (in m/a),
+- *outflux*: sediment volume leaving the domain per year (in :math:`{m}^3/a`),
+- *balance*: net volume change of the domain relative to the eroded volume.
+
+The landscape is considered at steady state when, over a sliding time window, the elevation change rates and the
+balance remain below their tolerances and the relative variation of the outflux is below its tolerance.
+
+Example:
+    >>> from badlands import steadyState
+    >>> steady = steadyState.steadyState(window=50000.0, maxRate=1.0e-4, action="stop")
+    >>> model.run_to_time(1.0e6, steady=steady)
+    >>> steady.converged, steady.tConverged
+"""
+
+import collections
+import numpy
+
+#: Fields of a convergence record.
+dtype = [
+    ("tNow", "f8"),
+    ("dt", "f8"),
+    ("maxRate", "f8"),
+    ("rmsRate", "f8"),
+    ("outflux", "f8"),
+    ("balance", "f8"),
+]
+
+
+class steadyState:
+    """
+    Class for detecting topographic steady state.
+
+    Args:
+        window: (float) duration in years of the sliding window over which the tolerances need to be met.
+        maxRate: (float) tolerance on the maximum elevation change rate in m/a (:code:`None` to ignore).
+        rmsRate: (float) tolerance on the RMS elevation change rate in m/a (:code:`None` to ignore).
+        outflux: (float) tolerance on the relative variation of the sediment outflux (:code:`None` to ignore).
+        balance: (float) tolerance on the net volume change relative to the eroded volume (:code:`None` to ignore).
+        action: (str) either *stop* to write a final checkpoint and stop the simulation or *coarsen* to keep
+            running with a coarser output interval.
+        coarsen: (float) factor applied to the output interval when the *coarsen* action is used.
+    """
+
+    def __init__(
+        self,
+        window=10000.0,
+        maxRate=1.0e-5,
+        rmsRate=None,
+        outflux=0.05,
+        balance=None,
+        action="stop",
+        coarsen=10.0,
+    ):
+        """
+        Initialization.
+        """
+
+        if action not in ("stop", "coarsen"):
+            raise ValueError("Steady state action should be either stop or coarsen.")
+
+        self.window = window
+        self.maxRate = maxRate
+        self.rmsRate = rmsRate
+        self.outflux = outflux
+        self.balance = balance
+        self.action = action
+        self.coarsen = coarsen
+
+        self.records = collections.deque()
+        self.history = []
+        self.converged = False
+        self.tConverged = None
+
+        return
+
+    def update(self, tNow, dt, dz, area, outload, erotot):
+        """
+        Record the norms of a time step and check for convergence.
+
+        Args:
+            tNow: simulation time at the end of the step.
+            dt: duration of the step in years.
+            dz: numpy float-type array containing the elevation change of each node inside the domain over the step.
+            area: numpy float-type array containing the voronoi area of the same nodes.
+            outload: sediment volume which has left the domain during the step.
+            erotot: volume eroded during the step.
+
+        Returns:
+            - converged - (bool) :code:`True` the first time the tolerances are met over the entire window.
+        """
+
+        if dt <= 0.0 or len(dz) == 0:
+            return False
+
+        rate = numpy.abs(dz) / dt
+        net = abs(numpy.dot(area, dz))
+        rec = (
+            float(tNow),
+            float(dt),
+            float(rate.max()),
+            float(numpy.sqrt(numpy.mean(rate * rate))),
+            float(outload) / dt,
+            net / max(float(erotot), 1.0e-12) if erotot > 0.0 else 0.0,
+        )
+        self.records.append(rec)
+        self.history.append(rec)
+
+        # Slide the window
+        while len(self.records) > 1 and tNow - self.records[0][0] >= self.window:
+            self.records.popleft()
+
+        if (
+            self.converged
+            or tNow - self.records[0][0] + self.records[0][1] < self.window
+        ):
+            return False
+
+        if self._check():
+            self.converged = True
+            self.tConverged = tNow
+            return True
+
+        return False
+
+    def _check(self):
+        """
+        Check the tolerances over the current window.
+        """
+
+        recs = numpy.array(list(self.records), dtype=dtype)
+        if self.maxRate is not None and recs["maxRate"].max() > self.maxRate:
+            return False
+        if self.rmsRate is not None and recs["rmsRate"].max() > self.rmsRate:
+            return False
+        if self.balance is not None and recs["balance"].max() > self.balance:
+            return False
+        if self.outflux is not None:
+            flux = recs["outflux"]
+            mean = flux.mean()
+            if mean > 0.0 and (flux.max() - flux.min()) / mean > self.outflux:
+                return False
+
+        return True
+
+    def array(self):
+        """
+        Get the convergence records.
+
+        Returns:
+            - records - numpy structured array with fields *tNow*, *dt*, *maxRate*, *rmsRate*, *outflux* and *balance*.
+        """
+
+        return numpy.array(self.history, dtype=dtype)
@@ -0,0 +1,129 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module records, for each **badlands** time step, which constraint has limited the step size.
+
+The time step is the minimum of several constraints:
+
+- *hillslope*: CFL condition of the hillslope diffusion,
+- *flow*: CFL condition of the stream power law,
+- *event*: next forcing or output event time,
+- *minDT* / *maxDT*: user-defined minimum and maximum time steps,
+- *overfill*: reduction applied when sediment fluxes overfill a depression.
+
+Each record also stores the number of marine diffusion and slope failure sub-iterations and, when the implicit
+stream power is checked against the explicit scheme, their relative difference.
+"""
+
+import numpy
+
+#: Fields of a telemetry record.
+dtype = [
+    ("tNow", "f8"),
+    ("dt", "f8"),
+    ("limiter", "U9"),
+    ("value", "f8"),
+    ("marine", "i4"),
+    ("failure", "i4"),
+    ("splError", "f8"),
+]
+
+
+class stepTelemetry:
+    """
+    Class storing the per-step time step attribution.
+
+    Args:
+        csvfile: (str) optional CSV file where records are appended as the simulation runs.
+    """
+
+    def __init__(self, csvfile=None):
+        """
+        Initialization.
+        """
+
+        self.records = []
+        self.csvfile = csvfile
+        if self.csvfile is not None:
+            with open(self.csvfile, "w") as f:
+                f.write(",".join([name for name, _ in dtype]) + "\n")
+
+        return
+
+    def record(self, tNow, dt, limiter, value, marine=0, failure=0, splError=None):
+        """
+        Store a time step record.
+
+        Args:
+            tNow: simulation time at the beginning of the step.
+            dt: time step actually used.
+            limiter: (str) name of the constraint which has bounded the step.
+            value: value of the limiting constraint.
+            marine: number of marine diffusion sub-iterations.
+            failure: number of slope failure sub-iterations.
+            splError: relative difference between the implicit and explicit stream power (default: :code:`None`).
+        """
+
+        if splError is None:
+            splError = numpy.nan
+        rec = (
+            float(tNow),
+            float(dt),
+            limiter,
+            float(value),
+            int(marine),
+            int(failure),
+            float(splError),
+        )
+        self.records.append(rec)
+        if self.csvfile is not None:
+            with open(self.csvfile, "a") as f:
+                f.write("%.6f,%.6f,%s,%.6f,%d,%d,%.6e\n" % rec)
+
+        return
+
+    def array(self):
+        """
+        Get the telemetry records.
+
+        Returns:
+            - records - numpy structured array with fields *tNow*, *dt*, *limiter*, *value*, *marine*, *failure* and
+              *splError*.
+        """
+
+        return numpy.array(self.records, dtype=dtype)
+
+    def counts(self):
+        """
+        Number of steps bounded by each constraint.
+
+        Returns:
+            - counts - dictionary mapping each limiter name to its number of steps.
+        """
+
+        counts = {}
+        for rec in self.records:
+            counts[rec[2]] = counts.get(rec[2], 0) + 1
+
+        return counts
+
+    def write_csv(self, filename):
+        """
+        Write all telemetry records in a CSV file.
+
+        Args:
+            filename: (str) name of the CSV file.
+        """
+
+        with open(filename, "w") as f:
+            f.write(",".join([name for name, _ in dtype]) + "\n")
+            for rec in self.records:
+                f.write("%.6f,%.6f,%s,%.6f,%d,%d,%.6e\n" % rec)
+
+        return
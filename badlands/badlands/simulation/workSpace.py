@@ -0,0 +1,122 @@
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+##                                                                                   ##
+##  This file forms part of the Badlands surface processes modelling application.    ##
+##                                                                                   ##
+##  For full license and copyright information, please refer to the LICENSE.md file  ##
+##  located at the project root, or contact the authors.                             ##
+##                                                                                   ##
+##~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~##
+"""
+This module defines the pool of reusable arrays used in the sediment flux computation.
+
+The stream power, marine diffusion, slope failure and hillslope computations are performed at every time step
+on the entire mesh. Instead of allocating new arrays for each of them, buffers sized on the number of TIN nodes
+(and rock types) are kept between time steps and filled using *in-place* operations.
+
+Warning:
+    A buffer content is only valid until the next request of the same buffer, arrays that need to be kept
+    across time steps should not be obtained from the workspace.
+"""
+
+import numpy
+
+
+class workSpace:
+    """
+    Class holding reusable full-mesh arrays.
+
+    Args:
+        totPts: total number of TIN nodes.
+        rockNb: number of rock types.
+    """
+
+    def __init__(self, totPts=0, rockNb=0):
+        """
+        Initialization.
+        """
+
+        self.rockNb = max(1, rockNb)
+        self.reset(totPts)
+
+        return
+
+    def reset(self, totPts):
+        """
+        Release all buffers, this function is called when the TIN is rebuilt.
+
+        Args:
+            totPts: total number of TIN nodes.
+        """
+
+        self.totPts = totPts
+        self.buffers = {}
+        self.insideArea = None
+        self.insideInvArea = None
+        self.insideMask = None
+
+        return
+
+    def get(self, name, ncol=None, dtype=float, extra=0):
+        """
+        Get a buffer without initialising its content.
+
+        Args:
+            name: (str) buffer name.
+            ncol: number of columns (:code:`None` for a 1D array, :code:`0` for the number of rock types).
+            dtype: data type of the buffer.
+            extra: (int) number of additional rows (e.g. 1 for the index arrays of compressed sparse row structures).
+
+        Returns:
+            - buf - numpy array of shape (totPts+extra,) or (totPts+extra, ncol).
+        """
+
+        nrow = self.totPts + extra
+        if ncol is None:
+            shape = (nrow,)
+        elif ncol == 0:
+            shape = (nrow, self.rockNb)
+        else:
+            shape = (nrow, ncol)
+
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = numpy.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+
+        return buf
+
+    def zeros(self, name, ncol=None, dtype=float):
+        """
+        Get a buffer filled with zeros.
+
+        Args:
+            name: (str) buffer name.
+            ncol: number of columns (:code:`None` for a 1D array, :code:`0` for the number of rock types).
+            dtype: data type of the buffer.
+
+        Returns:
+            - buf - numpy array of shape (totPts,) or (totPts, ncol).
+        """
+
+        buf = self.get(name, ncol, dtype)
+        buf.fill(0)
+
+        return buf
+
+    def set_inside(self, insideIDs, area):
+        """
+        Define the cell areas restricted to the nodes inside the simulation domain.
+
+        Args:
+            insideIDs: numpy integer-type array containing the indices of the nodes inside the domain.
+            area: numpy float-type array containing the voronoi area of each node.
+        """
+
+        self.insideMask = numpy.zeros(self.totPts)
+        self.insideMask[insideIDs] = 1.0
+        self.insideArea = numpy.zeros(self.totPts)
+        self.insideArea[insideIDs] = area[insideIDs]
+        self.insideInvArea = numpy.zeros(self.totPts)
+        self.insideInvArea[insideIDs] = 1.0 / area[insideIDs]
+
+        return
@@ -50,6 +50,7 @@ class FVmethod:
         self.edges = edges
         self.cells = cells
         self.control_volumes = None
+        self.ngbOffset = None
         self.neighbours = None
         self.vor_edges = None
         self.edge_length = None
@@ -57,6 +58,7 @@ class FVmethod:
         self.maxNgbh = None
         self.outPts = None
         self.outCells = None
+        self.pitTiles = None
 
     def _FV_utils(self, lGIDs, verbose=False):
         """
@@ -82,13 +84,14 @@ class FVmethod:
         cells_nodes = Tmesh.cells["nodes"]
         cells_edges = Tmesh.cells["edges"]
 
-        # Finite volume discretisation
+        # Finite volume discretisation in compressed sparse row format
         (
+            self.ngbOffset,
             self.neighbours,
             self.vor_edges,
             self.edge_length,
             maxNgbhs,
-        ) = fvframe.definetin(node_coords, cells_nodes, cells_edges, edges_nodes, cc.T,)
+        ) = fvframe.definecsr(node_coords, cells_nodes, cells_edges, edges_nodes, cc.T)
         if verbose:
             print(
                 " - construct Finite Volume representation ",
@@ -127,9 +130,51 @@ class FVmethod:
 
         .. _quake: http://www.cs.cmu.edu/~quake/triangle.html
         .. _Github: https://github.com/drufat/triangle
+
+        Note:
+            The neighbourhood is stored in compressed sparse row format: the neighbours of node *k* are
+            :code:`neighbours[ngbOffset[k]:ngbOffset[k+1]]` and the corresponding voronoi edges and distances
+            are found at the same positions in :code:`vor_edges` and :code:`edge_length`.
         """
 
         # Call finite volume function
         self._FV_utils(lGIDs)
 
         return
+
+    def padded_neighbours(self, width=None):
+        """
+        Get the neighbourhood of each node as fixed-width arrays padded with -1 (neighbours) and 0 (lengths)
+        as used in previous versions of **badlands**.
+
+        Args:
+            width: (int) number of columns (default: :code:`None` for the maximum number of neighbours).
+
+        Returns
+        -------
+        neighbours
+            numpy integer-type array of shape (number of nodes, width) containing the neighbours IDs.
+        vor_edges
+            numpy float-type array of same shape containing the voronoi edges length.
+        edge_length
+            numpy float-type array of same shape containing the distance to each neighbour.
+        """
+
+        if width is None:
+            width = int(self.maxNgbh)
+
+        count = numpy.diff(self.ngbOffset)
+        rows = numpy.repeat(numpy.arange(len(count)), count)
+        cols = numpy.arange(len(self.neighbours)) - numpy.repeat(
+            self.ngbOffset[:-1], count
+        )
+        keep = cols < width
+
+        neighbours = -numpy.ones((len(count), width), dtype=numpy.int32, order="F")
+        vor_edges = numpy.zeros((len(count), width), order="F")
+        edge_length = numpy.zeros((len(count), width), order="F")
+        neighbours[rows[keep], cols[keep]] = self.neighbours[keep]
+        vor_edges[rows[keep], cols[keep]] = self.vor_edges[keep]
+        edge_length[rows[keep], cols[keep]] = self.edge_length[keep]
+
+        return neighbours, vor_edges, edge_length
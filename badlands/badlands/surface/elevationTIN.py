@@ -29,13 +29,14 @@ import os
 
 if "READTHEDOCS" not in os.environ:
     from badlands import pdalgo
+    from badlands import partitionTIN
 
 from scipy.interpolate import interpn
 from scipy.interpolate import LinearNDInterpolator
 from scipy.interpolate import NearestNDInterpolator
 
 
-def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
+def _boundary_elevation(elevation, ngbOffset, neighbours, edge_length, boundPts, btype):
     """
     This function defines the elevation of the TIN surface edges for 2 different types of conditions:
 
@@ -44,7 +45,8 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
 
     Args:
         elevation: Numpy arrays containing the internal nodes elevation.
-        neighbours: Numpy integer-type array containing for each nodes its neigbhours IDs.
+        ngbOffset: Numpy integer-type array containing for each nodes the position of its first neighbour.
+        neighbours: Numpy integer-type array containing the neigbhours IDs of all nodes.
         edge_length: Numpy float-type array containing the lengths to each neighbour.
         boundPts: Number of nodes on the edges of the TIN surface.
         btype: Integer defining the type of boundary: 0 for flat and 1 for slope condition.
@@ -57,12 +59,12 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
     if btype == 0:
         missedPts = []
         for id in range(boundPts):
-            ngbhs = neighbours[id, :]
+            ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
             ids = numpy.where(ngbhs >= boundPts)[0]
             if len(ids) == 1:
                 elevation[id] = elevation[ngbhs[ids]]
             elif len(ids) > 1:
-                lselect = edge_length[id, ids]
+                lselect = edge_length[ngbOffset[id] + ids]
                 picked = numpy.argmin(lselect)
                 elevation[id] = elevation[ngbhs[ids[picked]]]
             else:
@@ -71,7 +73,7 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
         if len(missedPts) > 0:
             for p in range(len(missedPts)):
                 id = int(missedPts[p])
-                ngbhs = neighbours[id, :]
+                ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
                 ids = numpy.where((elevation[ngbhs] < 9.0e6) & (ngbhs >= 0))[0]
                 if len(ids) == 0:
                     raise ValueError(
@@ -79,7 +81,7 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
                         "%d"
                         "." % id
                     )
-                lselect = edge_length[id, ids]
+                lselect = edge_length[ngbOffset[id] + ids]
                 picked = numpy.argmin(lselect)
                 elevation[id] = elevation[ngbhs[ids[picked]]]
 
@@ -87,16 +89,16 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
     elif btype == 1:
         missedPts = []
         for id in range(boundPts):
-            ngbhs = neighbours[id, :]
+            ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
             ids = numpy.where(ngbhs >= boundPts)[0]
             if len(ids) == 1:
                 # Pick closest non-boundary vertice
-                ln1 = edge_length[id, ids[0]]
+                ln1 = edge_length[ngbOffset[id] + ids[0]]
                 id1 = ngbhs[ids[0]]
                 # Pick closest non-boundary vertice to first picked
-                ngbhs2 = neighbours[id1, :]
+                ngbhs2 = neighbours[ngbOffset[id1] : ngbOffset[id1 + 1]]
                 ids2 = numpy.where(ngbhs2 >= boundPts)[0]
-                lselect = edge_length[id1, ids2]
+                lselect = edge_length[ngbOffset[id1] + ids2]
                 if len(lselect) > 0:
                     picked = numpy.argmin(lselect)
                     id2 = ngbhs2[ids2[picked]]
@@ -108,14 +110,14 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
                     missedPts = numpy.append(missedPts, id)
             elif len(ids) > 1:
                 # Pick closest non-boundary vertice
-                lselect = edge_length[id, ids]
+                lselect = edge_length[ngbOffset[id] + ids]
                 picked = numpy.argmin(lselect)
                 id1 = ngbhs[ids[picked]]
                 ln1 = lselect[picked]
                 # Pick closest non-boundary vertice to first picked
-                ngbhs2 = neighbours[id1, :]
+                ngbhs2 = neighbours[ngbOffset[id1] : ngbOffset[id1 + 1]]
                 ids2 = numpy.where(ngbhs2 >= boundPts)[0]
-                lselect2 = edge_length[id1, ids2]
+                lselect2 = edge_length[ngbOffset[id1] + ids2]
                 if len(lselect2) > 0:
                     picked2 = numpy.argmin(lselect2)
                     id2 = ngbhs2[ids2[picked2]]
@@ -131,7 +133,7 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
         if len(missedPts) > 0:
             for p in range(0, len(missedPts)):
                 id = int(missedPts[p])
-                ngbhs = neighbours[id, :]
+                ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
                 ids = numpy.where((elevation[ngbhs] < 9.0e6) & (ngbhs >= 0))[0]
                 if len(ids) == 0:
                     raise ValueError(
@@ -139,7 +141,7 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
                         "%d"
                         "." % id
                     )
-                lselect = edge_length[id, ids]
+                lselect = edge_length[ngbOffset[id] + ids]
                 picked = numpy.argmin(lselect)
                 elevation[id] = elevation[ngbhs[ids[picked]]]
         elevation[:boundPts] -= 0.5
@@ -148,12 +150,12 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
     parentID = numpy.zeros(boundPts, dtype=int)
     missedPts = []
     for id in range(boundPts):
-        ngbhs = neighbours[id, :]
+        ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
         ids = numpy.where(ngbhs >= boundPts)[0]
         if len(ids) == 1:
             parentID[id] = ngbhs[ids]
         elif len(ids) > 1:
-            lselect = edge_length[id, ids]
+            lselect = edge_length[ngbOffset[id] + ids]
             picked = numpy.argmin(lselect)
             parentID[id] = ngbhs[ids[picked]]
         else:
@@ -162,20 +164,22 @@ def _boundary_elevation(elevation, neighbours, edge_length, boundPts, btype):
     if len(missedPts) > 0:
         for p in range(len(missedPts)):
             id = int(missedPts[p])
-            ngbhs = neighbours[id, :]
+            ngbhs = neighbours[ngbOffset[id] : ngbOffset[id + 1]]
             ids = numpy.where((elevation[ngbhs] < 9.0e6) & (ngbhs >= 0))[0]
             if len(ids) == 0:
                 raise ValueError(
                     "Error while getting boundary elevation for point " "%d" "." % id
                 )
-            lselect = edge_length[id, ids]
+            lselect = edge_length[ngbOffset[id] + ids]
             picked = numpy.argmin(lselect)
             parentID[id] = ngbhs[ids[picked]]
 
     return elevation, parentID
 
 
-def update_border_elevation(elev, neighbours, edge_length, boundPts, btype="flat"):
+def update_border_elevation(
+    elev, ngbOffset, neighbours, edge_length, boundPts, btype="flat"
+):
     """
     This function computes the boundary elevation based on 3 different conditions:
 
@@ -188,7 +192,8 @@ def update_border_elevation(elev, neighbours, edge_length, boundPts, btype="flat
 
     Args:
         elev: numpy arrays containing the internal nodes elevation.
-        neighbours: numpy integer-type array containing for each nodes its neigbhours IDs.
+        ngbOffset: numpy integer-type array containing for each nodes the position of its first neighbour.
+        neighbours: numpy integer-type array containing the neigbhours IDs of all nodes.
         edge_length: numpy float-type array containing the lengths to each neighbour.
         boundPts: number of nodes on the edges of the TIN surface.
         btype: integer defining the type of boundary (default: 'flat').
@@ -216,7 +221,7 @@ def update_border_elevation(elev, neighbours, edge_length, boundPts, btype="flat
         if btype == "slope" or btype == "outlet" or btype == "wall1":
             thetype = 1
         newelev, parentID = _boundary_elevation(
-            elev, neighbours, edge_length, boundPts, thetype
+            elev, ngbOffset, neighbours, edge_length, boundPts, thetype
         )
         if btype == "wall":
             newelev[:boundPts] = 1.0e7
@@ -254,15 +259,24 @@ def getElevation(rX, rY, rZ, coords, interp="linear"):
 
 
 def assign_parameter_pit(
-    neighbours, area, diffnb, prop, propa, propb, boundPts, fillTH=1.0, epsilon=1.0e-6
+    ngbOffset,
+    neighbours,
+    area,
+    diffnb,
+    prop,
+    propa,
+    propb,
+    boundPts,
+    fillTH=1.0,
+    epsilon=1.0e-6,
 ):
     """
     This function defines the global variables used in the **pit filling algorithm** described in
     the :code:`pit_stack` function_.
 
     Args:
-        neighbours: numpy integer-type array containing for each nodes its neigbhours IDs.
-        edge_length: numpy float-type array containing the length to each neighbour.
+        ngbOffset: numpy integer-type array containing for each nodes the position of its first neighbour.
+        neighbours: numpy integer-type array containing the neigbhours IDs of all nodes.
         area: numpy float-type array containing the area of each cell.
         diffnb: marine diffusion distribution steps.
         prop: proportion of marine sediment deposited on downstream nodes.
@@ -279,11 +293,58 @@ def assign_parameter_pit(
     """
 
     pdalgo.pitparams(
-        neighbours, area, diffnb, prop, propa, propb, fillTH, epsilon, boundPts
+        ngbOffset,
+        neighbours,
+        area,
+        diffnb,
+        prop,
+        propa,
+        propb,
+        fillTH,
+        epsilon,
+        boundPts,
     )
 
 
-def pit_stack(elev, allFill, sealevel):
+def pit_tiles(X, Y, ngbOffset, neighbours, tileNb):
+    """
+    This function splits the TIN nodes into tiles for the **tile-parallel pit filling algorithm** used in the
+    :code:`pit_stack` function.
+
+    Args:
+        X: numpy array containing the X coordinates of the TIN vertices.
+        Y: numpy array containing the Y coordinates of the TIN vertices.
+        ngbOffset: numpy integer-type array containing for each nodes the position of its first neighbour.
+        neighbours: numpy integer-type array containing the neigbhours IDs of all nodes.
+        tileNb: number of tiles along the X and Y axes.
+
+    Returns:
+        - tiles - tuple containing the position of the first node of each tile, the nodes sorted by tile, the position of the first halo node of each tile, the halo nodes (nodes of the neighbouring tiles connected to the tile) and the tile ID of each node, or :code:`None` when a single tile is used.
+    """
+
+    if tileNb <= 1:
+        return None
+
+    nodeNb = len(X)
+    tileID = partitionTIN.tiles(X, Y, tileNb, tileNb)
+    count = numpy.bincount(tileID, minlength=tileNb * tileNb)
+    tileOffset = numpy.concatenate(([0], numpy.cumsum(count))).astype(numpy.int32)
+    tileNodes = numpy.argsort(tileID, kind="stable").astype(numpy.int32)
+
+    # Nodes of the neighbouring tiles connected to each tile
+    rows = numpy.repeat(numpy.arange(nodeNb), numpy.diff(ngbOffset))
+    cross = tileID[rows] != tileID[neighbours]
+    key = numpy.unique(
+        tileID[rows[cross]].astype(numpy.int64) * nodeNb + neighbours[cross]
+    )
+    count = numpy.bincount(key // nodeNb, minlength=tileNb * tileNb)
+    haloOffset = numpy.concatenate(([0], numpy.cumsum(count))).astype(numpy.int32)
+    haloNodes = (key % nodeNb).astype(numpy.int32)
+
+    return tileOffset, tileNodes, haloOffset, haloNodes, tileID
+
+
+def pit_stack(elev, allFill, sealevel, tiles=None, fillH=None):
     """
     This function calls a **pit filling algorithm** to compute depression-less elevation grid.
 
@@ -297,6 +358,8 @@ def pit_stack(elev, allFill, sealevel):
         elev: numpy arrays containing the nodes elevation.
         allFill: produce depression-less surface.
         sealevel: current elevation of sea level.
+        tiles: tuple returned by the :code:`pit_tiles` function to fill the tiles in parallel (default: :code:`None`).
+        fillH: numpy array filled in place with the filled elevations, it should not share its memory with :code:`elev` (default: :code:`None` to allocate a new array).
 
     Returns:
         - fillH - numpy array containing the filled elevations.
@@ -304,16 +367,32 @@ def pit_stack(elev, allFill, sealevel):
 
     Caution:
         The Planchon & Darboux (2001) algorithm is not as efficient as priority-queue approaches such as the one
-        proposed in Barnes et al. (2014) and we now use this latest algorithm.
+        proposed in Barnes et al. (2014) and we now use the improved Priority-Flood+:math:`\\epsilon` variant of
+        this latest algorithm. The nodes raised into depressions are processed from a plain queue and the other
+        nodes from a heap allocated with the mesh. The filled elevations follow the Planchon & Darboux update,
+        including the limits set by :code:`fillTH` and the sea-level.
+
+        For very large meshes, the tiles can be flooded in parallel following Barnes (2016). The tiles then
+        exchange the filled elevations of their perimeter nodes and the tiles receiving lower spill elevations
+        are flooded again, which gives the same surface as the serial algorithm.
 
-        Barnes, Lehman & Mulla 2014: An Efficient Assignment of Drainage Direction Over Flat Surfaces in Raster Digital Elevation Models -
-        Computers & Geosciences, doi: 10.1016/`j.cageo.2013.01.009`_.
+        Barnes 2016: Parallel Priority-Flood depression filling for trillion cell digital elevation models
+        on desktops or clusters - Computers & Geosciences, doi: 10.1016/`j.cageo.2016.07.001`_.
 
-    .. _j.cageo.2013.01.009:  http://dx.doi.org/10.1016/j.cageo.2013.01.009
+        Barnes, Lehman & Mulla 2014: Priority-Flood: An Optimal Depression-Filling and Watershed-Labeling Algorithm
+        for Digital Elevation Models - Computers & Geosciences, doi: 10.1016/`j.cageo.2013.04.024`_.
+
+    .. _j.cageo.2016.07.001:  http://dx.doi.org/10.1016/j.cageo.2016.07.001
+    .. _j.cageo.2013.04.024:  http://dx.doi.org/10.1016/j.cageo.2013.04.024
 
     """
 
-    # Call stack based pit filling function from libUtils
-    fillH = pdalgo.pitfilling(elev, allFill, sealevel)
+    # Call priority-flood pit filling function from libUtils
+    if fillH is None:
+        fillH = numpy.empty(len(elev))
+    if tiles is None:
+        pdalgo.priorityfilling(elev, allFill, sealevel, fillH)
+    else:
+        pdalgo.tilefilling(elev, allFill, sealevel, *tiles, fillH)
 
     return fillH
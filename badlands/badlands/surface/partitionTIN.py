@@ -116,6 +116,42 @@ def simple(X, Y, Xdecomp=1, Ydecomp=1):
     return partID, nbprocX, nbprocY
 
 
+def tiles(X, Y, Xdecomp=1, Ydecomp=1):
+    """
+    This function splits the computational domain into rectangular tiles using the row and column wise
+    decomposition of the :code:`simple` function. Contrary to the partitions, the number of tiles is not
+    related to the number of processors and the tiles are used to distribute work between threads.
+
+    Args:
+        X: numpy array containing the X coordinates of the TIN vertices.
+        Y: numpy array containing the Y coordinates of the TIN vertices.
+        Xdecomp: integers that specifies the number of tiles along X axis (default: 1).
+        Ydecomp: integers that specifies the number of tiles along Y axis (default: 1).
+
+    Returns:
+        - tileID - numpy integer-type array filled with the ID of the tile each node belongs to.
+    """
+
+    xmin = X.min()
+    xmax = X.max()
+    ymin = Y.min()
+    ymax = Y.max()
+
+    # Get extent of X and Y tiles
+    nbX = (xmax - xmin) / Xdecomp
+    Xend = xmin + nbX * numpy.arange(1, Xdecomp + 1)
+    Xend[Xdecomp - 1] = xmax
+    nbY = (ymax - ymin) / Ydecomp
+    Yend = ymin + nbY * numpy.arange(1, Ydecomp + 1)
+    Yend[Ydecomp - 1] = ymax
+
+    # Fill tile ID based on node coordinates
+    ix = numpy.minimum(numpy.searchsorted(Xend, X), Xdecomp - 1)
+    iy = numpy.minimum(numpy.searchsorted(Yend, Y), Ydecomp - 1)
+
+    return (ix + iy * Xdecomp).astype(numpy.int32)
+
+
 def overlap(X, Y, nbprocX, nbprocY, overlapLen, verbose=False):
     """
     This function defines a simple partitioning of the computational domain based on
@@ -11,6 +11,7 @@
 from setuptools import setup, find_packages
 from numpy.distutils.core import setup, Extension
 
+import sys
 import glob
 import subprocess
 from os import path
@@ -26,11 +27,18 @@ sys_includes += glob.glob("utils/*.o")
 sys_includes += glob.glob("utils/*.so")
 sys_includes += glob.glob("utils/*.mod")
 
+# OpenMP is not available with the default macOS compiler
+if sys.platform == "darwin":
+    omp_flags = []
+else:
+    omp_flags = ["-fopenmp"]
+
 # interface for fortran code
 ext1 = Extension(
     name="badlands.flowalgo",
     sources=["utils/flowalgo.pyf", "utils/flowalgo.f90"],
-    extra_link_args=["utils/classfv.o"],
+    extra_f90_compile_args=omp_flags,
+    extra_link_args=["utils/classfv.o"] + omp_flags,
 )
 
 ext2 = Extension(
@@ -42,7 +50,8 @@ ext2 = Extension(
 ext3 = Extension(
     name="badlands.pdalgo",
     sources=["utils/pdalgo.pyf", "utils/pdalgo.f90"],
-    extra_link_args=["utils/classpd.o"],
+    extra_f90_compile_args=omp_flags,
+    extra_link_args=["utils/classpd.o"] + omp_flags,
 )
 
 ext4 = Extension(
@@ -55,7 +64,12 @@ ext5 = Extension(
     name="badlands.waveseds", sources=["utils/waveseds.pyf", "utils/waveseds.f90"]
 )
 
-ext6 = Extension(name="badlands.sfd", sources=["utils/sfd.pyf", "utils/sfd.c"])
+ext6 = Extension(
+    name="badlands.sfd",
+    sources=["utils/sfd.pyf", "utils/sfd.c"],
+    extra_compile_args=omp_flags,
+    extra_link_args=omp_flags,
+)
 
 if __name__ == "__main__":
     setup(
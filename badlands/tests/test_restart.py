@@ -0,0 +1,110 @@
+"""
+Restart files of a simulation solving the hillslope diffusion implicitly.
+"""
+
+import os
+import pickle
+
+import numpy
+import pytest
+
+model = pytest.importorskip("badlands.model")
+
+
+def _experiment(folder, processes=""):
+    """
+    Write a gaussian hill DEM and the XML input file of a linear diffusion experiment, additional processes are
+    given as XML elements.
+    """
+
+    x, y = numpy.meshgrid(
+        numpy.arange(0.0, 2050.0, 50.0), numpy.arange(0.0, 2050.0, 50.0)
+    )
+    z = 100.0 * numpy.exp(-((x - 1000.0) ** 2 + (y - 1000.0) ** 2) / 2.0e5)
+    demfile = os.path.join(folder, "hill.csv")
+    numpy.savetxt(demfile, numpy.column_stack((x.ravel(), y.ravel(), z.ravel())))
+
+    xmlfile = os.path.join(folder, "hill.xml")
+    with open(xmlfile, "w") as f:
+        f.write("""<?xml version="1.0" encoding="UTF-8"?>
+<badlands>
+    <grid>
+        <demfile>%s</demfile>
+        <boundary>slope</boundary>
+    </grid>
+    <time>
+        <start>0.</start>
+        <end>2000.</end>
+        <display>1000.</display>
+    </time>
+    <creep>
+        <caerial>0.5</caerial>
+        <cmarine>0.</cmarine>
+        <solver>implicit</solver>
+    </creep>%s
+    <outfolder>%s</outfolder>
+</badlands>
+""" % (demfile, processes, os.path.join(folder, "out")))
+
+    return xmlfile
+
+
+def test_restart_after_implicit_step(tmp_path):
+    xmlfile = _experiment(str(tmp_path))
+
+    ref = model.Model()
+    ref.load_xml(xmlfile)
+    ref.run_to_time(1000.0)
+    assert ref.hillslope.implicit.solve is not None
+
+    # The cached factorisation is not part of the simulation state
+    pickle.dumps(ref.snapshot())
+    filename = ref.write_restart(str(tmp_path / "restart.pkl"))
+
+    resumed = model.Model()
+    resumed.load_xml(xmlfile)
+    resumed.load_restart(filename)
+    assert resumed.hillslope.implicit is not ref.hillslope.implicit
+    numpy.testing.assert_array_equal(resumed.elevation, ref.elevation)
+
+    ref.run_to_time(2000.0)
+    resumed.run_to_time(2000.0)
+    numpy.testing.assert_array_equal(resumed.elevation, ref.elevation)
+
+
+def test_restart_with_incremental_routing(tmp_path):
+    processes = """
+    <precipitation>
+        <climates>1</climates>
+        <rain>
+            <rstart>0.</rstart>
+            <rend>2000.</rend>
+            <rval>1.</rval>
+        </rain>
+    </precipitation>
+    <sp_law>
+        <dep>1</dep>
+        <m>0.5</m>
+        <n>1.0</n>
+        <erodibility>1.e-5</erodibility>
+        <routing>incremental</routing>
+    </sp_law>"""
+    xmlfile = _experiment(str(tmp_path), processes)
+
+    ref = model.Model()
+    ref.load_xml(xmlfile)
+    ref.run_to_time(1000.0)
+    filename = ref.write_restart(str(tmp_path / "restart.pkl"))
+    # Restoring a snapshot performs the same full flow routing as a resumed simulation
+    ref.restore(ref.snapshot())
+    assert ref.flow.fillRef is None
+
+    resumed = model.Model()
+    resumed.load_xml(xmlfile)
+    resumed.load_restart(filename)
+    numpy.testing.assert_array_equal(resumed.elevation, ref.elevation)
+
+    ref.run_to_time(2000.0)
+    resumed.run_to_time(2000.0)
+    numpy.testing.assert_array_equal(resumed.elevation, ref.elevation)
+    numpy.testing.assert_array_equal(resumed.flow.receivers, ref.flow.receivers)
@@ -520,30 +520,8 @@ module classfv
   real(kind=8) :: width_kw
   real(kind=8) :: width_b
 
-  integer,dimension(:),allocatable :: allocs
-  integer,dimension(:),allocatable :: Donors
-  integer,dimension(:),allocatable :: Delta
-  integer,dimension(:),allocatable :: stackOrder
-
 contains
 
-  recursive function addtostack(base,donor,stackID) result(success)
-
-      integer :: base,donor,stackID,n,success
-
-      success = 1
-      do n = Delta(donor),Delta(donor+1)-1
-          if((allocs(Donors(n)) /= base))then
-              donor = Donors(n)
-              stackID = stackID+1
-              stackOrder(stackID) = donor
-              allocs(donor) = base
-              success = addtostack(base,donor,stackID)
-          endif
-      enddo
-      success = 0
-
-  end function addtostack
   ! =====================================================================================
   subroutine get_data
 
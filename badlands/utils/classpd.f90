@@ -7,7 +7,7 @@
 !!                                                                                   !!
 !!~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~!!
 
-! This module implements Planchon & Darboux depression filling algorithm class
+! This module implements the Priority-Flood depression filling algorithm class
 module classpd
 
     implicit none
@@ -15,17 +15,10 @@ module classpd
     integer :: dnodes
     integer :: pydx,pydy
 
-    ! Define the data-structure to hold the data
-    integer :: s1 = 0
-    integer :: s2 = 0
-    integer, allocatable, dimension(:) :: data1
-    integer, allocatable, dimension(:) :: data2
-
-    ! Set the size of allocated memory blocks
-    integer :: block_size
-
-    ! Set neighbourhood array
-    integer,allocatable, dimension(:,:) :: neighbours
+    ! Set neighbourhood arrays in compressed sparse row format
+    integer :: nnz
+    integer,allocatable, dimension(:) :: ngbOffset
+    integer,allocatable, dimension(:) :: neighbours
 
     ! Set area cells array
     real(kind=8),allocatable, dimension(:) :: area
@@ -55,6 +48,32 @@ module classpd
 
     type (pqueue) :: priorityqueue
 
+    ! Priority-Flood workspace sized to the mesh: binary heap of node IDs ordered by filled
+    ! elevations with the position of each node in the heap, and circular queue of the nodes
+    ! raised into depressions
+    integer :: hn = 0
+    integer :: qn = 0
+    integer :: qhead, qtail
+    integer, allocatable, dimension(:) :: heapID
+    integer, allocatable, dimension(:) :: heapPos
+    integer, allocatable, dimension(:) :: pitQueue
+    logical, allocatable, dimension(:) :: inPit
+    real(kind=8), allocatable, dimension(:) :: fillZ
+
+    ! Tile-parallel Priority-Flood workspace: position of each node in its tile, filled elevations
+    ! of the previous round and spill elevations seen by each tile. The heap and queue of a tile
+    ! occupy a contiguous segment of the tile arrays holding its nodes followed by its halo nodes.
+    integer :: haloNb = -1
+    integer, allocatable, dimension(:) :: tileLocal
+    real(kind=8), allocatable, dimension(:) :: tileZ
+    real(kind=8), allocatable, dimension(:) :: tileSeen
+    integer, allocatable, dimension(:) :: tileGid
+    integer, allocatable, dimension(:) :: tileHeap
+    integer, allocatable, dimension(:) :: tileHeapPos
+    integer, allocatable, dimension(:) :: tileQueue
+    logical, allocatable, dimension(:) :: tileInPit
+    real(kind=8), allocatable, dimension(:) :: tileFz
+
 contains
 
     subroutine shiftdown(this, a)
@@ -135,38 +154,250 @@ contains
     end subroutine PQpush
 
     subroutine defineparameters
+    !*****************************************************************************
+    ! Arrays are kept between meshes of the same size and only reallocated when the
+    ! number of nodes or connections changes
 
-      if(allocated(neighbours)) deallocate(neighbours)
-      if(allocated(area)) deallocate(area)
-      allocate(neighbours(dnodes,20))
-      allocate(area(dnodes))
-
-      if(allocated(data1)) deallocate(data1)
-      if(allocated(data2)) deallocate(data2)
-      allocate(data1(block_size))
-      allocate(data2(block_size))
+      if(allocated(ngbOffset))then
+        if(size(ngbOffset) /= dnodes+1 .or. size(neighbours) /= nnz)then
+          deallocate(ngbOffset, neighbours, area)
+        endif
+      endif
+      if(.not. allocated(ngbOffset))then
+        allocate(ngbOffset(dnodes+1))
+        allocate(neighbours(nnz))
+        allocate(area(dnodes))
+      endif
+
+      if(allocated(heapID))then
+        if(size(heapID) /= dnodes) deallocate(heapID, heapPos, pitQueue, inPit, fillZ)
+      endif
+      if(.not. allocated(heapID))then
+        allocate(heapID(dnodes))
+        allocate(heapPos(dnodes))
+        allocate(pitQueue(dnodes))
+        allocate(inPit(dnodes))
+        allocate(fillZ(dnodes))
+      endif
 
       return
 
     end subroutine defineparameters
 
-    subroutine initialisePD(elevation, demH, pydnodes)
+    subroutine tileworkspace(pyhalo)
+    !*****************************************************************************
+    ! This function sizes the tile-parallel Priority-Flood workspace to the mesh and halo
+
+      integer :: pyhalo
+
+      if(allocated(tileLocal))then
+        if(size(tileLocal) /= dnodes .or. haloNb /= pyhalo)then
+          deallocate(tileLocal, tileZ, tileSeen, tileGid, tileHeap, tileHeapPos, tileQueue, tileInPit, tileFz)
+        endif
+      endif
+      if(.not. allocated(tileLocal))then
+        haloNb = pyhalo
+        allocate(tileLocal(dnodes))
+        allocate(tileZ(dnodes))
+        allocate(tileSeen(pyhalo))
+        allocate(tileGid(dnodes+pyhalo))
+        allocate(tileHeap(dnodes+pyhalo))
+        allocate(tileHeapPos(dnodes+pyhalo))
+        allocate(tileQueue(dnodes+pyhalo))
+        allocate(tileInPit(dnodes+pyhalo))
+        allocate(tileFz(dnodes+pyhalo))
+      endif
+
+      return
+
+    end subroutine tileworkspace
+
+    subroutine heapSwap(a, b)
+    !*****************************************************************************
+    ! This function swaps two nodes of the mesh sized heap
+
+      integer :: a, b, tmp
+
+      tmp = heapID(a)
+      heapID(a) = heapID(b)
+      heapID(b) = tmp
+      heapPos(heapID(a)) = a
+      heapPos(heapID(b)) = b
+
+    end subroutine heapSwap
+
+    subroutine heapUp(a)
+    !*****************************************************************************
+    ! This function moves a node up the heap until its parent has a lower filled elevation
+
+      integer :: a, parent, child
+
+      child = a
+      do while(child > 1)
+        parent = child/2
+        if(fillZ(heapID(parent)) > fillZ(heapID(child)))then
+          call heapSwap(parent, child)
+          child = parent
+        else
+          exit
+        endif
+      enddo
+
+    end subroutine heapUp
+
+    subroutine heapDown(a)
+    !*****************************************************************************
+    ! This function moves a node down the heap until its children have higher filled elevations
+
+      integer :: a, parent, child
+
+      parent = a
+      do while(parent*2 <= hn)
+        child = parent*2
+        if(child + 1 <= hn)then
+          if(fillZ(heapID(child+1)) < fillZ(heapID(child))) child = child + 1
+        endif
+        if(fillZ(heapID(parent)) > fillZ(heapID(child)))then
+          call heapSwap(parent, child)
+          parent = child
+        else
+          exit
+        endif
+      enddo
+
+    end subroutine heapDown
+
+    subroutine heapPush(id)
+    !*****************************************************************************
+    ! This function pushes a node in the heap or moves it up if its filled elevation decreased
+
+      integer :: id
+
+      if(heapPos(id) > 0)then
+        call heapUp(heapPos(id))
+      else
+        hn = hn + 1
+        heapID(hn) = id
+        heapPos(id) = hn
+        call heapUp(hn)
+      endif
+
+    end subroutine heapPush
+
+    function heapPop() result(id)
+    !*****************************************************************************
+    ! This function pops the node with the lowest filled elevation from the heap
+
+      integer :: id
+
+      id = heapID(1)
+      heapPos(id) = 0
+      heapID(1) = heapID(hn)
+      hn = hn - 1
+      if(hn > 0)then
+        heapPos(heapID(1)) = 1
+        call heapDown(1)
+      endif
+
+    end function heapPop
+
+    subroutine pitPush(id)
+    !*****************************************************************************
+    ! This function appends a node raised into a depression to the circular queue
+
+      integer :: id
+
+      qtail = mod(qtail, dnodes) + 1
+      pitQueue(qtail) = id
+      qn = qn + 1
+      inPit(id) = .True.
 
-      integer :: pydnodes, k
+    end subroutine pitPush
+
+    function pitPop() result(id)
+    !*****************************************************************************
+    ! This function pops the first node of the circular queue
+
+      integer :: id
+
+      id = pitQueue(qhead)
+      qhead = mod(qhead, dnodes) + 1
+      qn = qn - 1
+      inPit(id) = .False.
+
+    end function pitPop
+
+    subroutine fillPriority(elevation, sealevel, allfill, demH, pydnodes)
+    !*****************************************************************************
+    ! Improved Priority-Flood+epsilon (Barnes et al., 2014) on the TIN neighbourhood.
+    ! Nodes raised into depressions are processed from a plain queue and only the other
+    ! nodes go through the heap. The filled elevations follow the Planchon & Darboux
+    ! update and, when allfill is 0, are limited by fill_TH above the elevation or the
+    ! sea-level. A limited node can lower nodes already processed which are then pushed
+    ! again until the limited elevations are consistent.
+
+      integer :: pydnodes, allfill, n, k, p
+      real(kind=8),intent(in) :: sealevel
       real(kind=8),intent(in) :: elevation(pydnodes)
       real(kind=8),intent(inout) :: demH(pydnodes)
 
-      s1 = 0
-      s2 = 0
+      real(kind=8) :: h
+
+      hn = 0
+      qn = 0
+      qhead = 1
+      qtail = 0
+      heapPos = 0
+      inPit = .False.
 
-      demH(1:bds) = elevation(1:bds)
-      do k = bds+1,pydnodes
-          demH(k) = 1.e6
-          s1 = s1 + 1
-          data1(s1) = k
+      fillZ(1:bds) = elevation(1:bds)
+      fillZ(bds+1:pydnodes) = 1.e6
+      do k = 1, bds
+        call heapPush(k)
       enddo
 
-    end subroutine initialisePD
+      do while(hn > 0 .or. qn > 0)
+        k = 0
+        if(qn > 0)then
+          if(hn == 0)then
+            k = pitPop()
+          elseif(fillZ(pitQueue(qhead)) <= fillZ(heapID(1)))then
+            k = pitPop()
+          endif
+        endif
+        if(k == 0) k = heapPop()
+
+        h = fillZ(k) + eps
+        loop: do p = ngbOffset(k)+1, ngbOffset(k+1)
+          n = neighbours(p)+1
+          if(n > bds .and. fillZ(n) > elevation(n))then
+            if(elevation(n) >= h)then
+              fillZ(n) = elevation(n)
+              call heapPush(n)
+            elseif(fillZ(n) > h)then
+              fillZ(n) = h
+              if(allfill == 0)then
+                if(elevation(n) >= sealevel)then
+                  if(fillZ(n) - elevation(n) > fill_TH) fillZ(n) = elevation(n) + fill_TH
+                else
+                  if(fillZ(n) - sealevel > fill_TH) fillZ(n) = sealevel + fill_TH
+                endif
+              endif
+              if(fillZ(n) < h .or. heapPos(n) > 0)then
+                call heapPush(n)
+              elseif(.not. inPit(n))then
+                call pitPush(n)
+              endif
+            endif
+          endif
+        enddo loop
+      enddo
+
+      demH = fillZ
+
+      return
+
+    end subroutine fillPriority
 
     subroutine fillBarnes(elevation, sealevel, demH, pydnodes)
 
@@ -195,9 +426,8 @@ contains
         pt = priorityqueue%PQpop()
         k = pt%id
         demH(k) = fill(k)
-        loop: do p = 1, 20
-          if( neighbours(k,p) < 0 ) exit loop
-          n = neighbours(k,p)+1
+        loop: do p = ngbOffset(k)+1, ngbOffset(k+1)
+          n = neighbours(p)+1
           if(.not. flag(n))then
             flag(n) = .True.
             fill(n) = max(fill(n),fill(k)+eps)
@@ -224,103 +454,4 @@ contains
 
     end subroutine fillBarnes
 
-    subroutine fillPD(elevation, sealevel, demH, pydnodes)
-
-      logical :: change
-      integer :: pydnodes, n, k, p
-      real(kind=8) :: hmin
-      real(kind=8),intent(in) :: sealevel
-      real(kind=8),intent(in) :: elevation(pydnodes)
-      real(kind=8),intent(inout) :: demH(pydnodes)
-
-      change = .true.
-      do while(change)
-        change = .false.
-        do n = 1, s1
-          k = data1(n)
-          if( demH(k) > elevation(k) )then
-            ! Get minimum value
-            hmin = 2.e6
-            loop: do p = 1, 20
-              if( neighbours(k,p) < 0 ) exit loop
-              hmin = min(hmin,demH(neighbours(k,p)+1))
-            enddo loop
-            if( elevation(k) >= hmin + eps )then
-              demH(k) = elevation(k)
-            else
-              if( demH(k) > hmin + eps )then
-                demH(k) = hmin + eps
-                if(elevation(k)>=sealevel)then
-                  if( demH(k) - elevation(k) > fill_TH)then
-                    demH(k) = elevation(k) + fill_TH
-                  else
-                    change = .true.
-                  endif
-                else
-                  if( demH(k) - sealevel > fill_TH)then
-                    demH(k) = sealevel + fill_TH
-                  else
-                    change = .true.
-                  endif
-                endif
-              endif
-              s2 = s2 + 1
-              data2(s2) = k
-            endif
-          endif
-        enddo
-        if( s2 > 0 )then
-          s1 = s2
-          data1(1:s1) = data2(1:s2)
-          s2 = 0
-        endif
-      enddo
-
-      return
-
-    end subroutine fillPD
-
-    subroutine allfillPD(elevation, demH, pydnodes)
-
-      logical :: change
-      integer :: pydnodes, n, k, p
-      real(kind=8) :: hmin
-      real(kind=8),intent(in) :: elevation(pydnodes)
-      real(kind=8),intent(inout) :: demH(pydnodes)
-
-      change = .true.
-      do while(change)
-        change = .false.
-        do n = 1, s1
-          k = data1(n)
-          if( demH(k) > elevation(k) )then
-            ! Get minimum value
-            hmin = 2.e6
-            loop: do p = 1, 20
-              if( neighbours(k,p) < 0 ) exit loop
-              hmin = min(hmin,demH(neighbours(k,p)+1))
-            enddo loop
-            if( elevation(k) >= hmin + eps )then
-              demH(k) = elevation(k)
-            else
-              if( demH(k) > hmin + eps )then
-                demH(k) = hmin + eps
-                change = .true.
-              endif
-              s2 = s2 + 1
-              data2(s2) = k
-            endif
-          endif
-        enddo
-        if( s2 > 0 )then
-          s1 = s2
-          data1(1:s1) = data2(1:s2)
-          s2 = 0
-        endif
-      enddo
-
-      return
-
-    end subroutine allfillPD
-
 end module classpd
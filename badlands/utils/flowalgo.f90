@@ -34,63 +34,6 @@ subroutine overlap(pyX,pyY,pyXst,pyYst,pyXed,pyYed,pyPart,pyNodes)
 
 end subroutine overlap
 
-! This module builds the stack used for in Braun & Willett (2013) flow network
-! algorithm
-subroutine buildfa(pyBase,pyRcv,pyDelta,pyDonors,pyStackOrder,pyBaseNb,pyDeltaNb,pyNodesNb)
-
-  use classfv
-  implicit none
-
-  integer :: pyBaseNb
-  integer :: pyDeltaNb
-  integer :: pyNodesNb
-  integer,dimension(pyBaseNb),intent(in) :: pyBase
-  integer,dimension(pyNodesNb),intent(in) :: pyRcv
-  integer,dimension(pyDeltaNb),intent(in) :: pyDelta
-
-  integer,dimension(pyNodesNb),intent(out) :: pyDonors
-  integer,dimension(pyNodesNb),intent(out) :: pyStackOrder
-
-  integer :: p,j,k,success
-  integer,dimension(pyNodesNb) :: intArray
-
-  j = 0
-
-  if(allocated(stackOrder)) deallocate(stackOrder)
-  if(allocated(allocs)) deallocate(allocs)
-  if(allocated(Donors)) deallocate(Donors)
-  if(allocated(Delta)) deallocate(Delta)
-  allocate(stackOrder(pyNodesNb))
-  allocate(allocs(pyNodesNb))
-  allocate(Donors(pyNodesNb))
-  allocate(Delta(pyDeltaNb))
-
-  intArray = 0
-
-  stackOrder = 0
-  Delta = pyDelta+1
-
-  do k = 1, pyNodesNb
-      Donors(Delta(pyRcv(k)+1) + intArray(pyRcv(k)+1)) = k
-      intArray(pyRcv(k)+1) = intArray(pyRcv(k)+1)+1
-  enddo
-
-  allocs = -1
-  do p = 1, pyBaseNb
-      k = pyBase(p)+1
-      j = j+1
-      stackOrder(j) = k
-      allocs(k) = p
-      success = addtostack(p,k,j)
-  enddo
-
-  pyDonors = Donors-1
-  pyStackOrder = stackOrder-1
-
-  return
-
-end subroutine buildfa
-
 ! This module implements flow parameters computation.
 subroutine eroparams(typefct, m, n, mt, nt, kt, kw, b, bsfct)
 
@@ -121,41 +64,55 @@ subroutine eroparams(typefct, m, n, mt, nt, kt, kw, b, bsfct)
 
 end subroutine eroparams
 
-subroutine discharge(sea, pyStack, pyRcv, pyElev, pyDischarge, pyDis, pyLay, pylNodesNb, pygNodesNb)
+subroutine discharge(sea, pyStack, pyRcv, pyElev, pyDischarge, pyOffset, pyGroup, pyMember, pyDis, pyLay, &
+  pylNodesNb, pygNodesNb, pySegNb, pyGrpNb)
 
   use classfv
   implicit none
 
   integer :: pygNodesNb
   integer :: pylNodesNb
+  integer :: pySegNb
+  integer :: pyGrpNb
   integer,dimension(pylNodesNb),intent(in) :: pyStack
   integer,dimension(pygNodesNb),intent(in) :: pyRcv
   real(kind=8),dimension(pygNodesNb),intent(in) :: pyElev
   real(kind=8),dimension(pygNodesNb),intent(in) :: pyDischarge
+  integer,dimension(pySegNb+1),intent(in) :: pyOffset
+  integer,dimension(pyGrpNb+1),intent(in) :: pyGroup
+  integer,dimension(pySegNb),intent(in) :: pyMember
   real(kind=8),intent(in) :: sea
-  real(kind=8),dimension(pygNodesNb),intent(out) :: pyDis
-  real(kind=8),dimension(pygNodesNb),intent(out) :: pyLay
+  real(kind=8),dimension(pygNodesNb),intent(inout) :: pyDis
+  real(kind=8),dimension(pygNodesNb),intent(inout) :: pyLay
 
-  integer :: n, donor, recvr
+  integer :: g, m, k, n, donor, recvr
 
   pyDis = pyDischarge
   pyLay = 0.
 
-  do n = pylNodesNb, 1, -1
-    donor = pyStack(n) + 1
-    recvr = pyRcv(donor) + 1
-    if( donor /= recvr )then
-  ! does not sum discharge below sea level - only one donor per receiver
-        if (pyElev(recvr)>=sea)then
-            pyDis(recvr) = pyDis(recvr) + pyDis(donor)
-        else
-            if (pyDis(donor)>=pyDis(recvr)) then
-              pyDis(recvr)=pyDis(donor)
+  ! Each group of catchments is processed by a single thread
+  !$omp parallel do schedule(dynamic) private(m, k, n, donor, recvr)
+  do g = 1, pyGrpNb
+    do m = pyGroup(g) + 1, pyGroup(g+1)
+      k = pyMember(m) + 1
+      do n = pyOffset(k+1), pyOffset(k) + 1, -1
+        donor = pyStack(n) + 1
+        recvr = pyRcv(donor) + 1
+        if( donor /= recvr )then
+      ! does not sum discharge below sea level - only one donor per receiver
+            if (pyElev(recvr)>=sea)then
+                pyDis(recvr) = pyDis(recvr) + pyDis(donor)
+            else
+                if (pyDis(donor)>=pyDis(recvr)) then
+                  pyDis(recvr)=pyDis(donor)
+                endif
             endif
         endif
-    endif
-    pyLay(donor) = pyElev(donor)-pyElev(recvr)
+        pyLay(donor) = pyElev(donor)-pyElev(recvr)
+      enddo
+    enddo
   enddo
+  !$omp end parallel do
 
   return
 
@@ -229,8 +186,8 @@ pyBasinID, pyVolume, pylNodesNb, pygNodesNb)
   real(kind=8),dimension(pygNodesNb),intent(in) :: pyElev
   real(kind=8),dimension(pygNodesNb),intent(in) :: pyArea
 
-  integer,dimension(pygNodesNb),intent(out) :: pyBasinID
-  real(kind=8),dimension(pygNodesNb),intent(out) :: pyVolume
+  integer,dimension(pygNodesNb),intent(inout) :: pyBasinID
+  real(kind=8),dimension(pygNodesNb),intent(inout) :: pyVolume
 
   integer :: n, donor, recvr, pitID
 
@@ -271,9 +228,9 @@ subroutine basindrainage(orderPits, pitID, pyRcv, pIDs, fillH, &
 
   real(kind=8),dimension(pygNodesNb),intent(in) :: fillH
 
-  integer,dimension(pygNodesNb),intent(out) :: pyDrain
+  integer,dimension(pygNodesNb),intent(inout) :: pyDrain
 
-  integer,dimension(pitNb) :: chainDrain
+  integer,dimension(pitNb+1) :: chainDrain
   integer :: n, donor, recvr, nID, count, p, newDrain
   logical :: newpit,exist
 
@@ -344,9 +301,9 @@ pyDrain, pitNb, pygNodesNb)
   integer,dimension(pygNodesNb),intent(in) :: pyRcv
   integer,dimension(pitNb),intent(in) :: pIDs
 
-  integer,dimension(pygNodesNb),intent(out) :: pyDrain
+  integer,dimension(pygNodesNb),intent(inout) :: pyDrain
 
-  integer,dimension(pitNb) :: chainDrain
+  integer,dimension(pitNb+1) :: chainDrain
   integer :: n, donor, recvr, nID, count, p, newDrain
   logical :: newpit,exist
 
@@ -429,17 +386,19 @@ cfl_dt, pylNodesNb, pygNodesNb)
 
 end subroutine flowcfl
 
-subroutine diffmarine(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, pyGIDs, &
-                  slvl, pymaxth, tstep, pyDiff, mindt, pylocalNb, pyglobalNb)
+subroutine diffmarine(pyZ, pyBord, pyDepoH, pyOffset, pyNgbs, pyEdge, pyDist, pyCoeff, pyGIDs, &
+                  slvl, pymaxth, tstep, pyDiff, mindt, pylocalNb, pyglobalNb, pyNnz)
 
   use classfv
   implicit none
 
   integer :: pyglobalNb
   integer :: pylocalNb
+  integer :: pyNnz
   integer,dimension(pylocalNb),intent(in) :: pyGIDs
   integer,dimension(pyglobalNb),intent(in) :: pyBord
-  integer,dimension(pyglobalNb,20),intent(in) :: pyNgbs
+  integer,dimension(pyglobalNb+1),intent(in) :: pyOffset
+  integer,dimension(pyNnz),intent(in) :: pyNgbs
 
   real(kind=8),intent(in) :: slvl
   real(kind=8),intent(in) :: pymaxth
@@ -447,8 +406,8 @@ subroutine diffmarine(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, pyG
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyZ
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyCoeff
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyDepoH
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyEdge
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyDist
+  real(kind=8),dimension(pyNnz),intent(in) :: pyEdge
+  real(kind=8),dimension(pyNnz),intent(in) :: pyDist
 
   real(kind=8),intent(out) :: mindt
   real(kind=8),dimension(pyglobalNb),intent(out) :: pyDiff
@@ -461,11 +420,10 @@ subroutine diffmarine(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, pyG
   do k = 1, pylocalNb
     gid = pyGIDs(k)+1
     if(pyBord(gid)>0 .and. pyZ(gid)<slvl)then
-      loop: do p =1,20
-        if(pyNgbs(gid,p)<0) exit loop
-        ngbid = pyNgbs(gid,p)+1
+      loop: do p = pyOffset(gid)+1, pyOffset(gid+1)
+        ngbid = pyNgbs(p)+1
         if(pyBord(ngbid)>0.)then
-          flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+          flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
           if(pyDepoH(gid)>pymaxth .and. pyZ(gid)>pyZ(ngbid))then
             pyDiff(gid) = pyDiff(gid) + pyCoeff(gid)*flx
           elseif(pyDepoH(ngbid)>pymaxth .and. pyZ(gid)<pyZ(ngbid) .and. pyZ(ngbid)<slvl)then
@@ -473,7 +431,7 @@ subroutine diffmarine(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, pyG
           endif
         elseif(pyBord(ngbid)<1)then
           if(pyDepoH(gid)>pymaxth .and. pyZ(gid)>pyZ(ngbid))then
-            flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+            flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
             pyDiff(gid) = pyDiff(gid) + pyCoeff(gid)*flx
           endif
         endif
@@ -490,25 +448,27 @@ subroutine diffmarine(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, pyG
 
 end subroutine diffmarine
 
-subroutine difffailure(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, pyGIDs, &
-                  pymaxth, tstep, pyDiff, mindt, pylocalNb, pyglobalNb)
+subroutine difffailure(pyZ, pyBord, pyDepoH, pyOffset, pyNgbs, pyEdge, pyDist, pyCoeff, pyGIDs, &
+                  pymaxth, tstep, pyDiff, mindt, pylocalNb, pyglobalNb, pyNnz)
 
   use classfv
   implicit none
 
   integer :: pyglobalNb
   integer :: pylocalNb
+  integer :: pyNnz
   integer,dimension(pylocalNb),intent(in) :: pyGIDs
   integer,dimension(pyglobalNb),intent(in) :: pyBord
-  integer,dimension(pyglobalNb,20),intent(in) :: pyNgbs
+  integer,dimension(pyglobalNb+1),intent(in) :: pyOffset
+  integer,dimension(pyNnz),intent(in) :: pyNgbs
 
   real(kind=8),intent(in) :: pymaxth
   real(kind=8),intent(in) :: tstep
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyZ
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyCoeff
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyDepoH
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyEdge
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyDist
+  real(kind=8),dimension(pyNnz),intent(in) :: pyEdge
+  real(kind=8),dimension(pyNnz),intent(in) :: pyDist
 
   real(kind=8),intent(out) :: mindt
   real(kind=8),dimension(pyglobalNb),intent(out) :: pyDiff
@@ -521,11 +481,10 @@ subroutine difffailure(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, py
   do k = 1, pylocalNb
     gid = pyGIDs(k)+1
     if(pyBord(gid)>0)then
-      loop: do p =1,20
-        if(pyNgbs(gid,p)<0) exit loop
-        ngbid = pyNgbs(gid,p)+1
+      loop: do p = pyOffset(gid)+1, pyOffset(gid+1)
+        ngbid = pyNgbs(p)+1
         if(pyBord(ngbid)>0.)then
-          flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+          flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
           if(pyDepoH(gid)>pymaxth .and. pyZ(gid)>pyZ(ngbid))then
             pyDiff(gid) = pyDiff(gid) + pyCoeff(gid)*flx
           elseif(pyDepoH(ngbid)>pymaxth .and. pyZ(gid)<pyZ(ngbid))then
@@ -533,7 +492,7 @@ subroutine difffailure(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, py
           endif
         elseif(pyBord(ngbid)<1)then
           if(pyDepoH(gid)>pymaxth .and. pyZ(gid)>pyZ(ngbid))then
-            flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+            flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
             pyDiff(gid) = pyDiff(gid) + pyCoeff(gid)*flx
           endif
         endif
@@ -550,25 +509,27 @@ subroutine difffailure(pyZ, pyBord, pyDepoH, pyNgbs, pyEdge, pyDist, pyCoeff, py
 
 end subroutine difffailure
 
-subroutine diffsedmarine(pyZ, pyBord, pyDepo, pyDepoH, slvl, pymaxth, pyCoeff, pyNgbs, pyEdge, &
-                    pyDist, pyGIDs, pyDiff, sumDiff, pylocalNb, pyglobalNb, pyRockNb)
+subroutine diffsedmarine(pyZ, pyBord, pyDepo, pyDepoH, slvl, pymaxth, pyCoeff, pyOffset, pyNgbs, pyEdge, &
+                    pyDist, pyGIDs, pyDiff, sumDiff, pylocalNb, pyglobalNb, pyRockNb, pyNnz)
 
   use classfv
   implicit none
 
   integer :: pyglobalNb
   integer :: pylocalNb
+  integer :: pyNnz
   integer :: pyRockNb
   integer,dimension(pylocalNb),intent(in) :: pyGIDs
   integer,dimension(pyglobalNb),intent(in) :: pyBord
-  integer,dimension(pylocalNb,20),intent(in) :: pyNgbs
+  integer,dimension(pyglobalNb+1),intent(in) :: pyOffset
+  integer,dimension(pyNnz),intent(in) :: pyNgbs
 
   real(kind=8),intent(in) :: slvl
   real(kind=8),intent(in) :: pymaxth
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyZ
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyCoeff
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyEdge
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyDist
+  real(kind=8),dimension(pyNnz),intent(in) :: pyEdge
+  real(kind=8),dimension(pyNnz),intent(in) :: pyDist
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyDepoH
   real(kind=8),dimension(pyglobalNb,pyRockNb),intent(in) :: pyDepo
 
@@ -584,11 +545,10 @@ subroutine diffsedmarine(pyZ, pyBord, pyDepo, pyDepoH, slvl, pymaxth, pyCoeff, p
   do k = 1, pylocalNb
     gid = pyGIDs(k)+1
     if(pyBord(gid)>0 .and. pyZ(gid)<slvl)then
-      loop: do p =1,20
-        if(pyNgbs(gid,p)<0) exit loop
-        ngbid = pyNgbs(gid,p)+1
+      loop: do p = pyOffset(gid)+1, pyOffset(gid+1)
+        ngbid = pyNgbs(p)+1
         if(pyBord(ngbid)>0.)then
-          flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+          flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
           if(pyDepoH(gid)>pymaxth .and. pyZ(gid)>pyZ(ngbid))then
             sfrac = 0.
             sed = 0.
@@ -625,7 +585,7 @@ subroutine diffsedmarine(pyZ, pyBord, pyDepo, pyDepoH, slvl, pymaxth, pyCoeff, p
             sfrac = 0.
             sed = 0.
             tsed = 0.
-            flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+            flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
             do r = 1, pyRockNb
               frac = pyDepo(gid,r)/pyDepoH(gid)
               sfrac = sfrac + frac
@@ -647,23 +607,25 @@ subroutine diffsedmarine(pyZ, pyBord, pyDepo, pyDepoH, slvl, pymaxth, pyCoeff, p
 
 end subroutine diffsedmarine
 
-subroutine diffsedhillslope(pyZ, pyBord, difflay, maxlayh, pyCoeff, pyNgbs, pyEdge, pyDist, pyGIDs,  &
-                     sumDiff, ero, depo, pylocalNb, pyglobalNb, pyRockNb)
+subroutine diffsedhillslope(pyZ, pyBord, difflay, maxlayh, pyCoeff, pyOffset, pyNgbs, pyEdge, pyDist, pyGIDs,  &
+                     sumDiff, ero, depo, pylocalNb, pyglobalNb, pyRockNb, pyNnz)
 
   use classfv
   implicit none
 
   integer :: pyglobalNb
   integer :: pylocalNb
+  integer :: pyNnz
   integer :: pyRockNb
   integer,dimension(pylocalNb),intent(in) :: pyGIDs
   integer,dimension(pyglobalNb),intent(in) :: pyBord
-  integer,dimension(pylocalNb,20),intent(in) :: pyNgbs
+  integer,dimension(pyglobalNb+1),intent(in) :: pyOffset
+  integer,dimension(pyNnz),intent(in) :: pyNgbs
 
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyZ
   real(kind=8),dimension(pyglobalNb),intent(in) :: pyCoeff
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyEdge
-  real(kind=8),dimension(pyglobalNb,20),intent(in) :: pyDist
+  real(kind=8),dimension(pyNnz),intent(in) :: pyEdge
+  real(kind=8),dimension(pyNnz),intent(in) :: pyDist
   real(kind=8),dimension(pyglobalNb),intent(in) :: maxlayh
   real(kind=8),dimension(pyglobalNb,pyRockNb),intent(in) :: difflay
 
@@ -681,12 +643,11 @@ subroutine diffsedhillslope(pyZ, pyBord, difflay, maxlayh, pyCoeff, pyNgbs, pyEd
   do k = 1, pylocalNb
   gid = pyGIDs(k)+1
   if(pyBord(gid)>0)then
-    loop: do p =1,20
-      if(pyNgbs(gid,p)<0) exit loop
-      ngbid = pyNgbs(gid,p)+1
+    loop: do p = pyOffset(gid)+1, pyOffset(gid+1)
+      ngbid = pyNgbs(p)+1
       if(pyBord(ngbid)>0.)then
         if(pyZ(gid)>pyZ(ngbid))then
-          flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+          flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
           sfrac = 0.
           sed = 0.
           tsed = 0.
@@ -703,7 +664,7 @@ subroutine diffsedhillslope(pyZ, pyBord, difflay, maxlayh, pyCoeff, pyNgbs, pyEd
             sumDiff(gid) = sumDiff(gid) + tfrac*tsed
           endif
         elseif(pyZ(gid)<pyZ(ngbid))then
-          flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+          flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
           sfrac = 0.
           sed = 0.
           tsed = 0.
@@ -722,7 +683,7 @@ subroutine diffsedhillslope(pyZ, pyBord, difflay, maxlayh, pyCoeff, pyNgbs, pyEd
         endif
       elseif(pyBord(ngbid)<1)then
         if(pyZ(gid)>pyZ(ngbid))then
-          flx = pyEdge(gid,p)*(pyZ(ngbid)-pyZ(gid))/pyDist(gid,p)
+          flx = pyEdge(p)*(pyZ(ngbid)-pyZ(gid))/pyDist(p)
           sfrac = 0.
           sed = 0.
           tsed = 0.
@@ -794,9 +755,110 @@ subroutine slumpero(pyStack, pyRcv, pyXY, pyElev, pySfail, borders,pyEro, pylNod
 
 end subroutine slumpero
 
+subroutine implicitspl(pyStack, pyRcv, pyXY, pyDischarge, pyFillH, pyElev, Cero, actlay, sea, db, dt, &
+pyOffset, pyRate, pylNodesNb, pygNodesNb, pyRockNb, pySegNb)
+
+  use classfv
+  implicit none
+
+  integer :: pylNodesNb
+  integer :: pygNodesNb
+  integer :: pyRockNb
+  integer :: pySegNb
+  real(kind=8),intent(in) :: sea
+  real(kind=8),intent(in) :: db
+  real(kind=8),intent(in) :: dt
+  integer,dimension(pylNodesNb),intent(in) :: pyStack
+  integer,dimension(pygNodesNb),intent(in) :: pyRcv
+  real(kind=8),dimension(pygNodesNb,2),intent(in) :: pyXY
+  real(kind=8),dimension(pygNodesNb),intent(in) :: pyDischarge
+  real(kind=8),dimension(pygNodesNb),intent(in) :: pyFillH
+  real(kind=8),dimension(pygNodesNb),intent(in) :: pyElev
+  real(kind=8),dimension(pygNodesNb,pyRockNb),intent(in) :: Cero
+  real(kind=8),dimension(pygNodesNb,pyRockNb),intent(in) :: actlay
+  integer,dimension(pySegNb+1),intent(in) :: pyOffset
+
+  real(kind=8),dimension(pygNodesNb),intent(out) :: pyRate
+
+  integer :: k, n, r, it, donor, recvr
+  real(kind=8) :: fac, base, dist, totflx, keff, fct, h, h0, f, df
+  real(kind=8),dimension(pygNodesNb) :: newZ
+
+  pyRate = 0.
+  newZ = pyElev
+
+  ! Each stack segment is solved from downstream to upstream, the new elevation of a node only
+  ! depends on the new elevation of its receiver
+  !$omp parallel do schedule(dynamic) private(n, r, it, donor, recvr, fac, base, dist, totflx, keff, fct, h, h0, f, df)
+  do k = 1, pySegNb
+    do n = pyOffset(k) + 1, pyOffset(k+1)
+      donor = pyStack(n) + 1
+      recvr = pyRcv(donor) + 1
+      h0 = pyElev(donor)
+      if(recvr == donor .or. h0 <= sea .or. h0 < db) cycle
+      if(pyFillH(donor) - h0 /= 0.) cycle
+
+      ! Slope reduction and base level used by the explicit scheme
+      if(pyElev(recvr) < sea)then
+        fac = 0.99
+        base = sea
+        if(fac*(h0 - sea) < 0.001) cycle
+      else
+        fac = 0.95
+        base = newZ(recvr)
+        if(fac*(h0 - pyElev(recvr)) < 0.001) cycle
+      endif
+      if(h0 <= base) cycle
+      dist = sqrt( (pyXY(donor,1)-pyXY(recvr,1))**2.0 + (pyXY(donor,2)-pyXY(recvr,2))**2.0 )
+      if(dist <= 0.) cycle
+
+      ! Erodibility averaged over the active layer rock proportions
+      if(pyRockNb > 1)then
+        totflx = 0.
+        do r = 1, pyRockNb
+          totflx = totflx + actlay(donor,r)
+        enddo
+        keff = 0.
+        if(totflx > 0.)then
+          do r = 1, pyRockNb
+            keff = keff + Cero(donor,r) * actlay(donor,r) / totflx
+          enddo
+        endif
+      else
+        keff = Cero(donor,1)
+      endif
+      fct = keff * dt * pyDischarge(donor)**spl_m * (fac/dist)**spl_n
+      if(fct <= 0.) cycle
+
+      ! Solve h - h0 + fct * (h - base)**n = 0
+      if(spl_n == 1.)then
+        h = (h0 + fct * base) / (1. + fct)
+      else
+        h = h0
+        do it = 1, 100
+          f = h - h0 + fct * (h - base)**spl_n
+          df = 1. + spl_n * fct * (h - base)**(spl_n - 1.)
+          h = h - f / df
+          if(h <= base)then
+            h = base + 1.e-6 * (h0 - base)
+          endif
+          if(abs(f / df) < 1.e-6) exit
+        enddo
+      endif
+      newZ(donor) = h
+      pyRate(donor) = (h - h0) / dt
+    enddo
+  enddo
+  !$omp end parallel do
+
+  return
+
+end subroutine implicitspl
+
 subroutine streampower(sedfluxcrit,pyStack, pyRcv, pitID, pitVol1, pitDrain, pyXY, pyArea, pyMaxH, &
 pyMaxD, pyDischarge, pyFillH, pyElev, pyRiv, Cero, actlay, perc_dep, slp_cr, sea, db, dt, &
-borders, pyDepo, pyEro, sedFluxes, slope, pyDensity, pylNodesNb, pygNodesNb, pyRockNb)
+borders, impl, pyRate, pyOffset, pyGroup, pyMember, pyDepo, pyEro, sedFluxes, slope, pyDensity, pylNodesNb, pygNodesNb, &
+pyRockNb, pySegNb, pyGrpNb)
 
   use classfv
   implicit none
@@ -804,6 +866,8 @@ borders, pyDepo, pyEro, sedFluxes, slope, pyDensity, pylNodesNb, pygNodesNb, pyR
   integer :: pylNodesNb
   integer :: pygNodesNb
   integer :: pyRockNb
+  integer :: pySegNb
+  integer :: pyGrpNb
   real(kind=8),intent(in) :: dt
   real(kind=8),intent(in) :: sea
   real(kind=8),intent(in) :: db
@@ -814,6 +878,8 @@ borders, pyDepo, pyEro, sedFluxes, slope, pyDensity, pylNodesNb, pygNodesNb, pyR
   integer,dimension(pygNodesNb),intent(in) :: pyRcv
   integer,dimension(pygNodesNb),intent(in) :: pitID
   integer,dimension(pygNodesNb),intent(in) :: borders
+  integer,intent(in) :: impl
+  real(kind=8),dimension(pygNodesNb),intent(in) :: pyRate
   integer,dimension(pygNodesNb),intent(in) :: pitDrain
   real(kind=8),dimension(pygNodesNb,2),intent(in) :: pyXY
   real(kind=8),dimension(pygNodesNb),intent(in) :: pyArea
@@ -826,6 +892,9 @@ borders, pyDepo, pyEro, sedFluxes, slope, pyDensity, pylNodesNb, pygNodesNb, pyR
   real(kind=8),dimension(pygNodesNb),intent(in) :: pyElev
   real(kind=8),dimension(pygNodesNb,pyRockNb),intent(in) :: pyRiv
   real(kind=8),dimension(pygNodesNb),intent(in) :: pitVol1
+  integer,dimension(pySegNb+1),intent(in) :: pyOffset
+  integer,dimension(pyGrpNb+1),intent(in) :: pyGroup
+  integer,dimension(pySegNb),intent(in) :: pyMember
 
   real(kind=8),dimension(pygNodesNb,pyRockNb),intent(out) :: pyDepo
   real(kind=8),dimension(pygNodesNb,pyRockNb),intent(out) :: pyEro
@@ -833,7 +902,7 @@ borders, pyDepo, pyEro, sedFluxes, slope, pyDensity, pylNodesNb, pygNodesNb, pyR
   real(kind=8),dimension(pygNodesNb),intent(out) :: slope
   real(kind=8),dimension(pygNodesNb),intent(out) :: pyDensity
 
-  integer :: n, donor, recvr, nID, tmpID, r
+  integer :: g, m, k, n, donor, recvr, nID, tmpID, r
   real(kind=8) :: maxh, dh, waterH, fct, Qt, totflx, totspl, newdist,rhosed,rhowat,tauratio
   real(kind=8) :: dist, slp, slpdh, updh, tmpdist, totdist, width, frac, upperslp, bedfrac
   real(kind=8),dimension(pyRockNb) :: SPL, Qs, Qb, frck, erodep, pitDep
@@ -853,440 +922,458 @@ borders, pyDepo, pyEro, sedFluxes, slope, pyDensity, pylNodesNb, pygNodesNb, pyR
   upZ = 1.e6
   updist = 0.
 
-  do n = pylNodesNb, 1, -1
-
-    SPL = 0.
-    donor = pyStack(n) + 1
-    recvr = pyRcv(donor) + 1
-    dh = 0.95*(pyElev(donor) - pyElev(recvr))
-
-    if(pyElev(donor) > sea .and. pyElev(recvr) < sea) dh = 0.99*(pyElev(donor) - sea)
-    if( dh < 0.001 ) dh = 0.
-    waterH = pyFillH(donor)-pyElev(donor)
-    dist = sqrt( (pyXY(donor,1)-pyXY(recvr,1))**2.0 + (pyXY(donor,2)-pyXY(recvr,2))**2.0 )
-
-    ! Compute stream power law
-    slpdh = 0.
-    bedfrac = 0.02
-    totspl = 0
-    totdist = 0.
-    if( recvr /= donor .and. dh > 0.)then
-      ! In case where there is no depression
-      if(waterH == 0. )then
-        totflx=0.
-        do r=1, pyRockNb
-          totflx=totflx+sedFluxes(donor,r)
-        enddo
-        pyDensity(donor) = (totflx/(dt*pyDischarge(donor)))*rhosed+(1-totflx/(dt*pyDischarge(donor)))*rhowat
-        if (pyElev(donor)<=sea ) then
-           if (pyDensity(donor) >= sedfluxcrit) then
-             hypyc(donor) = 1.
-             hypyc(recvr) = 1.
-           endif
-        endif
-        if (pyElev(donor) <= sea .and. hypyc(donor) >=.1 ) then
-           tauratio = (rhosed-rhowat)/rhosed
-        elseif(pyElev(donor) <= sea .and. hypyc(donor)<=0.) then
-           tauratio = 0.
-        else
-           tauratio = 1.
-        endif
-        if( pyElev(donor)<db) tauratio = 0.
-
-        slope(donor) = dh/dist
-        slp = slope(donor)*tauratio
-        ! Check if this is an alluvial plain in which case we force deposition
-        if(updist(donor) > 0. .and. dist > 0. .and. slp_cr > 0.)then
-          updh = upZ(donor) - pyElev(donor)
-          if(maxval(sedFluxes(donor,:)) > 0. .and. updh/updist(donor) < slp_cr .and. slp < slp_cr .and. updh > 0)then
-            slpdh = perc_dep * updh
-            slpdh = min(slpdh,pyMaxD(donor))
-          endif
-        elseif(incisiontype > 0 .and. dist > 0. .and. updist(donor) > 0.)then
-          slpdh = upZ(donor) - pyElev(donor)
-        endif
-
-        if(bedslptype > 0 .and. updist(donor) > 0.)then
-          ! Compute upper slope
-          upperslp = abs(upZ(donor) - pyElev(donor))/updist(donor)
-          ! Find bedload fraction in current node
-          if(upperslp >= 1./sqrt(3.))then
-            bedfrac = 1.
-          elseif(bedslptype == 1)then
-            bedfrac = 0.98 * sqrt(3.) * upperslp + 0.02
-          elseif(bedslptype == 2)then
-            bedfrac = (1. / (1. + abs((upperslp - 0.60965)/0.08)**(1.912)) - 0.0201)*1.181 + 0.02
-          elseif(bedslptype == 3)then
-            bedfrac = (0.8499389 - 1./(1. + abs((upperslp+0.0323)/0.08)**(1.912)))*1.181 + 0.02
-          endif
-        elseif(bedslptype > 0 .and. updist(donor) == 0.)then
-          bedfrac = 0.02
-        elseif(bedslptype == 0)then
-          bedfrac = 1.
-        endif
-
-        ! Compute the stream power law expressed in m/y
-        if(dist > 0.)then
-          SPL = 0.
-          totspl = 0
-
-          ! Get fraction of each rock type present in the active layer
-          totflx = 0.
-          if(pyRockNb>1)then
-            do r = 1, pyRockNb
-              totflx = totflx+actlay(donor,r)
-            enddo
-            frck(1:pyRockNb) = actlay(donor,1:pyRockNb)/totflx
-          else
-            frck(1) = 1.
-          endif
-
-          ! Incision rule types
-          ! Detachment limited
-          if(incisiontype==0 .and. slpdh == 0.)then
-            do r = 1, pyRockNb
-              SPL(r) = -Cero(donor,r) * frck(r) * bedfrac * (pyDischarge(donor))**spl_m * (slp)**spl_n
-              totspl = totspl + SPL(r)
+  ! Catchments linked through their depressions belong to the same group, each group is processed
+  ! by a single thread from upstream to downstream
+  !$omp parallel do schedule(dynamic) &
+  !$omp private(m, k, n, donor, recvr, nID, tmpID, r, maxh, dh, waterH, fct, Qt, totflx, totspl, newdist) &
+  !$omp private(tauratio, dist, slp, slpdh, updh, tmpdist, totdist, width, frac, upperslp, bedfrac) &
+  !$omp private(SPL, Qs, Qb, frck, erodep, pitDep)
+  do g = 1, pyGrpNb
+    do m = pyGroup(g) + 1, pyGroup(g+1)
+      k = pyMember(m) + 1
+      do n = pyOffset(k+1), pyOffset(k) + 1, -1
+
+        SPL = 0.
+        donor = pyStack(n) + 1
+        recvr = pyRcv(donor) + 1
+        dh = 0.95*(pyElev(donor) - pyElev(recvr))
+
+        if(pyElev(donor) > sea .and. pyElev(recvr) < sea) dh = 0.99*(pyElev(donor) - sea)
+        if( dh < 0.001 ) dh = 0.
+        waterH = pyFillH(donor)-pyElev(donor)
+        dist = sqrt( (pyXY(donor,1)-pyXY(recvr,1))**2.0 + (pyXY(donor,2)-pyXY(recvr,2))**2.0 )
+
+        ! Compute stream power law
+        slpdh = 0.
+        bedfrac = 0.02
+        totspl = 0
+        totdist = 0.
+        if( recvr /= donor .and. dh > 0.)then
+          ! In case where there is no depression
+          if(waterH == 0. )then
+            totflx=0.
+            do r=1, pyRockNb
+              totflx=totflx+sedFluxes(donor,r)
             enddo
-            if(-totspl*dt>dh)then
-              if(dh==0.)then
-                SPL = 0.
-                totspl = 0.
-              else
-                frac = dh/(-totspl*dt)
-                SPL = SPL*frac
-                totspl = -dh
-              endif
+            pyDensity(donor) = (totflx/(dt*pyDischarge(donor)))*rhosed+(1-totflx/(dt*pyDischarge(donor)))*rhowat
+            if (pyElev(donor)<=sea ) then
+               if (pyDensity(donor) >= sedfluxcrit) then
+                 hypyc(donor) = 1.
+                 hypyc(recvr) = 1.
+               endif
             endif
-            if(pyElev(donor)<db)then
-              SPL = 0.
-              totspl = 0.
-            endif
-
-          ! Generalised undercapacity model (linear sedflux dependency)
-          elseif(incisiontype==1)then
-            Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
-            totflx = 0.
-            do r = 1, pyRockNb
-              if(bedslptype > 0)then
-                totflx = totflx + bedFluxes(donor,r)
-              else
-                totflx = totflx + sedFluxes(donor,r)
-              endif
-            enddo
-            if(Qt>0.)then
-              fct = 1. - totflx/Qt
-              if(fct<0.) fct = 0.
-              if(fct>1.) fct = 1.
+            if (pyElev(donor) <= sea .and. hypyc(donor) >=.1 ) then
+               tauratio = (rhosed-rhowat)/rhosed
+            elseif(pyElev(donor) <= sea .and. hypyc(donor)<=0.) then
+               tauratio = 0.
             else
-              fct = 0.
+               tauratio = 1.
             endif
-            do r = 1, pyRockNb
-              SPL(r) = -Cero(donor,r) * frck(r) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
-              totspl = totspl + SPL(r)
-            enddo
-            if(-totspl*dt>dh)then
-              if(dh==0.)then
-                SPL = 0.
-                totspl = 0.
-              else
-                frac = dh/(-totspl*dt)
-                SPL = SPL*frac
-                totspl = -dh
+            if( pyElev(donor)<db) tauratio = 0.
+
+            slope(donor) = dh/dist
+            slp = slope(donor)*tauratio
+            ! Check if this is an alluvial plain in which case we force deposition
+            if(updist(donor) > 0. .and. dist > 0. .and. slp_cr > 0.)then
+              updh = upZ(donor) - pyElev(donor)
+              if(maxval(sedFluxes(donor,:)) > 0. .and. updh/updist(donor) < slp_cr .and. slp < slp_cr .and. updh > 0)then
+                slpdh = perc_dep * updh
+                slpdh = min(slpdh,pyMaxD(donor))
               endif
+            elseif(incisiontype > 0 .and. dist > 0. .and. updist(donor) > 0.)then
+              slpdh = upZ(donor) - pyElev(donor)
             endif
 
-          ! Almost parabolic sedflux dependency
-          elseif(incisiontype==2)then
-            Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
-            totflx = 0.
-            do r = 1, pyRockNb
-              if(bedslptype > 0)then
-                totflx = totflx + bedFluxes(donor,r)
-              else
-                totflx = totflx + sedFluxes(donor,r)
+            if(bedslptype > 0 .and. updist(donor) > 0.)then
+              ! Compute upper slope
+              upperslp = abs(upZ(donor) - pyElev(donor))/updist(donor)
+              ! Find bedload fraction in current node
+              if(upperslp >= 1./sqrt(3.))then
+                bedfrac = 1.
+              elseif(bedslptype == 1)then
+                bedfrac = 0.98 * sqrt(3.) * upperslp + 0.02
+              elseif(bedslptype == 2)then
+                bedfrac = (1. / (1. + abs((upperslp - 0.60965)/0.08)**(1.912)) - 0.0201)*1.181 + 0.02
+              elseif(bedslptype == 3)then
+                bedfrac = (0.8499389 - 1./(1. + abs((upperslp+0.0323)/0.08)**(1.912)))*1.181 + 0.02
               endif
-            enddo
-            if(Qt>0.)then
-              frac = totflx/Qt
-              if(frac<0.1)then
-                fct = 2.6*frac + 0.1
-              else
-                fct = 1. - 4*(frac-0.5)**2.
-              endif
-              if(fct<0.) fct = 0.
-              if(fct>1.) fct = 1.
-            else
-              fct = 0.
+            elseif(bedslptype > 0 .and. updist(donor) == 0.)then
+              bedfrac = 0.02
+            elseif(bedslptype == 0)then
+              bedfrac = 1.
             endif
-            do r = 1, pyRockNb
-              SPL(r) = -Cero(donor,r) * frck(r) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
-              totspl = totspl + SPL(r)
-            enddo
-            if(-totspl*dt>dh)then
-              if(dh==0.)then
-                SPL = 0.
-                totspl = 0.
+
+            ! Compute the stream power law expressed in m/y
+            if(dist > 0.)then
+              SPL = 0.
+              totspl = 0
+
+              ! Get fraction of each rock type present in the active layer
+              totflx = 0.
+              if(pyRockNb>1)then
+                do r = 1, pyRockNb
+                  totflx = totflx+actlay(donor,r)
+                enddo
+                frck(1:pyRockNb) = actlay(donor,1:pyRockNb)/totflx
               else
-                frac = dh/(-totspl*dt)
-                SPL = SPL*frac
-                totspl = -dh
+                frck(1) = 1.
+              endif
+
+              ! Incision rule types
+              ! Detachment limited
+              if(incisiontype==0 .and. slpdh == 0.)then
+                do r = 1, pyRockNb
+                  SPL(r) = -Cero(donor,r) * frck(r) * bedfrac * (pyDischarge(donor))**spl_m * (slp)**spl_n
+                  totspl = totspl + SPL(r)
+                enddo
+                ! Implicit solution shared between rock types based on their erodibility
+                if(impl > 0 .and. pyElev(donor) > sea)then
+                  if(totspl < 0.)then
+                    SPL = SPL * pyRate(donor) / totspl
+                    totspl = pyRate(donor)
+                  endif
+                elseif(-totspl*dt>dh)then
+                  if(dh==0.)then
+                    SPL = 0.
+                    totspl = 0.
+                  else
+                    frac = dh/(-totspl*dt)
+                    SPL = SPL*frac
+                    totspl = -dh
+                  endif
+                endif
+                if(pyElev(donor)<db)then
+                  SPL = 0.
+                  totspl = 0.
+                endif
+
+              ! Generalised undercapacity model (linear sedflux dependency)
+              elseif(incisiontype==1)then
+                Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
+                totflx = 0.
+                do r = 1, pyRockNb
+                  if(bedslptype > 0)then
+                    totflx = totflx + bedFluxes(donor,r)
+                  else
+                    totflx = totflx + sedFluxes(donor,r)
+                  endif
+                enddo
+                if(Qt>0.)then
+                  fct = 1. - totflx/Qt
+                  if(fct<0.) fct = 0.
+                  if(fct>1.) fct = 1.
+                else
+                  fct = 0.
+                endif
+                do r = 1, pyRockNb
+                  SPL(r) = -Cero(donor,r) * frck(r) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
+                  totspl = totspl + SPL(r)
+                enddo
+                if(-totspl*dt>dh)then
+                  if(dh==0.)then
+                    SPL = 0.
+                    totspl = 0.
+                  else
+                    frac = dh/(-totspl*dt)
+                    SPL = SPL*frac
+                    totspl = -dh
+                  endif
+                endif
+
+              ! Almost parabolic sedflux dependency
+              elseif(incisiontype==2)then
+                Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
+                totflx = 0.
+                do r = 1, pyRockNb
+                  if(bedslptype > 0)then
+                    totflx = totflx + bedFluxes(donor,r)
+                  else
+                    totflx = totflx + sedFluxes(donor,r)
+                  endif
+                enddo
+                if(Qt>0.)then
+                  frac = totflx/Qt
+                  if(frac<0.1)then
+                    fct = 2.6*frac + 0.1
+                  else
+                    fct = 1. - 4*(frac-0.5)**2.
+                  endif
+                  if(fct<0.) fct = 0.
+                  if(fct>1.) fct = 1.
+                else
+                  fct = 0.
+                endif
+                do r = 1, pyRockNb
+                  SPL(r) = -Cero(donor,r) * frck(r) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
+                  totspl = totspl + SPL(r)
+                enddo
+                if(-totspl*dt>dh)then
+                  if(dh==0.)then
+                    SPL = 0.
+                    totspl = 0.
+                  else
+                    frac = dh/(-totspl*dt)
+                    SPL = SPL*frac
+                    totspl = -dh
+                  endif
+                endif
+
+              ! Almost parabolic sedflux dependency
+              elseif(incisiontype==3)then
+                Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
+                totflx = 0.
+                do r = 1, pyRockNb
+                  if(bedslptype > 0)then
+                    totflx = totflx + bedFluxes(donor,r)
+                  else
+                    totflx = totflx + sedFluxes(donor,r)
+                  endif
+                enddo
+                if(Qt>0.)then
+                  frac = totflx/Qt
+                  if(frac<0.35)then
+                    fct = exp(-(frac - 0.35)**2/(0.22)**2)
+                  else
+                    fct = exp(-(frac - 0.35)**2/(0.6)**2)
+                  endif
+                  if(fct<0.) fct = 0.
+                  if(fct>1.) fct = 1.
+                else
+                  fct = 0.
+                endif
+                do r = 1, pyRockNb
+                  SPL(r) = -Cero(donor,r) * frck(r) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
+                  totspl = totspl + SPL(r)
+                enddo
+                if(-totspl*dt>dh)then
+                  if(dh==0.)then
+                    SPL = 0.
+                    totspl = 0.
+                  else
+                    frac = dh/(-totspl*dt)
+                    SPL = SPL*frac
+                    totspl = -dh
+                  endif
+                endif
+
+              ! Saltation abrasion incision model
+              elseif(incisiontype==4)then
+                Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
+                totflx = 0.
+                do r = 1, pyRockNb
+                  if(bedslptype > 0)then
+                    totflx = totflx + bedFluxes(donor,r)
+                  else
+                    totflx = totflx + sedFluxes(donor,r)
+                  endif
+                enddo
+                if(Qt>0.)then
+                  fct = 1. - totflx/Qt
+                  if(fct<0.) fct = 0.
+                  if(fct>1.) fct = 1.
+                else
+                  fct = 0.
+                endif
+                ! Channel width
+                width = width_kw * (pyDischarge(donor))**width_b
+                if(width>0)then
+                  do r = 1, pyRockNb
+                    SPL(r) = -Cero(donor,r) * frck(r) * totflx/(dt * width) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
+                    totspl = totspl + SPL(r)
+                  enddo
+                else
+                  SPL = 0.
+                endif
               endif
             endif
+          endif
+        endif
 
-          ! Almost parabolic sedflux dependency
-          elseif(incisiontype==3)then
-            Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
-            totflx = 0.
+        maxh = pyMaxH(donor)
+        if(waterH > 0.)then
+          maxh = waterH
+        elseif(pyElev(donor) < sea)then
+          maxh = sea - pyElev(donor)
+        elseif(slpdh > 0. .and. slp_cr > 0.)then
+          maxh = slpdh
+        elseif(slpdh > 0. .and. incisiontype > 0)then
+          maxh = slpdh
+        endif
+        maxh = 0.95*maxh
+
+        Qs = 0.
+        if(bedslptype > 0) Qb = 0.
+        erodep = 0.
+        pitDep = 0.
+        ! Erosion case
+        if(totspl < 0.)then
+          ! Sediment volume [m3]
+          ! Limit erosion based on active layer rock proportion
+          if(pyRockNb>1)then
             do r = 1, pyRockNb
-              if(bedslptype > 0)then
-                totflx = totflx + bedFluxes(donor,r)
+              if(-SPL(r)*dt>actlay(donor,r))then
+                erodep(r) = -actlay(donor,r) * pyArea(donor)
               else
-                totflx = totflx + sedFluxes(donor,r)
+                erodep(r) = SPL(r) * dt * pyArea(donor)
               endif
+              Qs(r) = -erodep(r) + sedFluxes(donor,r)
+              if(bedslptype > 0) Qb(r) = -erodep(r)*bedfrac + bedFluxes(donor,r)
             enddo
-            if(Qt>0.)then
-              frac = totflx/Qt
-              if(frac<0.35)then
-                fct = exp(-(frac - 0.35)**2/(0.22)**2)
-              else
-                fct = exp(-(frac - 0.35)**2/(0.6)**2)
-              endif
-              if(fct<0.) fct = 0.
-              if(fct>1.) fct = 1.
-            else
-              fct = 0.
-            endif
+          else
+            erodep(1) = SPL(1) * dt * pyArea(donor)
+            Qs(1) = -erodep(1) + sedFluxes(donor,1)
+            if(bedslptype > 0) Qb(1) = -erodep(1)*bedfrac + bedFluxes(donor,1)
+          endif
+
+        ! Deposition case
+        elseif( totspl >= 0. .and. pyArea(donor) > 0.)then
+          ! Fill depression
+          if(waterH > 0. )then
+            Qs = 0.
+            if(bedslptype > 0) Qb = 0.
+            erodep = 0.
+            totdist = 0.
             do r = 1, pyRockNb
-              SPL(r) = -Cero(donor,r) * frck(r) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
-              totspl = totspl + SPL(r)
+              pitDep(r) = sedFluxes(donor,r)
+              totdist = totdist + pitDep(r)
             enddo
-            if(-totspl*dt>dh)then
-              if(dh==0.)then
-                SPL = 0.
-                totspl = 0.
-              else
-                frac = dh/(-totspl*dt)
-                SPL = SPL*frac
-                totspl = -dh
-              endif
-            endif
 
-          ! Saltation abrasion incision model
-          elseif(incisiontype==4)then
-            Qt = sed_kt * (pyDischarge(donor))**sed_mt * (slp)**sed_nt
+          ! Marine deposit
+          ! if hypopycnal flow
+          elseif(pyElev(donor) <= sea .and. hypyc(donor) <= 0.)then
+            ! Add all sediment to the node
+            do r = 1, pyRockNb
+              erodep(r) = sedFluxes(donor,r)
+            enddo
+            Qs = 0.
+            if(bedslptype > 0) Qb = 0.
+          ! Alluvial plain deposit
+          !elseif(maxh > 0. .and. waterH == 0. .and. donor /= recvr .and. pyElev(donor) > sea)then
+          elseif(maxh > 0. .and. waterH == 0. .and. donor /= recvr )then
             totflx = 0.
             do r = 1, pyRockNb
-              if(bedslptype > 0)then
-                totflx = totflx + bedFluxes(donor,r)
-              else
-                totflx = totflx + sedFluxes(donor,r)
-              endif
+              totflx = totflx+sedFluxes(donor,r)
             enddo
-            if(Qt>0.)then
-              fct = 1. - totflx/Qt
-              if(fct<0.) fct = 0.
-              if(fct>1.) fct = 1.
-            else
-              fct = 0.
-            endif
-            ! Channel width
-            width = width_kw * (pyDischarge(donor))**width_b
-            if(width>0)then
+            if(totflx/pyArea(donor) < maxh)then
               do r = 1, pyRockNb
-                SPL(r) = -Cero(donor,r) * frck(r) * totflx/(dt * width) * fct * (pyDischarge(donor))**spl_m * (slp)**spl_n
-                totspl = totspl + SPL(r)
+                erodep(r) = sedFluxes(donor,r)
               enddo
+              Qs = 0.
+              if(bedslptype > 0) Qb = 0.
             else
-              SPL = 0.
+              do r = 1, pyRockNb
+                frac =  sedFluxes(donor,r)/totflx
+                erodep(r) = frac*maxh*pyArea(donor)
+                Qs(r) = sedFluxes(donor,r) - erodep(r)
+                if(bedslptype > 0) Qb(r) = max(0.,bedFluxes(donor,r) - erodep(r))
+              enddo
             endif
-          endif
-        endif
-      endif
-    endif
 
-    maxh = pyMaxH(donor)
-    if(waterH > 0.)then
-      maxh = waterH
-    elseif(pyElev(donor) < sea)then
-      maxh = sea - pyElev(donor)
-    elseif(slpdh > 0. .and. slp_cr > 0.)then
-      maxh = slpdh
-    elseif(slpdh > 0. .and. incisiontype > 0)then
-      maxh = slpdh
-    endif
-    maxh = 0.95*maxh
-
-    Qs = 0.
-    if(bedslptype > 0) Qb = 0.
-    erodep = 0.
-    pitDep = 0.
-    ! Erosion case
-    if(totspl < 0.)then
-      ! Sediment volume [m3]
-      ! Limit erosion based on active layer rock proportion
-      if(pyRockNb>1)then
-        do r = 1, pyRockNb
-          if(-SPL(r)*dt>actlay(donor,r))then
-            erodep(r) = -actlay(donor,r) * pyArea(donor)
+          ! Base-level (sink)
+          elseif(donor == recvr .and. pyArea(donor) > 0.)then
+            do r = 1, pyRockNb
+              erodep(r) = sedFluxes(donor,r)
+            enddo
+            Qs = 0.
+            if(bedslptype > 0) Qb = 0.
           else
-            erodep(r) = SPL(r) * dt * pyArea(donor)
+            erodep = 0.
+            do r = 1, pyRockNb
+              Qs(r) = sedFluxes(donor,r)
+              if(bedslptype > 0) Qb(r) = bedFluxes(donor,r)
+            enddo
           endif
-          Qs(r) = -erodep(r) + sedFluxes(donor,r)
-          if(bedslptype > 0) Qb(r) = -erodep(r)*bedfrac + bedFluxes(donor,r)
-        enddo
-      else
-        erodep(1) = SPL(1) * dt * pyArea(donor)
-        Qs(1) = -erodep(1) + sedFluxes(donor,1)
-        if(bedslptype > 0) Qb(1) = -erodep(1)*bedfrac + bedFluxes(donor,1)
-      endif
-
-    ! Deposition case
-    elseif( totspl >= 0. .and. pyArea(donor) > 0.)then
-      ! Fill depression
-      if(waterH > 0. )then
-        Qs = 0.
-        if(bedslptype > 0) Qb = 0.
-        erodep = 0.
-        totdist = 0.
-        do r = 1, pyRockNb
-          pitDep(r) = sedFluxes(donor,r)
-          totdist = totdist + pitDep(r)
-        enddo
+        endif
 
-      ! Marine deposit
-      ! if hypopycnal flow
-      elseif(pyElev(donor) <= sea .and. hypyc(donor) <= 0.)then
-        ! Add all sediment to the node
-        do r = 1, pyRockNb
-          erodep(r) = sedFluxes(donor,r)
-        enddo
-        Qs = 0.
-        if(bedslptype > 0) Qb = 0.
-      ! Alluvial plain deposit
-      !elseif(maxh > 0. .and. waterH == 0. .and. donor /= recvr .and. pyElev(donor) > sea)then
-      elseif(maxh > 0. .and. waterH == 0. .and. donor /= recvr )then
-        totflx = 0.
-        do r = 1, pyRockNb
-          totflx = totflx+sedFluxes(donor,r)
-        enddo
-        if(totflx/pyArea(donor) < maxh)then
-          do r = 1, pyRockNb
-            erodep(r) = sedFluxes(donor,r)
-          enddo
-          Qs = 0.
-          if(bedslptype > 0) Qb = 0.
-        else
+        ! Update sediment volume in receiver node
+        if(maxval(pitDep)==0.)then
           do r = 1, pyRockNb
-            frac =  sedFluxes(donor,r)/totflx
-            erodep(r) = frac*maxh*pyArea(donor)
-            Qs(r) = sedFluxes(donor,r) - erodep(r)
-            if(bedslptype > 0) Qb(r) = max(0.,bedFluxes(donor,r) - erodep(r))
+            sedFluxes(recvr,r) = sedFluxes(recvr,r) + Qs(r)
+            if(bedslptype > 0) bedFluxes(recvr,r) = bedFluxes(recvr,r) + Qb(r)
+            if(erodep(r)<0.)then
+              pyEro(donor,r) = pyEro(donor,r) + erodep(r)
+            else
+              pyDepo(donor,r) = pyDepo(donor,r) + erodep(r)
+            endif
           enddo
-        endif
 
-      ! Base-level (sink)
-      elseif(donor == recvr .and. pyArea(donor) > 0.)then
-        do r = 1, pyRockNb
-          erodep(r) = sedFluxes(donor,r)
-        enddo
-        Qs = 0.
-        if(bedslptype > 0) Qb = 0.
-      else
-        erodep = 0.
-        do r = 1, pyRockNb
-          Qs(r) = sedFluxes(donor,r)
-          if(bedslptype > 0) Qb(r) = bedFluxes(donor,r)
-        enddo
-      endif
-    endif
-
-    ! Update sediment volume in receiver node
-    if(maxval(pitDep)==0.)then
-      do r = 1, pyRockNb
-        sedFluxes(recvr,r) = sedFluxes(recvr,r) + Qs(r)
-        if(bedslptype > 0) bedFluxes(recvr,r) = bedFluxes(recvr,r) + Qb(r)
-        if(erodep(r)<0.)then
-          pyEro(donor,r) = pyEro(donor,r) + erodep(r)
-        else
-          pyDepo(donor,r) = pyDepo(donor,r) + erodep(r)
-        endif
-      enddo
-
-    ! In case we fill a depression
-    elseif(maxval(pitDep)>0. .and. pyArea(pitID(donor)+1)>0.)then
-      ! Perform distribution
-      tmpID = pitID(donor) + 1
-
-      do while(totdist > 0.)
-        ! Get the volume already deposited on the considered node
-        tmpdist = 0.
-        do r = 1, pyRockNb
-          tmpdist = tmpdist + pyDepo(tmpID,r)
-        enddo
+        ! In case we fill a depression
+        elseif(maxval(pitDep)>0. .and. pyArea(pitID(donor)+1)>0.)then
+          ! Perform distribution
+          tmpID = pitID(donor) + 1
 
-        ! In case the depression is underwater
-        if(pyfillH(tmpID)<sea)then
-          if(pyElev(donor)<sea)then
+          do while(totdist > 0.)
+            ! Get the volume already deposited on the considered node
+            tmpdist = 0.
             do r = 1, pyRockNb
-              pyDepo(donor,r) = pyDepo(donor,r) + pitDep(r)
+              tmpdist = tmpdist + pyDepo(tmpID,r)
             enddo
-            totdist = 0.
-          else
-            do r = 1, pyRockNb
-              sedFluxes(recvr,r) = sedFluxes(recvr,r) + pitDep(r)
-            enddo
-            totdist = 0.
-          endif
-          nID = recvr
 
-        ! In case the depression is not filled
-        elseif(tmpdist+totdist<=pitVol(tmpID))then
-          do r = 1, pyRockNb
-            pyDepo(tmpID,r) = pyDepo(tmpID,r) + pitDep(r)
-          enddo
-          totdist = 0.
-          nID = tmpID
+            ! In case the depression is underwater
+            if(pyfillH(tmpID)<sea)then
+              if(pyElev(donor)<sea)then
+                do r = 1, pyRockNb
+                  pyDepo(donor,r) = pyDepo(donor,r) + pitDep(r)
+                enddo
+                totdist = 0.
+              else
+                do r = 1, pyRockNb
+                  sedFluxes(recvr,r) = sedFluxes(recvr,r) + pitDep(r)
+                enddo
+                totdist = 0.
+              endif
+              nID = recvr
 
-        ! In case this is an internally drained depression
-        elseif(pitDrain(tmpID)+1==tmpID)then
-          do r = 1, pyRockNb
-            pyDepo(tmpID,r) = pyDepo(tmpID,r) + pitDep(r)
-          enddo
-          totdist = 0.
-          nID = tmpID
+            ! In case the depression is not filled
+            elseif(tmpdist+totdist<=pitVol(tmpID))then
+              do r = 1, pyRockNb
+                pyDepo(tmpID,r) = pyDepo(tmpID,r) + pitDep(r)
+              enddo
+              totdist = 0.
+              nID = tmpID
 
-        ! Otherwise get the amount to distibute towards draining basins
-        else
-          if(borders(tmpID) == 0)then
-             totdist = 0.
-             nID = tmpID
-          elseif(tmpdist == pitVol(tmpID))then
-             nID = tmpID
-          else
-             newdist = 0.
-             totflx = 0.
-             do r = 1, pyRockNb
-               frac = pitDep(r)/totdist
-               pyDepo(tmpID,r) = pyDepo(tmpID,r) + (pitVol(tmpID) - tmpdist)*frac
-               pitDep(r) = (totdist - (pitVol(tmpID) - tmpdist))*frac
-               newdist = newdist + pitDep(r)
-               totflx = totflx + pyDepo(tmpID,r)
-             enddo
-             totdist = newdist
-             pitVol(tmpID) = totflx
-             nID = tmpID
-          endif
+            ! In case this is an internally drained depression
+            elseif(pitDrain(tmpID)+1==tmpID)then
+              do r = 1, pyRockNb
+                pyDepo(tmpID,r) = pyDepo(tmpID,r) + pitDep(r)
+              enddo
+              totdist = 0.
+              nID = tmpID
+
+            ! Otherwise get the amount to distibute towards draining basins
+            else
+              if(borders(tmpID) == 0)then
+                 totdist = 0.
+                 nID = tmpID
+              elseif(tmpdist == pitVol(tmpID))then
+                 nID = tmpID
+              else
+                 newdist = 0.
+                 totflx = 0.
+                 do r = 1, pyRockNb
+                   frac = pitDep(r)/totdist
+                   pyDepo(tmpID,r) = pyDepo(tmpID,r) + (pitVol(tmpID) - tmpdist)*frac
+                   pitDep(r) = (totdist - (pitVol(tmpID) - tmpdist))*frac
+                   newdist = newdist + pitDep(r)
+                   totflx = totflx + pyDepo(tmpID,r)
+                 enddo
+                 totdist = newdist
+                 pitVol(tmpID) = totflx
+                 nID = tmpID
+              endif
+            endif
+            tmpID = pitDrain(nID) + 1
+          enddo
         endif
-        tmpID = pitDrain(nID) + 1
-      enddo
-    endif
 
-    ! For alluvial deposition
-    upZ(recvr) = min(pyElev(donor),upZ(recvr))
-    if(upZ(recvr)==pyElev(donor)) updist(recvr) = dist
+        ! For alluvial deposition
+        upZ(recvr) = min(pyElev(donor),upZ(recvr))
+        if(upZ(recvr)==pyElev(donor)) updist(recvr) = dist
 
+      enddo
+    enddo
   enddo
+  !$omp end parallel do
 
   return
 
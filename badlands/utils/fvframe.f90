@@ -9,11 +9,13 @@
 
 
 
-subroutine definetin( coords, cells_nodes, cells_edges, edges_nodes, &
-                      circumcenter, ngbid, vor_edges, edge_length, maxngbhs, n, nb, m)
+subroutine definecsr( coords, cells_nodes, cells_edges, edges_nodes, circumcenter, &
+                      ngboffset, ngbid, vor_edges, edge_length, maxngbhs, n, nb, m)
 !*****************************************************************************
 ! Compute for a specific triangulation the characteristics of each node and
-! associated voronoi for finite volume discretizations
+! associated voronoi for finite volume discretizations in compressed sparse
+! row format: the neighbours of node k are stored in ngbid(ngboffset(k)+1:ngboffset(k+1))
+! ordered by edge ID, without limiting the number of neighbours
 
   implicit none
 
@@ -25,136 +27,73 @@ subroutine definetin( coords, cells_nodes, cells_edges, edges_nodes, &
   real( kind=8 ), intent(in) :: coords(nb,3)
   real( kind=8 ), intent(in) :: circumcenter(3,n)
 
-
-  integer, intent(out) :: ngbid(nb, 20)
-  real( kind=8 ), intent(out) :: edge_length(nb, 20)
-  real( kind=8 ), intent(out) :: vor_edges(nb, 20)
+  integer, intent(out) :: ngboffset(nb+1)
+  integer, intent(out) :: ngbid(2*m)
+  real( kind=8 ), intent(out) :: edge_length(2*m)
+  real( kind=8 ), intent(out) :: vor_edges(2*m)
   integer, intent(out) :: maxNgbhs
 
+  integer :: i, k, e, p, n1, n2, nid(2)
   integer :: fvnnb(nb)
-  integer :: i, n1, n2, k, l, p, eid, cid, e, id
-  integer :: nid(2), nc(3), edge(nb, 8)
-  integer :: edgeNb(3), edges(3,2), cell_ids(nb, 20)
 
-  real( kind=8 ) :: coords0(3), coordsID(3)
   real( kind=8 ) :: midpoint(3), dist
 
-  logical :: inside
-
-  cell_ids = -1
-  edge = -1
-  fvnnb = 0
   ngbid = -1
   edge_length = 0.
   vor_edges = 0.
-  maxNgbhs = 0
 
-  ! Find all cells surrounding a given vertice
-  do i = 1, n
-    nc = cells_nodes(i,1:3)+1
-    do p = 1, 3
-      inside = .False.
-      lp: do k = 1, 8
-        if( cell_ids(nc(p),k) == i-1 )then
-          exit lp
-        elseif( cell_ids(nc(p),k) == -1 )then
-          inside = .True.
-          exit lp
-        endif
-      enddo lp
-      if( inside )then
-        cell_ids(nc(p),k)  = i-1
-      endif
-    enddo
-  enddo
-
-  ! Find all edges connected to a given vertice
+  ! Number of edges connected to a given vertice
+  fvnnb = 0
   do i = 1, m
     n1 = edges_nodes(i,1)+1
     n2 = edges_nodes(i,2)+1
-    inside = .False.
-    lp0: do k = 1, 8
-      if(edge(n1,k) == i-1)then
-        exit lp0
-      elseif(edge(n1,k) == -1)then
-        inside = .True.
-        exit lp0
-      endif
-    enddo lp0
-    if( inside )then
-      edge(n1,k)  = i-1
-      fvnnb(n1) = fvnnb(n1) + 1
-      maxNgbhs = max(maxNgbhs,fvnnb(n1))
-    endif
-    inside = .False.
-    lp1: do k = 1, 8
-      if(edge(n2,k) == i-1)then
-        exit lp1
-      elseif(edge(n2,k) == -1)then
-        inside = .True.
-        exit lp1
-      endif
-    enddo lp1
-    if( inside )then
-      edge(n2,k)  = i-1
-      fvnnb(n2) = fvnnb(n2) + 1
-      maxNgbhs = max(maxNgbhs,fvnnb(n2))
-    endif
+    fvnnb(n1) = fvnnb(n1) + 1
+    fvnnb(n2) = fvnnb(n2) + 1
   enddo
+  maxNgbhs = maxval(fvnnb)
 
+  ngboffset(1) = 0
   do k = 1, nb
-    ! Get triangulation edge lengths
-    coords0 = coords(k,1:3)
-    l = 0
-    do eid = 1, fvnnb(k)
-      nid = edges_nodes(edge(k,eid)+1,1:2)
-      if( nid(1) == k-1)then
-        l = l + 1
-        ngbid(k,l) = nid(2)
-        coordsID = coords(nid(2)+1,1:3)
-      else
-        l = l + 1
-        ngbid(k,l) = nid(1)
-        coordsID = coords(nid(1)+1,1:3)
-      endif
-      call euclid( coords0, coordsID, edge_length(k,l) )
-    enddo
+    ngboffset(k+1) = ngboffset(k) + fvnnb(k)
+  enddo
 
-    ! Get voronoi edge lengths
-    lp2: do cid = 1, 20
-      if( cell_ids(k,cid) == -1 ) exit lp2
-      edgeNb(1:3) = cells_edges( cell_ids(k,cid)+1,1:3 )
-      do e = 1, 3
-        edges(e,1:2) = edges_nodes(edgeNb(e)+1,1:2)
-        if( k-1 == edges(e,1) .or. k-1 == edges(e,2))then
-          midpoint(1:3) = 0.5 * (coords(edges(e,1)+1,1:3)+coords(edges(e,2)+1,1:3))
-          id = -1
-          if( edges(e,1) == k-1 )then
-            lp3: do i = 1, fvnnb(k)
-              if(ngbid(k,i) == edges(e,2))then
-                id = i
-                exit lp3
-              endif
-            enddo lp3
-          else
-            lp4: do i = 1, fvnnb(k)
-              if(ngbid(k,i) == edges(e,1))then
-                id = i
-                exit lp4
-              endif
-            enddo lp4
-          endif
-          if( id > -1)then
-            call euclid( midpoint(1:3), circumcenter(1:3,cell_ids(k,cid)+1),  dist)
-            vor_edges(k,id) = vor_edges(k,id) + dist
-          endif
+  ! Get triangulation edge lengths, neighbours are ordered by edge ID
+  fvnnb = 0
+  do i = 1, m
+    n1 = edges_nodes(i,1)+1
+    n2 = edges_nodes(i,2)+1
+    fvnnb(n1) = fvnnb(n1) + 1
+    p = ngboffset(n1) + fvnnb(n1)
+    ngbid(p) = n2 - 1
+    call euclid( coords(n1,1:3), coords(n2,1:3), edge_length(p) )
+    fvnnb(n2) = fvnnb(n2) + 1
+    p = ngboffset(n2) + fvnnb(n2)
+    ngbid(p) = n1 - 1
+    call euclid( coords(n2,1:3), coords(n1,1:3), edge_length(p) )
+  enddo
+
+  ! Get voronoi edge lengths
+  do i = 1, n
+    do e = 1, 3
+      nid = edges_nodes(cells_edges(i,e)+1,1:2)
+      midpoint(1:3) = 0.5 * (coords(nid(1)+1,1:3)+coords(nid(2)+1,1:3))
+      call euclid( midpoint(1:3), circumcenter(1:3,i),  dist)
+      do p = ngboffset(nid(1)+1)+1, ngboffset(nid(1)+2)
+        if(ngbid(p) == nid(2))then
+          vor_edges(p) = vor_edges(p) + dist
+          exit
         endif
       enddo
-    enddo lp2
-
+      do p = ngboffset(nid(2)+1)+1, ngboffset(nid(2)+2)
+        if(ngbid(p) == nid(1))then
+          vor_edges(p) = vor_edges(p) + dist
+          exit
+        endif
+      enddo
+    enddo
   enddo
 
-end subroutine definetin
+end subroutine definecsr
 
 subroutine euclid( p1, p2, norm)
 !*****************************************************************************
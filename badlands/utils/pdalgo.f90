@@ -25,7 +25,7 @@ subroutine marine_distribution(elevation, seavol, sealevel, border, depIDs, pySl
 
   real(kind=8),dimension(pydnodes) :: elev, seadep, newelev
 
-  integer :: it, s, m, n, p, k, pid, nid, id, nup, ndown, ngbh(20)
+  integer :: it, s, m, n, p, k, pid, nid, id, nup
   real(kind=8) :: dh, vol, minz, maxz, dprop
 
   dnodes = pydnodes
@@ -46,9 +46,8 @@ subroutine marine_distribution(elevation, seavol, sealevel, border, depIDs, pySl
               exit sfd_loop
             endif
             maxz = -1.e8
-            loop0: do p = 1, 20
-              if( neighbours(id,p) < 0 ) exit loop0
-              if(maxz<elev(neighbours(id,p)+1)) maxz = elev(neighbours(id,p)+1)
+            loop0: do p = ngbOffset(id)+1, ngbOffset(id+1)
+              if(maxz<elev(neighbours(p)+1)) maxz = elev(neighbours(p)+1)
             enddo loop0
             if(maxz>sealevel) maxz = sealevel
             if(maxz<elev(id)) maxz = elev(id)
@@ -81,19 +80,15 @@ subroutine marine_distribution(elevation, seavol, sealevel, border, depIDs, pySl
               minz = elev(id)
               nid = 0
               nup = 0
-              ndown = 0
               maxz = -1.e8
-              loop: do p = 1, 20
-                if( neighbours(id,p) < 0 ) exit loop
-                ndown = ndown + 1
-                ngbh(ndown) = neighbours(id,p)+1
-                if(minz>elev(neighbours(id,p)+1))then
-                  nid = neighbours(id,p)+1
+              loop: do p = ngbOffset(id)+1, ngbOffset(id+1)
+                if(minz>elev(neighbours(p)+1))then
+                  nid = neighbours(p)+1
                   minz = elev(nid)
                 endif
-                if(maxz<elev(neighbours(id,p)+1))then
-                  maxz = elev(neighbours(id,p)+1)
-                  nup = neighbours(id,p)+1
+                if(maxz<elev(neighbours(p)+1))then
+                  maxz = elev(neighbours(p)+1)
+                  nup = neighbours(p)+1
                 endif
               enddo loop
               if(nid==0)then
@@ -152,35 +147,37 @@ subroutine marine_distribution(elevation, seavol, sealevel, border, depIDs, pySl
 
 end subroutine marine_distribution
 
-subroutine pitparams(pyNgbs,pyArea,pyDiff,pyProp,pyPropa,pyPropb,fillTH,epsilon,pybounds,pydnodes)
+subroutine pitparams(pyOffset,pyNgbs,pyArea,pyDiff,pyProp,pyPropa,pyPropb,fillTH,epsilon,pybounds,pydnodes,pynnz)
 
   use classpd
   implicit none
 
-  integer :: pydnodes
+  integer :: pydnodes, pynnz
   integer,intent(in) :: pybounds
   real(kind=8),intent(in) :: fillTH
   real(kind=8),intent(in) :: epsilon
   integer,intent(in) :: pyDiff
-  integer,intent(in) :: pyNgbs(pydnodes,20)
+  integer,intent(in) :: pyOffset(pydnodes+1)
+  integer,intent(in) :: pyNgbs(pynnz)
   real(kind=8),intent(in) :: pyProp
   real(kind=8),intent(in) :: pyPropa
   real(kind=8),intent(in) :: pyPropb
   real(kind=8),intent(in) :: pyArea(pydnodes)
 
   dnodes = pydnodes
+  nnz = pynnz
 
   diffnbmax = pyDiff
   diffprop = pyProp
   propA = pyPropa
   propB = pyPropb
   bds = pybounds
-  block_size = pydnodes - bds
   eps = epsilon
   fill_TH = fillTH
 
   call defineparameters
 
+  ngbOffset = pyOffset
   neighbours = pyNgbs
   area = pyArea
 
@@ -188,7 +185,7 @@ subroutine pitparams(pyNgbs,pyArea,pyDiff,pyProp,pyPropa,pyPropb,fillTH,epsilon,
 
 end subroutine pitparams
 
-subroutine pitfilling(elevation,allfill,sealevel,demH,pydnodes)
+subroutine priorityfilling(elevation,allfill,sealevel,demH,pydnodes)
 
   use classpd
   implicit none
@@ -198,22 +195,292 @@ subroutine pitfilling(elevation,allfill,sealevel,demH,pydnodes)
   real(kind=8),intent(in) :: sealevel
   real(kind=8),intent(in) :: elevation(pydnodes)
 
-  real(kind=8),intent(out) :: demH(pydnodes)
-  call initialisePD(elevation,demH,pydnodes)
+  real(kind=8),intent(inout) :: demH(pydnodes)
+
+  call fillPriority(elevation,sealevel,allfill,demH,pydnodes)
+
+  return
+
+end subroutine priorityfilling
+
+subroutine filltile(t,allfill,sealevel,elevation,tileOff,tileNodes,haloOff,haloNodes,tileOf,local,first, &
+                    zPrev,demH,haloSeen,gid,heapID,heapPos,pitQueue,inPit,fz,changed,pydnodes,pytiles,pyhalo,nw)
+!*****************************************************************************
+! Priority-Flood of a single tile. The tile is flooded from the edges of the domain
+! it contains and from the halo nodes of the neighbouring tiles whose filled elevations
+! decreased since the tile was last flooded. The tile starts from its current filled
+! elevations so that only the nodes lowered by these new spill elevations are updated.
+! The heap and queue are stored in the segment of the workspace owned by the tile.
+
+  use classpd, only : ngbOffset, neighbours, bds, eps, fill_TH
+  implicit none
+
+  integer :: pydnodes, pytiles, pyhalo, nw
+  integer,intent(in) :: t
+  integer,intent(in) :: allfill
+  logical,intent(in) :: first
+  real(kind=8),intent(in) :: sealevel
+  real(kind=8),intent(in) :: elevation(pydnodes)
+  integer,intent(in) :: tileOff(pytiles+1)
+  integer,intent(in) :: tileNodes(pydnodes)
+  integer,intent(in) :: haloOff(pytiles+1)
+  integer,intent(in) :: haloNodes(pyhalo)
+  integer,intent(in) :: tileOf(pydnodes)
+  integer,intent(in) :: local(pydnodes)
+  real(kind=8),intent(in) :: zPrev(pydnodes)
+
+  real(kind=8),intent(inout) :: demH(pydnodes)
+  real(kind=8),intent(inout) :: haloSeen(pyhalo)
+  integer,intent(inout) :: gid(nw)
+  integer,intent(inout) :: heapID(nw)
+  integer,intent(inout) :: heapPos(nw)
+  integer,intent(inout) :: pitQueue(nw)
+  logical,intent(inout) :: inPit(nw)
+  real(kind=8),intent(inout) :: fz(nw)
+  logical,intent(out) :: changed
+
+  integer :: m, h, j, g, k, l, n, p, hn, qn, qhead, qtail
+  real(kind=8) :: hz
+
+  changed = .False.
+  m = tileOff(t+1) - tileOff(t)
+  h = haloOff(t+1) - haloOff(t)
+
+  hn = 0
+  qn = 0
+  qhead = 1
+  qtail = 0
+  heapPos = 0
+  inPit = .False.
+  do j = 1, m
+    gid(j) = tileNodes(tileOff(t)+j) + 1
+    fz(j) = demH(gid(j))
+    if(first .and. gid(j) <= bds) call heapPush(j)
+  enddo
+  do j = 1, h
+    g = haloNodes(haloOff(t)+j) + 1
+    gid(m+j) = g
+    fz(m+j) = zPrev(g)
+    if(zPrev(g) < haloSeen(haloOff(t)+j))then
+      haloSeen(haloOff(t)+j) = zPrev(g)
+      call heapPush(m+j)
+    endif
+  enddo
+
+  do while(hn > 0 .or. qn > 0)
+    k = 0
+    if(qn > 0)then
+      if(hn == 0)then
+        k = pitPop()
+      elseif(fz(pitQueue(qhead)) <= fz(heapID(1)))then
+        k = pitPop()
+      endif
+    endif
+    if(k == 0) k = heapPop()
+
+    hz = fz(k) + eps
+    loop: do p = ngbOffset(gid(k))+1, ngbOffset(gid(k)+1)
+      n = neighbours(p) + 1
+      if(tileOf(n) /= t-1 .or. n <= bds) cycle loop
+      l = local(n)
+      if(fz(l) > elevation(n))then
+        if(elevation(n) >= hz)then
+          fz(l) = elevation(n)
+          call heapPush(l)
+        elseif(fz(l) > hz)then
+          fz(l) = hz
+          if(allfill == 0)then
+            if(elevation(n) >= sealevel)then
+              if(fz(l) - elevation(n) > fill_TH) fz(l) = elevation(n) + fill_TH
+            else
+              if(fz(l) - sealevel > fill_TH) fz(l) = sealevel + fill_TH
+            endif
+          endif
+          if(fz(l) < hz .or. heapPos(l) > 0)then
+            call heapPush(l)
+          elseif(.not. inPit(l))then
+            call pitPush(l)
+          endif
+        else
+          cycle loop
+        endif
+        changed = .True.
+      endif
+    enddo loop
+  enddo
+
+  do j = 1, m
+    demH(gid(j)) = fz(j)
+  enddo
+
+  return
+
+contains
+
+  subroutine heapSwap(a, b)
+
+    integer :: a, b, tmp
+
+    tmp = heapID(a)
+    heapID(a) = heapID(b)
+    heapID(b) = tmp
+    heapPos(heapID(a)) = a
+    heapPos(heapID(b)) = b
+
+  end subroutine heapSwap
+
+  subroutine heapUp(a)
+
+    integer :: a, parent, child
+
+    child = a
+    do while(child > 1)
+      parent = child/2
+      if(fz(heapID(parent)) > fz(heapID(child)))then
+        call heapSwap(parent, child)
+        child = parent
+      else
+        exit
+      endif
+    enddo
 
-  ! Filling phase
-  if(allfill == 0)then
-    call fillPD(elevation,sealevel,demH,pydnodes)
-    ! call fillBarnes(elevation,sealevel,demH,pydnodes)
-  else
-    ! call fillBarnes(elevation,sealevel,demH,pydnodes)
-    ! Initialisation phase
-    call allfillPD(elevation,demH,pydnodes)
-  endif
+  end subroutine heapUp
+
+  subroutine heapDown(a)
+
+    integer :: a, parent, child
+
+    parent = a
+    do while(parent*2 <= hn)
+      child = parent*2
+      if(child + 1 <= hn)then
+        if(fz(heapID(child+1)) < fz(heapID(child))) child = child + 1
+      endif
+      if(fz(heapID(parent)) > fz(heapID(child)))then
+        call heapSwap(parent, child)
+        parent = child
+      else
+        exit
+      endif
+    enddo
+
+  end subroutine heapDown
+
+  subroutine heapPush(id)
+
+    integer :: id
+
+    if(heapPos(id) > 0)then
+      call heapUp(heapPos(id))
+    else
+      hn = hn + 1
+      heapID(hn) = id
+      heapPos(id) = hn
+      call heapUp(hn)
+    endif
+
+  end subroutine heapPush
+
+  function heapPop() result(id)
+
+    integer :: id
+
+    id = heapID(1)
+    heapPos(id) = 0
+    heapID(1) = heapID(hn)
+    hn = hn - 1
+    if(hn > 0)then
+      heapPos(heapID(1)) = 1
+      call heapDown(1)
+    endif
+
+  end function heapPop
+
+  subroutine pitPush(id)
+
+    integer :: id
+
+    qtail = mod(qtail, m+h) + 1
+    pitQueue(qtail) = id
+    qn = qn + 1
+    inPit(id) = .True.
+
+  end subroutine pitPush
+
+  function pitPop() result(id)
+
+    integer :: id
+
+    id = pitQueue(qhead)
+    qhead = mod(qhead, m+h) + 1
+    qn = qn - 1
+    inPit(id) = .False.
+
+  end function pitPop
+
+end subroutine filltile
+
+subroutine tilefilling(elevation,allfill,sealevel,pyTileOff,pyTileNodes,pyHaloOff,pyHaloNodes,pyTileID, &
+                       demH,pydnodes,pytiles,pyhalo)
+!*****************************************************************************
+! Tile-parallel Priority-Flood following Barnes (2016). Each tile is flooded independently
+! and the tiles exchange the filled elevations of the nodes along their perimeter, which
+! are the spill elevations between neighbouring tiles. Tiles receiving lower spill
+! elevations are flooded again until no perimeter elevation changes. As each tile solves
+! the same fixed point as fillPriority with exact boundary values, the filled surface is
+! identical to the serial one.
+
+  use classpd
+  implicit none
+
+  integer :: pydnodes, pytiles, pyhalo
+  integer,intent(in) :: allfill
+  real(kind=8),intent(in) :: sealevel
+  real(kind=8),intent(in) :: elevation(pydnodes)
+  integer,intent(in) :: pyTileOff(pytiles+1)
+  integer,intent(in) :: pyTileNodes(pydnodes)
+  integer,intent(in) :: pyHaloOff(pytiles+1)
+  integer,intent(in) :: pyHaloNodes(pyhalo)
+  integer,intent(in) :: pyTileID(pydnodes)
+
+  real(kind=8),intent(inout) :: demH(pydnodes)
+
+  integer :: t, j, s, nw
+  logical :: first
+  logical :: changed(pytiles)
+
+  call tileworkspace(pyhalo)
+  do t = 1, pytiles
+    do j = pyTileOff(t)+1, pyTileOff(t+1)
+      tileLocal(pyTileNodes(j)+1) = j - pyTileOff(t)
+    enddo
+  enddo
+
+  demH(1:bds) = elevation(1:bds)
+  demH(bds+1:pydnodes) = 1.e6
+  tileZ = demH
+  tileSeen = 1.e6
+  first = .True.
+  changed = .True.
+
+  do while(any(changed))
+    !$omp parallel do schedule(dynamic) private(s, nw)
+    do t = 1, pytiles
+      s = pyTileOff(t) + pyHaloOff(t)
+      nw = pyTileOff(t+1) + pyHaloOff(t+1) - s
+      call filltile(t,allfill,sealevel,elevation,pyTileOff,pyTileNodes,pyHaloOff,pyHaloNodes,pyTileID, &
+                    tileLocal,first,tileZ,demH,tileSeen,tileGid(s+1:s+nw),tileHeap(s+1:s+nw), &
+                    tileHeapPos(s+1:s+nw),tileQueue(s+1:s+nw),tileInPit(s+1:s+nw),tileFz(s+1:s+nw), &
+                    changed(t),pydnodes,pytiles,pyhalo,nw)
+    enddo
+    !$omp end parallel do
+    tileZ = demH
+    first = .False.
+  enddo
 
   return
 
-end subroutine pitfilling
+end subroutine tilefilling
 
 subroutine getactlay(alay,layTH,laySD,alayS,nbPts,nbLay,nbSed)
 
@@ -8,152 +8,405 @@
 //~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~#~//
 
 // This module computes the Single Flow Direction for any given surface.
+// The receiver of each node only depends on its neighbourhood, the loops over the nodes
+// are therefore shared between OpenMP threads when the module is compiled with OpenMP.
 
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <math.h>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+void set_threads(int pyThreads)
+{
+#ifdef _OPENMP
+    if (pyThreads <= 0) {
+        pyThreads = omp_get_num_procs();
+    }
+    omp_set_num_threads(pyThreads);
+#endif
+}
 
-#define MAX_NEIGHBOURS 20
+void get_threads(int pyThreads[])
+{
+#ifdef _OPENMP
+    pyThreads[0] = omp_get_max_threads();
+#else
+    pyThreads[0] = 1;
+#endif
+}
 
-void dirview(double pyElev[], double pyZ[], int pyNgbs[][MAX_NEIGHBOURS], double pyEdge[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], double sealimit, int pyBase[],
-    int pyRcv[], int pylocalNb, int pyglobalNb)
+static void donors_csr(int pyRcv[], int pyDelta[], int pyDonors[], int pyglobalNb)
 {
     int i;
 
+    // Number of donors of each node
+    for (i = 0; i <= pyglobalNb; i++) {
+        pyDelta[i] = 0;
+    }
     for (i = 0; i < pyglobalNb; i++) {
-        pyBase[i] = -1;
-        pyRcv[i] = -1;
+        pyDelta[pyRcv[i] + 1]++;
     }
 
-    int k;
-    for (k = 0; k < pylocalNb; k++) {
-        int gid = pyGIDs[k];
-        int lowestID = gid;
-        int p;
+    // Index where the donors list of each node begins
+    for (i = 0; i < pyglobalNb; i++) {
+        pyDelta[i + 1] += pyDelta[i];
+    }
 
-        for (p = 0; p < MAX_NEIGHBOURS; p++) {
-            int ngbid = pyNgbs[gid][p];
-            if (ngbid < 0) {
-                break;
-            }
+    // Donors are stored by increasing node ID
+    for (i = 0; i < pyglobalNb; i++) {
+        pyDonors[pyDelta[pyRcv[i]]++] = i;
+    }
+    for (i = pyglobalNb; i > 0; i--) {
+        pyDelta[i] = pyDelta[i - 1];
+    }
+    pyDelta[0] = 0;
+}
 
-            if (pyElev[ngbid] < pyElev[lowestID]) {
-                lowestID = ngbid;
-            }
+// Receivers of a node on the filled and real surfaces, and elevation differences with its neighbours
+static void node_graph(int gid, double pyFill[], double pyElev[], int pyOffset[], int pyNgbs[],
+    int pyRcv[], int pyRcv1[], double pyMaxh[], double pyMaxDep[])
+{
+    int lowestID = gid;
+    int lowestID1 = gid;
+    double diffH = 1.e6;
+    double diffD = 0.;
+    int p;
+
+    for (p = pyOffset[gid]; p < pyOffset[gid + 1]; p++) {
+        int ngbid = pyNgbs[p];
+
+        if (pyFill[ngbid] < pyFill[lowestID]) {
+            lowestID = ngbid;
+        }
+
+        if (pyElev[ngbid] < pyElev[lowestID1]) {
+            lowestID1 = ngbid;
+        }
+
+        double dh = pyElev[ngbid] - pyElev[gid];
+
+        if (dh >= 0. && dh < diffH) {
+            diffH = dh;
         }
 
-        pyRcv[gid] = lowestID;
-        if (pyZ[gid] < sealimit) {
-            pyRcv[gid] = gid;
+        if (dh > diffD) {
+            diffD = dh;
         }
+    }
+
+    pyRcv[gid] = lowestID;
+    pyRcv1[gid] = lowestID1;
+
+    if (diffH > 9.99e5) {
+        diffH = 0.;
+    }
+
+    pyMaxh[gid] = diffH;
+    pyMaxDep[gid] = diffD;
+}
+
+// Base levels ordered by increasing node ID and donors of both surfaces
+static void graph_links(int pyRcv[], int pyRcv1[], int pyDelta[], int pyDelta1[], int pyDonors[],
+    int pyDonors1[], int pyBase[], int pyBase1[], int pyBaseNb[], int pyglobalNb)
+{
+    int i;
+    int nb = 0;
+    int nb1 = 0;
 
-        if (gid == pyRcv[gid]) {
-            pyBase[gid] = gid;
+    for (i = 0; i < pyglobalNb; i++) {
+        if (pyRcv[i] == i) {
+            pyBase[nb] = i;
+            nb++;
+        }
+        if (pyRcv1[i] == i) {
+            pyBase1[nb1] = i;
+            nb1++;
         }
     }
+    pyBaseNb[0] = nb;
+    pyBaseNb[1] = nb1;
+
+    // Donors of each node in compressed sparse row format
+    #pragma omp parallel sections
+    {
+        #pragma omp section
+        donors_csr(pyRcv, pyDelta, pyDonors, pyglobalNb);
+        #pragma omp section
+        donors_csr(pyRcv1, pyDelta1, pyDonors1, pyglobalNb);
+    }
 }
 
-void directions(double pyElev[], double pyZ[], int pyNgbs[][MAX_NEIGHBOURS], double pyEdge[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], int pyBase[],
-    int pyRcv[], double pyMaxh[], double pyMaxDep[],
+void flowgraph(double pyFill[], double pyElev[], int pyOffset[], int pyNgbs[], int pyGIDs[],
+    int pyRcv[], int pyRcv1[], double pyMaxh[], double pyMaxDep[], int pyDelta[], int pyDelta1[],
+    int pyDonors[], int pyDonors1[], int pyBase[], int pyBase1[], int pyBaseNb[],
     int pylocalNb, int pyglobalNb)
 {
     int i;
 
+    #pragma omp parallel for schedule(static)
     for (i = 0; i < pyglobalNb; i++) {
-        pyBase[i] = -1;
         pyRcv[i] = -1;
+        pyRcv1[i] = -1;
         pyMaxh[i] = 1.e6;
         pyMaxDep[i] = 0.;
     }
 
+    // Single traversal of the neighbourhood for the filled and real surfaces
     int k;
+    #pragma omp parallel for schedule(static)
     for (k = 0; k < pylocalNb; k++) {
-        int gid = pyGIDs[k];
-        int lowestID = gid;
-        double diffH = 1.e6;
-        double diffD = 0.;
-        int p;
-
-        for (p = 0; p < MAX_NEIGHBOURS; p++) {
-            int ngbid = pyNgbs[gid][p];
-            if (ngbid < 0) {
-                break;
-            }
+        node_graph(pyGIDs[k], pyFill, pyElev, pyOffset, pyNgbs, pyRcv, pyRcv1, pyMaxh, pyMaxDep);
+    }
 
-            if (pyElev[ngbid] < pyElev[lowestID]) {
-                lowestID = ngbid;
-            }
+    graph_links(pyRcv, pyRcv1, pyDelta, pyDelta1, pyDonors, pyDonors1, pyBase, pyBase1, pyBaseNb,
+        pyglobalNb);
+}
 
-            double dh = pyZ[ngbid] - pyZ[gid];
+// Incremental version of flowgraph. The receivers are only computed again for the nodes in the
+// neighbourhood of a node whose elevations changed by more than the tolerance since the last update,
+// and for the nodes whose receiver is not lower anymore or which have a lower neighbour when they are
+// a base level. The reference elevations are updated in place and the nodes whose receiver changed
+// are flagged (1 for the filled surface, 2 for the real one). The marks array is a caller-owned workspace.
+void flowupdate(double pyFill[], double pyElev[], double pyFillRef[], double pyElevRef[], double pyTol,
+    int pyOffset[], int pyNgbs[], int pyGIDs[], int pyRcv[], int pyRcv1[], double pyMaxh[],
+    double pyMaxDep[], int pyDelta[], int pyDelta1[], int pyDonors[], int pyDonors1[], int pyBase[],
+    int pyBase1[], int pyBaseNb[], int pyChanged[], int pyMark[], int pylocalNb, int pyglobalNb)
+{
+    int *dirty = pyMark;
+    int i, k, p;
 
-            if (dh >= 0. && dh < diffH) {
-                diffH = dh;
-            }
+    // Modified nodes
+    #pragma omp parallel for schedule(static)
+    for (i = 0; i < pyglobalNb; i++) {
+        dirty[i] = 0;
+        pyChanged[i] = 0;
+        if (fabs(pyFill[i] - pyFillRef[i]) > pyTol || fabs(pyElev[i] - pyElevRef[i]) > pyTol) {
+            dirty[i] = 1;
+        }
+    }
 
-            if (dh > diffD) {
-                diffD = dh;
+    // Their neighbours
+    for (i = 0; i < pyglobalNb; i++) {
+        if (dirty[i] == 1) {
+            for (p = pyOffset[i]; p < pyOffset[i + 1]; p++) {
+                if (dirty[pyNgbs[p]] == 0) {
+                    dirty[pyNgbs[p]] = 2;
+                }
             }
+            pyFillRef[i] = pyFill[i];
+            pyElevRef[i] = pyElev[i];
         }
+    }
 
-        pyRcv[gid] = lowestID;
+    #pragma omp parallel for schedule(static) private(p)
+    for (k = 0; k < pylocalNb; k++) {
+        int gid = pyGIDs[k];
+        int rcv = pyRcv[gid];
+        int rcv1 = pyRcv1[gid];
 
-        if (gid == pyRcv[gid]) {
-            pyBase[gid] = gid;
+        // Receivers changing within the tolerance are kept as long as they remain downstream
+        if (dirty[gid] == 0) {
+            if (rcv != gid && pyFill[rcv] >= pyFill[gid]) {
+                dirty[gid] = 3;
+            }
+            if (rcv1 != gid && pyElev[rcv1] >= pyElev[gid]) {
+                dirty[gid] = 3;
+            }
+            if (rcv == gid || rcv1 == gid) {
+                for (p = pyOffset[gid]; p < pyOffset[gid + 1]; p++) {
+                    int ngbid = pyNgbs[p];
+                    if ((rcv == gid && pyFill[ngbid] < pyFill[gid]) ||
+                        (rcv1 == gid && pyElev[ngbid] < pyElev[gid])) {
+                        dirty[gid] = 3;
+                    }
+                }
+            }
         }
 
-        if (diffH > 9.99e5) {
-            diffH = 0.;
+        if (dirty[gid] > 0) {
+            node_graph(gid, pyFill, pyElev, pyOffset, pyNgbs, pyRcv, pyRcv1, pyMaxh, pyMaxDep);
+            pyChanged[gid] = (pyRcv[gid] != rcv) + 2 * (pyRcv1[gid] != rcv1);
         }
+    }
+
+    graph_links(pyRcv, pyRcv1, pyDelta, pyDelta1, pyDonors, pyDonors1, pyBase, pyBase1, pyBaseNb,
+        pyglobalNb);
+}
 
-        pyMaxh[gid] = diffH;
-        pyMaxDep[gid] = diffD;
+// Depth-first traversal of the donors tree of a given base level, the nodes are written in the
+// stack when it is provided and their number is returned. The path from the base level to the
+// current node holds at most the number of nodes of the tree. Without a path, the traversal goes back
+// up the tree through the receivers, which is slower but needs no workspace.
+static int traverse_tree(int b, int mark, int pyRcv[], int pyDelta[], int pyDonors[], int allocs[],
+    int next[], int path[], int pyStack[])
+{
+    int node = b;
+    int top = 0;
+    int j = 0;
+
+    if (pyStack) {
+        pyStack[j] = b;
+    }
+    j++;
+    allocs[b] = mark;
+    if (path) {
+        path[0] = b;
     }
+    next[b] = pyDelta[b];
+
+    while (1) {
+        if (next[node] < pyDelta[node + 1]) {
+            int donor = pyDonors[next[node]];
+            next[node]++;
+            if (allocs[donor] != mark) {
+                if (pyStack) {
+                    pyStack[j] = donor;
+                }
+                j++;
+                allocs[donor] = mark;
+                if (path) {
+                    top++;
+                    path[top] = donor;
+                }
+                next[donor] = pyDelta[donor];
+                node = donor;
+            }
+        }
+        else if (node == b) {
+            break;
+        }
+        else if (path) {
+            top--;
+            node = path[top];
+        }
+        else {
+            node = pyRcv[node];
+        }
+    }
+
+    return j;
 }
 
-void directions_base(double pyZ[], int pyNgbs[][MAX_NEIGHBOURS], double pyEdge[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], int pyBase[],
-    int pyRcv[], int pyglobalNb)
+// The donors trees of the base levels are disjoint, when several threads are available the size of each
+// tree is first computed to get its position in the stack and the trees are then traversed in parallel.
+// Each tree then uses the segment of the path workspace matching its segment of the stack.
+static int build_stack(int pyBase[], int pyBaseNb, int pyRcv[], int pyDelta[], int pyDonors[],
+    int pyStack[], int pyOffset[], int allocs[], int next[], int path[], int pyglobalNb)
 {
-    int i;
+    int i, p;
+    int nthreads = 1;
 
     for (i = 0; i < pyglobalNb; i++) {
-        pyBase[i] = -1;
-        pyRcv[i] = -1;
+        allocs[i] = -1;
     }
 
-    int k;
-    for (k = 0; k < pyglobalNb; k++) {
-        int gid = pyGIDs[k];
-        int lowestID = gid;
-        double diffD = 0.;
-        int p;
+#ifdef _OPENMP
+    nthreads = omp_get_max_threads();
+#endif
 
-        for (p = 0; p < MAX_NEIGHBOURS; p++) {
-            int ngbid = pyNgbs[gid][p];
-            if (ngbid < 0) {
-                break;
+    pyOffset[0] = 0;
+    if (nthreads == 1 || pyBaseNb < 2) {
+        for (p = 0; p < pyBaseNb; p++) {
+            pyOffset[p + 1] = pyOffset[p] + traverse_tree(pyBase[p], p, pyRcv, pyDelta, pyDonors,
+                allocs, next, path, pyStack + pyOffset[p]);
+        }
+    }
+    else {
+        #pragma omp parallel private(p)
+        {
+            #pragma omp for schedule(dynamic, 16)
+            for (p = 0; p < pyBaseNb; p++) {
+                pyOffset[p + 1] = traverse_tree(pyBase[p], p, pyRcv, pyDelta, pyDonors, allocs, next, NULL,
+                    NULL);
             }
-
-            if (pyZ[ngbid] < pyZ[lowestID]) {
-                lowestID = ngbid;
+            #pragma omp single
+            for (i = 0; i < pyBaseNb; i++) {
+                pyOffset[i + 1] += pyOffset[i];
+            }
+            #pragma omp for schedule(dynamic, 16)
+            for (p = 0; p < pyBaseNb; p++) {
+                traverse_tree(pyBase[p], pyBaseNb + p, pyRcv, pyDelta, pyDonors, allocs, next,
+                    path + pyOffset[p], pyStack + pyOffset[p]);
             }
+        }
+    }
+
+    return pyOffset[pyBaseNb];
+}
 
-            double dh = pyZ[ngbid] - pyZ[gid];
+// The allocs, next and path arrays are caller-owned workspaces.
+void flowstacks(int pyBase[], int pyBase1[], int pyBaseNb[], int pyRcv[], int pyRcv1[], int pyDelta[],
+    int pyDelta1[], int pyDonors[], int pyDonors1[], int pyStack[], int pyStack1[], int pyOffset[],
+    int pyOffset1[], int pyStackNb[], int pyAllocs[], int pyNext[], int pyPath[], int pyglobalNb)
+{
+    pyStackNb[0] = build_stack(pyBase, pyBaseNb[0], pyRcv, pyDelta, pyDonors, pyStack, pyOffset, pyAllocs,
+        pyNext, pyPath, pyglobalNb);
+    pyStackNb[1] = build_stack(pyBase1, pyBaseNb[1], pyRcv1, pyDelta1, pyDonors1, pyStack1, pyOffset1,
+        pyAllocs, pyNext, pyPath, pyglobalNb);
+}
 
-            if (dh > diffD) {
-                diffD = dh;
+// Incremental version of flowstacks for one surface after flowupdate. The donors tree of a base level is
+// copied from the previous stack when none of its nodes changed receiver and no node joined it, otherwise
+// it is traversed again and flagged as rebuilt. The marks, redo, allocs, next and path arrays are
+// caller-owned workspaces.
+void stackupdate(int pyBase[], int pyRcv[], int pyChanged[], int pyFlag, int pyDelta[], int pyDonors[],
+    int pyOldStack[], int pyOldOffset[], int pyStack[], int pyOffset[], int pyRebuilt[], int pyMark[],
+    int pyRedo[], int pyAllocs[], int pyNext[], int pyPath[], int pyBaseNb, int pyOldNb, int pyglobalNb)
+{
+    int *seg = pyMark;
+    int *redo = pyRedo;
+    int *allocs = pyAllocs;
+    int *next = pyNext;
+    int i, p, s;
+
+    memset(redo, 0, (pyOldNb + 1) * sizeof(int));
+
+    // Catchment of each node in the previous stack
+    for (i = 0; i < pyglobalNb; i++) {
+        seg[i] = -1;
+        allocs[i] = -1;
+    }
+    for (s = 0; s < pyOldNb; s++) {
+        for (p = pyOldOffset[s]; p < pyOldOffset[s + 1]; p++) {
+            seg[pyOldStack[p]] = s;
+        }
+    }
+
+    // Catchments losing or gaining nodes
+    for (i = 0; i < pyglobalNb; i++) {
+        if (pyChanged[i] & pyFlag) {
+            if (seg[i] >= 0) {
+                redo[seg[i]] = 1;
+            }
+            if (pyRcv[i] >= 0 && seg[pyRcv[i]] >= 0) {
+                redo[seg[pyRcv[i]]] = 1;
             }
         }
+    }
 
-        pyRcv[gid] = lowestID;
-        if (gid == pyRcv[gid]) {
-            pyBase[gid] = gid;
+    pyOffset[0] = 0;
+    for (p = 0; p < pyBaseNb; p++) {
+        int b = pyBase[p];
+        s = seg[b];
+        if (s >= 0 && redo[s] == 0 && pyOldStack[pyOldOffset[s]] == b) {
+            int nb = pyOldOffset[s + 1] - pyOldOffset[s];
+            memcpy(pyStack + pyOffset[p], pyOldStack + pyOldOffset[s], nb * sizeof(int));
+            pyOffset[p + 1] = pyOffset[p] + nb;
+            pyRebuilt[p] = 0;
+        }
+        else {
+            pyOffset[p + 1] = pyOffset[p] + traverse_tree(b, p, pyRcv, pyDelta, pyDonors, allocs, next,
+                pyPath, pyStack + pyOffset[p]);
+            pyRebuilt[p] = 1;
         }
     }
 }
 
-void diffusion(double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS], double pyEdge[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], double pyDiff[], int pylocalNb, int pyglobalNb)
+void diffusion(double pyZ[], int pyBord[], int pyOffset[], int pyNgbs[], double pyEdge[],
+    double pyDist[], int pyGIDs[], double pyDiff[], int pylocalNb, int pyglobalNb)
 {
     int i;
 
@@ -166,17 +419,14 @@ void diffusion(double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS], double
         int gid = pyGIDs[k];
         int p;
         if (pyBord[gid]>0) {
-          for (p = 0; p < MAX_NEIGHBOURS; p++) {
-              int ngbid = pyNgbs[gid][p];
-              if (ngbid < 0) {
-                  break;
-              }
-              if (pyBord[ngbid]>0 && pyDist[gid][p] > 0.){
-                pyDiff[gid] += pyEdge[gid][p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+          for (p = pyOffset[gid]; p < pyOffset[gid + 1]; p++) {
+              int ngbid = pyNgbs[p];
+              if (pyBord[ngbid]>0 && pyDist[p] > 0.){
+                pyDiff[gid] += pyEdge[p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
               }
               if (pyBord[ngbid]<1){
-                if (pyZ[ngbid] < pyZ[gid] && pyDist[gid][p] > 0.){
-                  pyDiff[gid] += pyEdge[gid][p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+                if (pyZ[ngbid] < pyZ[gid] && pyDist[p] > 0.){
+                  pyDiff[gid] += pyEdge[p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
                 }
               }
           }
@@ -184,8 +434,8 @@ void diffusion(double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS], double
     }
 }
 
-void diffnlcfl(double pySc[], double pyKd[], double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], double pyCFL[], int pylocalNb, int pyglobalNb)
+void diffnlcfl(double pySc[], double pyKd[], double pyZ[], int pyBord[], int pyOffset[], int pyNgbs[],
+    double pyDist[], int pyGIDs[], double pyCFL[], int pylocalNb, int pyglobalNb)
 {
     pyCFL[0] = 1.e6;
 
@@ -197,17 +447,14 @@ void diffnlcfl(double pySc[], double pyKd[], double pyZ[], int pyBord[], int pyN
         int gid = pyGIDs[k];
         int p;
         if (pyBord[gid]>0) {
-          for (p = 0; p < MAX_NEIGHBOURS; p++) {
-              int ngbid = pyNgbs[gid][p];
-              if (ngbid < 0) {
-                  break;
-              }
-              if (pyBord[ngbid]>0 && pyDist[gid][p] > 0.){
+          for (p = pyOffset[gid]; p < pyOffset[gid + 1]; p++) {
+              int ngbid = pyNgbs[p];
+              if (pyBord[ngbid]>0 && pyDist[p] > 0.){
                 double dh = pyZ[ngbid] - pyZ[gid];
                 if (dh < 0.){
                   dh = -dh;
                 }
-                double num = pyDist[gid][p] * pyDist[gid][p] - (dh / Sc2);
+                double num = pyDist[p] * pyDist[p] - (dh / Sc2);
                 if (num > 0.){
                   if (pyCFL[0] > num / kd){
                     pyCFL[0] = num / kd;
@@ -215,12 +462,12 @@ void diffnlcfl(double pySc[], double pyKd[], double pyZ[], int pyBord[], int pyN
                 }
               }
               if (pyBord[ngbid]<1){
-                if (pyZ[ngbid] < pyZ[gid] && pyDist[gid][p] > 0.){
+                if (pyZ[ngbid] < pyZ[gid] && pyDist[p] > 0.){
                   double dh = pyZ[ngbid] - pyZ[gid];
                   if (dh < 0.){
                     dh = -dh;
                   }
-                  double num = pyDist[gid][p] * pyDist[gid][p] - (dh / Sc2);
+                  double num = pyDist[p] * pyDist[p] - (dh / Sc2);
                   if (num > 0.){
                     if (pyCFL[0] > num / kd){
                       pyCFL[0] = num / kd;
@@ -234,8 +481,8 @@ void diffnlcfl(double pySc[], double pyKd[], double pyZ[], int pyBord[], int pyN
 }
 
 
-void diffusionnl(double pySc[], double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS], double pyEdge[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], double pyDiff[], int pylocalNb, int pyglobalNb)
+void diffusionnl(double pySc[], double pyZ[], int pyBord[], int pyOffset[], int pyNgbs[], double pyEdge[],
+    double pyDist[], int pyGIDs[], double pyDiff[], int pylocalNb, int pyglobalNb)
 {
     int i;
 
@@ -250,29 +497,26 @@ void diffusionnl(double pySc[], double pyZ[], int pyBord[], int pyNgbs[][MAX_NEI
         int gid = pyGIDs[k];
         int p;
         if (pyBord[gid]>0) {
-          for (p = 0; p < MAX_NEIGHBOURS; p++) {
-              int ngbid = pyNgbs[gid][p];
-              if (ngbid < 0) {
-                  break;
-              }
-              if (pyBord[ngbid]>0 && pyDist[gid][p] > 0.){
-                double dh = (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+          for (p = pyOffset[gid]; p < pyOffset[gid + 1]; p++) {
+              int ngbid = pyNgbs[p];
+              if (pyBord[ngbid]>0 && pyDist[p] > 0.){
+                double dh = (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
                 double denom = 1. - ( dh*dh / Sc2 );
                 if (denom < 0.1){
                   denom = 0.1;
                 }
                 if (denom>0.){
-                  pyDiff[gid] += pyEdge[gid][p] * dh / denom;
+                  pyDiff[gid] += pyEdge[p] * dh / denom;
                 }
               }
               if (pyBord[ngbid]<1){
-                if (pyZ[ngbid] < pyZ[gid] && pyDist[gid][p] > 0.){
-                  double dh = (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+                if (pyZ[ngbid] < pyZ[gid] && pyDist[p] > 0.){
+                  double dh = (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
                   double denom = 1. - ( dh*dh / Sc2 );
                   if (denom < 0.1){
                     denom = 0.1;
                   }
-                  pyDiff[gid] += pyEdge[gid][p] * dh / denom;
+                  pyDiff[gid] += pyEdge[p] * dh / denom;
                 }
               }
           }
@@ -280,8 +524,8 @@ void diffusionnl(double pySc[], double pyZ[], int pyBord[], int pyNgbs[][MAX_NEI
     }
 }
 
-void diffusionero(double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS], double pyEdge[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], double pyEro[], int pylocalNb, int pyglobalNb)
+void diffusionero(double pyZ[], int pyBord[], int pyOffset[], int pyNgbs[], double pyEdge[],
+    double pyDist[], int pyGIDs[], double pyEro[], int pylocalNb, int pyglobalNb)
 {
     int i;
 
@@ -294,17 +538,14 @@ void diffusionero(double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS], doub
         int gid = pyGIDs[k];
         int p;
         if (pyBord[gid]>0) {
-          for (p = 0; p < MAX_NEIGHBOURS; p++) {
-              int ngbid = pyNgbs[gid][p];
-              if (ngbid < 0) {
-                  break;
-              }
-              if (pyBord[ngbid]>0 && pyZ[gid] > pyZ[ngbid] && pyDist[gid][p] > 0.){
-                pyEro[gid] += pyEdge[gid][p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+          for (p = pyOffset[gid]; p < pyOffset[gid + 1]; p++) {
+              int ngbid = pyNgbs[p];
+              if (pyBord[ngbid]>0 && pyZ[gid] > pyZ[ngbid] && pyDist[p] > 0.){
+                pyEro[gid] += pyEdge[p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
               }
               if (pyBord[ngbid]<1){
-                if (pyZ[ngbid] < pyZ[gid] && pyDist[gid][p] > 0. ){
-                  pyEro[gid] += pyEdge[gid][p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+                if (pyZ[ngbid] < pyZ[gid] && pyDist[p] > 0. ){
+                  pyEro[gid] += pyEdge[p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
                 }
               }
           }
@@ -312,8 +553,8 @@ void diffusionero(double pyZ[], int pyBord[], int pyNgbs[][MAX_NEIGHBOURS], doub
     }
 }
 
-void diffusionmarine(double pyZ[], int pyBord[], int pyDep[], int pyNgbs[][MAX_NEIGHBOURS], double pyEdge[][MAX_NEIGHBOURS],
-    double pyDist[][MAX_NEIGHBOURS], int pyGIDs[], double pyDiff[], int pylocalNb, int pyglobalNb)
+void diffusionmarine(double pyZ[], int pyBord[], int pyDep[], int pyOffset[], int pyNgbs[], double pyEdge[],
+    double pyDist[], int pyGIDs[], double pyDiff[], int pylocalNb, int pyglobalNb)
 {
     int i;
 
@@ -326,22 +567,19 @@ void diffusionmarine(double pyZ[], int pyBord[], int pyDep[], int pyNgbs[][MAX_N
         int gid = pyGIDs[k];
         int p;
         if (pyBord[gid]>0.) {
-          for (p = 0; p < MAX_NEIGHBOURS; p++) {
-              int ngbid = pyNgbs[gid][p];
-              if (ngbid < 0) {
-                  break;
-              }
+          for (p = pyOffset[gid]; p < pyOffset[gid + 1]; p++) {
+              int ngbid = pyNgbs[p];
               if (pyBord[ngbid]>0){
-                if(pyDep[gid] > 0 && pyZ[gid] > pyZ[ngbid] && pyDist[gid][p] > 0.) {
-                  pyDiff[gid] += pyEdge[gid][p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+                if(pyDep[gid] > 0 && pyZ[gid] > pyZ[ngbid] && pyDist[p] > 0.) {
+                  pyDiff[gid] += pyEdge[p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
                 }
-                if(pyDep[ngbid] > 0 && pyZ[gid] < pyZ[ngbid] && pyDist[gid][p] > 0.) {
-                  pyDiff[gid] += pyEdge[gid][p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+                if(pyDep[ngbid] > 0 && pyZ[gid] < pyZ[ngbid] && pyDist[p] > 0.) {
+                  pyDiff[gid] += pyEdge[p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
                 }
               }
               if (pyBord[ngbid]<1){
-                if (pyZ[ngbid] < pyZ[gid] && pyDep[gid] > 0 && pyDist[gid][p] > 0.){
-                  pyDiff[gid] += pyEdge[gid][p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[gid][p];
+                if (pyZ[ngbid] < pyZ[gid] && pyDep[gid] > 0 && pyDist[p] > 0.){
+                  pyDiff[gid] += pyEdge[p] * (pyZ[ngbid] - pyZ[gid]) / pyDist[p];
                 }
               }
           }